@@ -4,9 +4,11 @@ from typing import List, Dict
 import numpy as np
 import logging
 import math
-from copy import copy
+from copy import copy, deepcopy
 
 from util.datastructures import MetaPath
+from util.tracing import metrics, span
+from util.lazy_logging import LazyFormat
 from .hypothesis import GaussianProcessHypothesis, MPLengthHypothesis
 
 # algorithm types
@@ -20,16 +22,37 @@ class State(Enum):
     NOT_VISITED = 1
 
 
+class Speculation:
+    """
+    Next batch, which was selected in advance under the assumption, that the current batch is rated as guessed.
+    """
+
+    def __init__(self, rated_ids: List[int], guessed_ratings: List[float], visited_count: int, next_ids: List[int]):
+        """
+        :param rated_ids: Ids of the batch, which is rated by the user in the meantime.
+        :param visited_count: Number of visited meta-paths after the batch was rated.
+        """
+        self.rated_ids = rated_ids
+        self.guessed_ratings = guessed_ratings
+        self.visited_count = visited_count
+        self.next_ids = next_ids
+
+
 class AbstractActiveLearningAlgorithm(ABC):
     STANDARD_RATING = 0.5
     UI_MAX_VALUE = 1.0
     UI_MIN_VALUE = 0.0
+    # Maximal difference between actual and guessed ratings, for which a speculated batch is still used
+    SPECULATION_TOLERANCE = 0.05
 
     def __init__(self, meta_paths: List[MetaPath], seed: int):
         self.meta_paths = np.array(meta_paths)
         self.meta_paths_rating = np.array(np.zeros(len(meta_paths)))
         self.visited = np.array([State.NOT_VISITED] * len(meta_paths))
         self.random = np.random.RandomState(seed=seed)
+        # (data set, start type, end type, node types, edge types, limit) of the meta-paths, if they were loaded from
+        # redis. Limit is the number of meta-paths with the highest structural values or None for all meta-paths.
+        self.catalog = None
         self.logger = logging.getLogger('MetaExp.{}'.format(__class__.__name__))
 
     def __getstate__(self):
@@ -51,7 +74,7 @@ class AbstractActiveLearningAlgorithm(ABC):
         max_ref_path_idx = len(reversed_ratings) - np.argmax(reversed_ratings) - 1
         max_ref_path_id = np.where(self.visited == State.VISITED)[0][max_ref_path_idx]
         self.logger.debug(
-            "Max ref path is {} with rating {}".format(max_ref_path_id, self.meta_paths_rating[max_ref_path_id]))
+            LazyFormat("Max ref path is {} with rating {}", max_ref_path_id, self.meta_paths_rating[max_ref_path_id]))
         return {'id': int(max_ref_path_id),
                 'metapath': self.meta_paths[max_ref_path_id].get_representation('UI'),
                 'rating': self.UI_MAX_VALUE}
@@ -61,7 +84,7 @@ class AbstractActiveLearningAlgorithm(ABC):
         min_ref_path_idx = np.argmin(self.meta_paths_rating[idx])
         min_ref_path_id = np.where(self.visited == State.VISITED)[0][min_ref_path_idx]
         self.logger.debug(
-            "Max ref path is {} with rating {}".format(min_ref_path_id, self.meta_paths_rating[min_ref_path_id]))
+            LazyFormat("Min ref path is {} with rating {}", min_ref_path_id, self.meta_paths_rating[min_ref_path_id]))
         return {'id': int(min_ref_path_id),
                 'metapath': self.meta_paths[min_ref_path_id].get_representation('UI'),
                 'rating': self.UI_MIN_VALUE}
@@ -80,19 +103,39 @@ class AbstractActiveLearningAlgorithm(ABC):
         idx = [mp['id'] for mp in meta_paths]
         ratings = [mp['rating'] for mp in meta_paths]
         self.visited[idx] = State.VISITED
-        self.logger.debug("Refreshed visited list: {}".format(self.visited))
+        self.logger.debug(LazyFormat("Refreshed visited list: {}", self.visited))
         self.meta_paths_rating[idx] = ratings
-        self.logger.debug("Refreshed rating list: {}".format(self.meta_paths_rating))
+        self.logger.debug(LazyFormat("Refreshed rating list: {}", self.meta_paths_rating))
 
-    def get_next(self, batch_size=1) -> (List[MetaPath], bool):
+    def extend(self, meta_paths: List[MetaPath]):
+        """
+        Adds meta-paths to the end, which weren't available yet, e.g. to expand a session, which started on the
+        meta-paths with the highest structural values only.
         """
+        added = np.empty(len(meta_paths), dtype=object)
+        added[:] = meta_paths
+        self.meta_paths = np.concatenate([self.meta_paths, added])
+        self.meta_paths_rating = np.concatenate([self.meta_paths_rating, np.zeros(len(meta_paths))])
+        self.visited = np.concatenate([self.visited, np.array([State.NOT_VISITED] * len(meta_paths))])
+        self.logger.debug(LazyFormat("Extended meta paths by {} to {}", len(meta_paths), len(self.meta_paths)))
+
+    def get_next(self, batch_size=1, speculation: Speculation = None) -> (List[MetaPath], bool):
+        """
+        :param speculation: Batch selected in advance, which is used if the ratings match the guessed ones.
         :return: requested number of next meta-paths to be rated next.
         """
         is_last_batch = self.has_one_batch_left(batch_size)
         self.logger.info("Last Batch: {}".format(is_last_batch))
         if is_last_batch:
             batch_size = len(np.where(self.visited == State.NOT_VISITED)[0])
-        ids = self._select(batch_size)
+        with span('select'):
+            if speculation is not None and self.matches(speculation, batch_size):
+                metrics.increment('metaexp_speculation_total', result='hit')
+                ids = speculation.next_ids
+            else:
+                if speculation is not None:
+                    metrics.increment('metaexp_speculation_total', result='miss')
+                ids = self._select(batch_size)
 
         mps = [{'id': int(meta_id),
                 'metapath': meta_path.get_representation('UI'),
@@ -103,6 +146,19 @@ class AbstractActiveLearningAlgorithm(ABC):
                            'min_path': self.get_min_ref_path()} if not self.is_first_batch() else {}
         return mps, is_last_batch, reference_paths
 
+    def matches(self, speculation: Speculation, batch_size: int) -> bool:
+        """
+        :return: Whether the speculated batch is the one, which would be selected now.
+        """
+        rated_ids = np.asarray(speculation.rated_ids, dtype=int)
+        next_ids = np.asarray(speculation.next_ids, dtype=int)
+        return (len(next_ids) == batch_size
+                and np.sum(self.visited == State.VISITED) == speculation.visited_count
+                and np.all(self.visited[rated_ids] == State.VISITED)
+                and np.all(self.visited[next_ids] == State.NOT_VISITED)
+                and np.allclose(self.meta_paths_rating[rated_ids], speculation.guessed_ratings,
+                                rtol=0, atol=self.SPECULATION_TOLERANCE))
+
     @abstractmethod
     def _select(self, n):
         """
@@ -207,12 +263,41 @@ class HypothesisBasedAlgorithm(AbstractActiveLearningAlgorithm, metaclass=ABCMet
         self.__dict__.update(d)
         self.logger = logging.getLogger('MetaExp.{}'.format(__class__.__name__))
 
+    def extend(self, meta_paths: List[MetaPath]):
+        super().extend(meta_paths)
+        self.hypothesis.extend(meta_paths)
+
     def update(self, meta_paths):
         super().update(meta_paths)
         self.logger.debug("Fitting {} to new data points...".format(self.hypothesis.__class__.__name__))
         self.hypothesis.update(np.where(self.visited == State.VISITED)[0],
                                self.meta_paths_rating[np.where(self.visited == State.VISITED)[0]])
 
+    def speculate(self, rated_ids: List[int], batch_size: int) -> Speculation:
+        """
+        Selects the batch after `rated_ids` on a copy of this algorithm, assuming that the meta-paths are rated
+        as predicted by the hypothesis, or with the standard rating before any meta-path was rated.
+        :return: The speculated batch or None, if no meta-paths are left after the rated ones.
+        """
+        speculative = copy(self)
+        speculative.visited = self.visited.copy()
+        speculative.meta_paths_rating = self.meta_paths_rating.copy()
+        speculative.random = deepcopy(self.random)
+        speculative.hypothesis = self.hypothesis.copy()
+
+        if len(self.hypothesis.training_set[0]) == 0:
+            guessed_ratings = [self.STANDARD_RATING] * len(rated_ids)
+        else:
+            guessed_ratings = [float(rating) for rating in speculative.hypothesis.predict_rating(rated_ids)]
+        speculative.update([{'id': meta_id, 'rating': rating} for meta_id, rating in zip(rated_ids, guessed_ratings)])
+
+        remaining = len(np.where(speculative.visited == State.NOT_VISITED)[0])
+        if remaining == 0:
+            return None
+        next_ids = speculative._select(min(batch_size, remaining))
+        return Speculation([int(meta_id) for meta_id in rated_ids], guessed_ratings,
+                           int(np.sum(speculative.visited == State.VISITED)), [int(meta_id) for meta_id in next_ids])
+
     def _select(self, batch_size):
         criterion = self.compute_selection_criterion()
         n = len(criterion)
@@ -227,26 +312,26 @@ class HypothesisBasedAlgorithm(AbstractActiveLearningAlgorithm, metaclass=ABCMet
             if len(unvisited) > 0:
                 criterion_unvisited = criterion[unvisited]
                 ids_unvisited = ids[unvisited]
-                most_uncertain = np.random.choice(np.where(criterion_unvisited == np.amax(criterion_unvisited))[0])
+                most_uncertain = self.random.choice(np.where(criterion_unvisited == np.amax(criterion_unvisited))[0])
                 most_uncertain_id = ids_unvisited[most_uncertain]
                 unvisited = np.delete(unvisited, np.where(most_uncertain_id == unvisited))
                 selected_ids.append(most_uncertain_id)
 
                 # remove the len/batchsize - 1 closest elements from the list
                 remove_n = int(math.floor(n/batch_size) - 1)
-                self.logger.debug("Removing {} elements close to the most uncertain element.".format(remove_n))
+                self.logger.debug(LazyFormat("Removing {} elements close to the most uncertain element.", remove_n))
                 if len(unvisited) > remove_n and remove_n > 0:
                     ids_unvisited = ids[unvisited]
                     closest_elements = np.argpartition(similarity[most_uncertain_id][unvisited],remove_n)[:remove_n]
                     ignore_closest_idx = ids_unvisited[closest_elements]
-                    for ignore in ignore_closest_idx:
-                        unvisited = np.delete(unvisited,np.where(np.isin(ignore, unvisited)))
+                    # Removes the ids of the neighbours, not the elements at their positions
+                    unvisited = unvisited[~np.isin(unvisited, ignore_closest_idx)]
             else:
                 self.logger.debug("Not items left")
 
 
 
-        self.logger.debug("Most {} uncertain ids are {}".format(batch_size, selected_ids))
+        self.logger.debug(LazyFormat("Most {} uncertain ids are {}", batch_size, selected_ids))
         return selected_ids
 
     @abstractmethod
@@ -349,6 +434,6 @@ class GPSelect_Algorithm(HypothesisBasedAlgorithm):
         Select the next metapaths based on the uncertainty of them in the current model.
         """
         all_paths = range(len(self.meta_paths))
-        criterion = np.sqrt(self.beta) * self.hypothesis.get_uncertainty(all_paths) \
-                    + self.hypothesis.predict_rating(all_paths)
+        prediction, uncertainty = self.hypothesis.predict_rating_and_uncertainty(all_paths)
+        criterion = np.sqrt(self.beta) * uncertainty + prediction
         return criterion
@@ -1,14 +1,16 @@
 from util.datastructures import MetaPath
-from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.gaussian_process import GaussianProcessRegressor
 from sklearn.gaussian_process.kernels import (RBF, Matern, RationalQuadratic,
                                               ExpSineSquared, DotProduct,
                                               ConstantKernel, PairwiseKernel)
 from sklearn.metrics.pairwise import cosine_similarity
 
-from matplotlib import pyplot as plt
 import numpy as np
 import logging
+from copy import copy
+
+from util.tracing import span
+from util.lazy_logging import LazyFormat
 
 class MPLengthHypothesis:
     """
@@ -48,12 +50,18 @@ class GaussianProcessHypothesis:
         self.gp = GaussianProcessRegressor(kernel=kernel,optimizer=None)
         if not 'embedding_strategy' in hypothesis_params:
             self.meta_paths = np.array([mp.get_representation('embedding') for mp in meta_paths])
-            self.logger.debug(self.meta_paths)
+            self.logger.debug(LazyFormat("Embeddings of meta paths: {}", self.meta_paths))
         else:
             self.meta_paths = hypothesis_params['embedding_strategy'](meta_paths)
-        self.similarity = kernel(self.meta_paths, self.meta_paths)
+        # Computed on first use, as it is quadratic in the number of meta-paths
+        self.similarity = None
+        # Ids and ratings of the meta-paths the gaussian process is fitted to
+        self.training_set = (np.array([], dtype=int), np.array([]))
+        self._is_fitted = True
 
     def plot_prior(self):
+        # Imported here, so that the server doesn't load the plotting stack
+        from matplotlib import pyplot as plt
         X_ = self.meta_paths[:100]
         y_mean, y_std = self.gp.predict(X_, return_std=True)
         plt.plot(X_, y_mean, 'k', lw=3, zorder=9)
@@ -88,30 +96,78 @@ class GaussianProcessHypothesis:
         """
         Transform the meta paths as tfidf vectors.
         """
+        from sklearn.feature_extraction.text import TfidfVectorizer
         vectorizer = TfidfVectorizer(analyzer='word', token_pattern='\\b\\w+\\b')
         vectorizer.fit([str(mp) for mp in meta_paths])
         return vectorizer.transform(map(str, meta_paths)).toarray()
 
     def update(self, idx, ratings):
+        """
+        Sets the rated meta-paths. The gaussian process is fitted on first use, so that no fit is wasted, if
+        the next batch was already selected speculatively.
+        """
+        self.training_set = (idx, ratings)
+        self._is_fitted = False
+
+    def restore(self, idx, ratings):
+        """
+        Restores a previously fitted training set. The gaussian process is fitted on first use.
+        """
+        self.update(idx, ratings)
+
+    def _fit_pending_training_set(self):
+        if self._is_fitted:
+            return
+        self._is_fitted = True
+        idx, ratings = self.training_set
         if len(idx) == 0:
-            return []
+            return
         self.logger.debug("Fitting Gaussian process to new ratings...")
-        self.logger.debug("Metapaths {} where rated {}".format(self.meta_paths[idx], ratings))
-        self.gp.fit(self.meta_paths[idx], ratings)
+        self.logger.debug(LazyFormat("Metapaths {} where rated {}", idx, ratings))
+        with span('gp_fit'):
+            self.gp.fit(self.meta_paths[idx], ratings)
+
+    def extend(self, meta_paths):
+        """
+        Adds meta-paths to the end, which are described by their embedding.
+        """
+        embeddings = np.array([mp.get_representation('embedding') for mp in meta_paths])
+        self.meta_paths = np.concatenate([self.meta_paths, embeddings])
+        self.similarity = None
+
+    def copy(self):
+        """
+        :return: A hypothesis, which can be updated without changing this one. Embeddings and similarity are shared.
+        """
+        hypothesis = copy(self)
+        hypothesis.gp = copy(self.gp)
+        return hypothesis
 
     def predict_rating(self, idx):
-        prediction = self.gp.predict(self.meta_paths[idx])
-        self.logger.debug("prediction for {} is {}".format(self.meta_paths[idx], prediction))
+        self._fit_pending_training_set()
+        with span('gp_predict'):
+            prediction = self.gp.predict(self.meta_paths[idx])
+        self.logger.debug(LazyFormat("prediction for {} meta paths is {}", len(prediction), prediction))
         return prediction
 
     def get_uncertainty(self, idx):
-        self.predict_rating(idx)
-        uncertainty_all_meta_paths = self.gp.predict(self.meta_paths[idx], return_std=True)[1]
-        self.logger.debug("The uncertainty for the meta paths is: {}".format(uncertainty_all_meta_paths))
-        return uncertainty_all_meta_paths
+        return self.predict_rating_and_uncertainty(idx)[1]
+
+    def predict_rating_and_uncertainty(self, idx):
+        """
+        :return: Predicted ratings and their standard deviations, computed by a single prediction.
+        """
+        self._fit_pending_training_set()
+        with span('gp_uncertainty'):
+            prediction, uncertainty = self.gp.predict(self.meta_paths[idx], return_std=True)
+        self.logger.debug(LazyFormat("The uncertainty for the meta paths is: {}", uncertainty))
+        return prediction, uncertainty
 
     def get_similarity(self):
         """
         Computes the complete similarity matrix according to the kernel.
         """
+        if self.similarity is None:
+            with span('gp_similarity'):
+                self.similarity = self.gp.kernel(self.meta_paths, self.meta_paths)
         return self.similarity
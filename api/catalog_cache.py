@@ -0,0 +1,95 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import List
+
+import numpy as np
+
+from api.redis_own import Redis
+from util.config import CATALOG_CACHE_MAX_BYTES
+from util.datastructures import MetaPath
+from util.tracing import metrics
+
+
+def estimate_size(meta_paths: List[MetaPath]) -> int:
+    """
+    :return: Rough estimate of the memory used by the meta-paths in bytes.
+    """
+    size = 0
+    for meta_path in meta_paths:
+        embedding = meta_path.get_representation('embedding')
+        if embedding is None:
+            embedding_size = 0
+        elif isinstance(embedding, np.ndarray):
+            embedding_size = 100 + embedding.nbytes
+        else:
+            embedding_size = 32 * len(embedding)
+        size += 400 + 60 * len(meta_path) + embedding_size
+    return size
+
+
+class MetaPathCatalogCache:
+    """
+    Process-wide cache of the meta-paths between two node types of a data set.
+    The least recently used catalogs are evicted as soon as the estimated size of all catalogs exceeds `max_bytes`.
+    A catalog is only served while the import generation of its data set in redis didn't change.
+    The cached meta-paths are shared between sessions and must not be modified.
+    """
+
+    def __init__(self, max_bytes: int = CATALOG_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        # (data set, start type, end type, node types, edge types, offset, limit)
+        #   -> (import generation, size, meta-paths)
+        self._catalogs = OrderedDict()
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger('MetaExp.{}'.format(__class__.__name__))
+
+    def meta_paths(self, redis: Redis, start_type: str, end_type: str, node_types: List[str] = None,
+                   edge_types: List[str] = None, offset: int = 0, limit: int = None) -> List[MetaPath]:
+        """
+        :param node_types: If given, only meta-paths whose nodes are all of these types are returned.
+        :param edge_types: If given, only meta-paths whose edges are all of these types are returned.
+        :param limit: If given, only a page of the meta-paths ranked by structural value is returned.
+        """
+        key = (redis.data_set, start_type, end_type,
+               tuple(sorted(node_types)) if node_types is not None else None,
+               tuple(sorted(edge_types)) if edge_types is not None else None, offset, limit)
+        generation = redis.import_generation()
+        with self._lock:
+            if key in self._catalogs and self._catalogs[key][0] == generation:
+                self._catalogs.move_to_end(key)
+                self.hits += 1
+                metrics.increment('metaexp_cache_requests_total', cache='catalog', result='hit')
+                return self._catalogs[key][2]
+            self.misses += 1
+        metrics.increment('metaexp_cache_requests_total', cache='catalog', result='miss')
+
+        meta_paths = redis.meta_paths(start_type, end_type, node_types, edge_types, offset, limit)
+        self._insert(key, generation, meta_paths)
+        return meta_paths
+
+    def _insert(self, key, generation: int, meta_paths: List[MetaPath]):
+        size = estimate_size(meta_paths)
+        with self._lock:
+            if key in self._catalogs:
+                self.used_bytes -= self._catalogs.pop(key)[1]
+            if size > self.max_bytes:
+                self.logger.debug("Catalog {} with {} bytes exceeds the cache size".format(key, size))
+                return
+            self._catalogs[key] = (generation, size, meta_paths)
+            self.used_bytes += size
+            while self.used_bytes > self.max_bytes:
+                evicted_key, (_, evicted_size, _) = self._catalogs.popitem(last=False)
+                self.used_bytes -= evicted_size
+                self.logger.debug("Evicted catalog {} from cache".format(evicted_key))
+
+    def clear(self):
+        with self._lock:
+            self._catalogs.clear()
+            self.used_bytes = 0
+
+
+catalog_cache = MetaPathCatalogCache()
@@ -0,0 +1,140 @@
+import logging
+import os
+import threading
+from typing import Dict, List
+
+import redis
+
+from api.sharding import HashRing
+from util.config import (REDIS_INSTANCES, REDIS_RING_REPLICAS, REDIS_MAX_CONNECTIONS, NEO4J_MAX_CONNECTIONS,
+                         AVAILABLE_DATA_SETS)
+
+
+class ConnectionRegistry:
+    """
+    Owns one connection pool per redis instance and one neo4j driver per data set of the current process.
+
+    Data sets are assigned to the redis instances by consistent hashing of their names, so all keys of a data set,
+    including its generation pointers, live on the same instance and can be changed in one transaction.
+
+    Connections can't be shared between processes. If the registry is used after a fork, e.g. in a gunicorn worker
+    or a multiprocessing pool, the inherited pool and drivers are dropped without closing them and new ones are
+    created for the child process.
+    """
+
+    def __init__(self, redis_instances: List[Dict] = REDIS_INSTANCES):
+        """
+        :param redis_instances: Keyword arguments of the connection pool of each redis instance.
+        """
+        self._redis_instances = {'{}:{}'.format(instance['host'], instance['port']): instance
+                                 for instance in redis_instances}
+        self._ring = HashRing(list(self._redis_instances.keys()), REDIS_RING_REPLICAS)
+        self._pid = os.getpid()
+        # host:port -> pool
+        self._redis_pools = {}
+        # bolt url -> driver
+        self._neo4j_drivers = {}
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger('MetaExp.{}'.format(__class__.__name__))
+
+    def _check_process(self):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._redis_pools = {}
+            self._neo4j_drivers = {}
+            self._lock = threading.Lock()
+
+    def redis_address(self, data_set_name: str) -> str:
+        """
+        :return: host:port of the redis instance, which stores the data set.
+        """
+        return self._ring.instance(data_set_name)
+
+    def redis_pool(self, data_set_name: str = '') -> redis.ConnectionPool:
+        """
+        :return: Pool of the redis instance, which stores the data set.
+        """
+        return self._redis_pool(self.redis_address(data_set_name))
+
+    def redis_pools(self) -> Dict[str, redis.ConnectionPool]:
+        """
+        :return: Pool of every redis instance by host:port.
+        """
+        return {address: self._redis_pool(address) for address in self._redis_instances}
+
+    def _redis_pool(self, address: str) -> redis.ConnectionPool:
+        self._check_process()
+        with self._lock:
+            if address not in self._redis_pools:
+                instance = self._redis_instances[address]
+                self._redis_pools[address] = redis.ConnectionPool(host=instance['host'], port=instance['port'],
+                                                                  password=instance.get('password'),
+                                                                  max_connections=REDIS_MAX_CONNECTIONS)
+            return self._redis_pools[address]
+
+    def neo4j_driver(self, uri: str, user: str, password: str):
+        self._check_process()
+        with self._lock:
+            if uri not in self._neo4j_drivers:
+                # Imported here, so that processes which only talk to redis don't load the driver
+                from neo4j.v1 import GraphDatabase
+                self.logger.debug("Creating neo4j driver for {}".format(uri))
+                self._neo4j_drivers[uri] = GraphDatabase.driver(uri, auth=(user, password),
+                                                                max_connection_pool_size=NEO4J_MAX_CONNECTIONS)
+            return self._neo4j_drivers[uri]
+
+    def close(self):
+        with self._lock:
+            for driver in self._neo4j_drivers.values():
+                driver.close()
+            self._neo4j_drivers = {}
+            for pool in self._redis_pools.values():
+                pool.disconnect()
+            self._redis_pools = {}
+
+    def health(self) -> Dict:
+        """
+        :return: Whether every redis instance and the neo4j database of each data set answer.
+        """
+        health = {'redis': True, 'redis_instances': {}, 'neo4j': {}}
+        for address, pool in self.redis_pools().items():
+            try:
+                health['redis_instances'][address] = redis.StrictRedis(connection_pool=pool).ping()
+            except redis.RedisError:
+                self.logger.exception("Redis {} is not available".format(address))
+                health['redis_instances'][address] = False
+            health['redis'] = health['redis'] and health['redis_instances'][address]
+        for data_set in AVAILABLE_DATA_SETS:
+            try:
+                driver = self.neo4j_driver(data_set['bolt-url'], data_set['username'], data_set['password'])
+                with driver.session() as session:
+                    health['neo4j'][data_set['name']] = session.run("RETURN 1 AS alive").single()['alive'] == 1
+            except Exception:
+                self.logger.exception("Neo4j of {} is not available".format(data_set['name']))
+                health['neo4j'][data_set['name']] = False
+        return health
+
+    def statistics(self) -> Dict:
+        """
+        :return: Number of created, idle and used connections of each pool of this process.
+        """
+        self._check_process()
+        statistics = {'pid': self._pid, 'redis': {}, 'neo4j': {}}
+        for address, pool in self._redis_pools.items():
+            statistics['redis'][address] = {'created': pool._created_connections,
+                                            'available': len(pool._available_connections),
+                                            'in_use': len(pool._in_use_connections),
+                                            'max': pool.max_connections}
+        for data_set in AVAILABLE_DATA_SETS:
+            driver = self._neo4j_drivers.get(data_set['bolt-url'])
+            if driver is None:
+                continue
+            pool = driver._pool
+            statistics['neo4j'][data_set['name']] = {
+                'created': sum(len(connections) for connections in pool.connections.values()),
+                'in_use': sum(pool.in_use_connection_count(address) for address in pool.connections.keys()),
+                'max': NEO4J_MAX_CONNECTIONS}
+        return statistics
+
+
+connections = ConnectionRegistry()
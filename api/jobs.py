@@ -0,0 +1,219 @@
+import json
+import logging
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+from uuid import uuid4
+
+from api.redis_own import Redis
+from util.config import (JOB_WORKERS, JOB_PROGRESS_INTERVAL, JOB_LIFETIME, JOB_HEARTBEAT_INTERVAL,
+                         JOB_HEARTBEAT_TIMEOUT)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+FINISHED = 'finished'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """
+    Handle of a running job. Long running functions report their progress through it and are interrupted by
+    a JobCancelled exception, if the job was cancelled in the meantime.
+    """
+
+    def __init__(self, job_id: str, redis: Redis):
+        self.job_id = job_id
+        self.redis = redis
+        self.key = "{}_{}".format(redis.data_set, job_id)
+        self._last_report = 0
+
+    def report_progress(self, done: int, total: int = None, phase: str = None):
+        """
+        :param done: Number of processed items, e.g. checked or embedded meta-paths.
+        :param total: Number of items to be processed in the current phase, if known.
+        """
+        now = time.time()
+        if now - self._last_report < JOB_PROGRESS_INTERVAL and (total is None or done < total):
+            return
+        self._last_report = now
+        progress = {'done': done}
+        if total is not None:
+            progress['total'] = total
+        if phase is not None:
+            progress['phase'] = phase
+        pipe = self.redis._client.pipeline(transaction=False)
+        pipe.hmset(self.key, progress)
+        pipe.hget(self.key, 'cancel_requested')
+        if pipe.execute()[1]:
+            raise JobCancelled()
+
+
+class JobManager:
+    """
+    Executes long running tasks like imports and embedding training outside of the request threads.
+    The state of each job is kept in the redis hash 'job_<id>', so that every server process can answer
+    status requests and cancel jobs, that are executed by another process.
+
+    Jobs are executed by the process, which submitted them. It renews the field 'heartbeat' of its queued and
+    running jobs every `heartbeat_interval` seconds. If the process dies, e.g. because gunicorn restarted the
+    worker, the heartbeat stops and the job is reported as failed after `heartbeat_timeout` seconds.
+    """
+
+    def __init__(self, redis: Redis, workers: int = JOB_WORKERS, heartbeat_interval: float = JOB_HEARTBEAT_INTERVAL,
+                 heartbeat_timeout: float = JOB_HEARTBEAT_TIMEOUT):
+        self.redis = redis
+        self.workers = workers
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self._functions = {}
+        self._parameters = {}
+        self._executor = None
+        self._executor_pid = None
+        # Queued and running jobs of this process
+        self._jobs = set()
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger('MetaExp.{}'.format(__class__.__name__))
+
+    def register(self, kind: str, function: Callable, parameters: List[str] = ()):
+        """
+        :param function: Called with a Job handle and the parameters of the submitted job.
+        :param parameters: Names of the parameters, which requests may pass to the function.
+        """
+        self._functions[kind] = function
+        self._parameters[kind] = list(parameters)
+
+    def kinds(self):
+        return list(self._functions.keys())
+
+    def check_parameters(self, kind: str, parameters) -> Dict:
+        """
+        :return: The parameters, if they may be passed to a job of this kind by a request.
+        :raises ValueError: If the parameters aren't an object or contain names, which weren't registered.
+        """
+        if not isinstance(parameters, dict):
+            raise ValueError("Parameters of job {} must be an object".format(kind))
+        unknown = sorted(set(parameters.keys()) - set(self._parameters.get(kind, [])))
+        if unknown:
+            raise ValueError("Job {} doesn't accept the parameters {}".format(kind, ', '.join(unknown)))
+        return parameters
+
+    def _key(self, job_id: str) -> str:
+        return "{}_{}".format(self.redis.data_set, job_id)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # gunicorn forks the workers after loading the app, threads of the parent aren't available in the children
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers)
+                self._executor_pid = os.getpid()
+                self._jobs = set()
+                threading.Thread(target=self._beat, daemon=True, name='job-heartbeat').start()
+            return self._executor
+
+    def _beat(self):
+        pid = os.getpid()
+        while self._executor_pid == pid:
+            time.sleep(self.heartbeat_interval)
+            with self._lock:
+                job_ids = list(self._jobs)
+            if not job_ids:
+                continue
+            try:
+                pipe = self.redis._client.pipeline(transaction=False)
+                for job_id in job_ids:
+                    pipe.hset(self._key(job_id), 'heartbeat', time.time())
+                pipe.execute()
+            except Exception:
+                self.logger.exception("Heartbeat of jobs {} failed".format(', '.join(job_ids)))
+
+    def submit(self, kind: str, **parameters) -> str:
+        if kind not in self._functions:
+            raise ValueError("Unknown job {}".format(kind))
+        job_id = uuid4().hex
+        pipe = self.redis._client.pipeline(transaction=False)
+        pipe.hmset(self._key(job_id), {'kind': kind, 'status': QUEUED, 'parameters': json.dumps(parameters),
+                                       'submitted': time.time(), 'heartbeat': time.time(), 'done': 0})
+        pipe.expire(self._key(job_id), JOB_LIFETIME)
+        pipe.execute()
+        executor = self._get_executor()
+        with self._lock:
+            self._jobs.add(job_id)
+        executor.submit(self._run, job_id, kind, parameters)
+        self.logger.info("Submitted job {} ({})".format(job_id, kind))
+        return job_id
+
+    def _set(self, job_id: str, **fields):
+        self.redis._client.hmset(self._key(job_id), fields)
+
+    def _run(self, job_id: str, kind: str, parameters: Dict):
+        try:
+            self._execute(job_id, kind, parameters)
+        finally:
+            with self._lock:
+                self._jobs.discard(job_id)
+
+    def _execute(self, job_id: str, kind: str, parameters: Dict):
+        if self.redis._client.hget(self._key(job_id), 'cancel_requested'):
+            self._set(job_id, status=CANCELLED, finished=time.time())
+            return
+        self._set(job_id, status=RUNNING, started=time.time())
+        try:
+            self._functions[kind](Job(job_id, self.redis), **parameters)
+            self._set(job_id, status=FINISHED, finished=time.time())
+            self.logger.info("Finished job {} ({})".format(job_id, kind))
+        except JobCancelled:
+            self._set(job_id, status=CANCELLED, finished=time.time())
+            self.logger.info("Cancelled job {} ({})".format(job_id, kind))
+        except Exception:
+            self._set(job_id, status=FAILED, finished=time.time(), error=traceback.format_exc())
+            self.logger.exception("Job {} ({}) failed".format(job_id, kind))
+
+    def status(self, job_id: str) -> Dict:
+        """
+        :return: The state of the job or None, if there is no such job.
+        """
+        state = {key.decode(): value.decode() for key, value in self.redis._client.hgetall(self._key(job_id)).items()}
+        if not state:
+            return None
+        state['id'] = job_id
+        state['parameters'] = json.loads(state['parameters'])
+        for key in ['done', 'total']:
+            if key in state:
+                state[key] = int(state[key])
+        for key in ['submitted', 'started', 'finished', 'heartbeat']:
+            if key in state:
+                state[key] = float(state[key])
+        state['cancel_requested'] = 'cancel_requested' in state
+        heartbeat = state.get('heartbeat', state['submitted'])
+        if state['status'] in [QUEUED, RUNNING] and time.time() - heartbeat > self.heartbeat_timeout:
+            # The process executing the job died, it will never finish
+            state.update(status=FAILED, finished=time.time(),
+                         error="No heartbeat of the executing process for {:.0f}s".format(time.time() - heartbeat))
+            self._set(job_id, status=FAILED, finished=state['finished'], error=state['error'])
+            self.logger.warning("Job {} ({}) failed: {}".format(job_id, state['kind'], state['error']))
+        return state
+
+    def progress(self, job_id: str) -> Dict:
+        state = self.status(job_id)
+        if state is None:
+            return None
+        return {key: state[key] for key in ['status', 'done', 'total', 'phase'] if key in state}
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Requests the cancellation of a job. Running jobs stop the next time they report their progress.
+        :return: False, if there is no such job or it already terminated.
+        """
+        state = self.status(job_id)
+        if state is None or state['status'] in [FINISHED, FAILED, CANCELLED]:
+            return False
+        self._set(job_id, cancel_requested=time.time())
+        return True
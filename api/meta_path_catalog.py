@@ -0,0 +1,186 @@
+import json
+import lzma
+import zlib
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from util.datastructures import MetaPath
+
+VERSION = 2
+# Version 1 had no compression
+SUPPORTED_VERSIONS = (1, 2)
+# Fills the type id matrix after the end of shorter meta-paths
+PADDING = -1
+COLUMNS = ['type_ids', 'lengths', 'structural_values', 'embeddings']
+# name -> (compress(data, level), decompress(data))
+COMPRESSIONS = {
+    'zlib': (lambda data, level: zlib.compress(data, level), zlib.decompress),
+    'lzma': (lambda data, level: lzma.compress(data, preset=level), lzma.decompress),
+}
+
+
+class MetaPathCatalog:
+    """
+    Columnar representation of the meta-paths between two node types, which is stored as a redis hash with
+    one binary field per column:
+    - 'header': json with version, number of meta-paths, width of the type matrix, embedding dimensions, the
+                compression of the other fields, if any, and the number of meta-paths of each pair of start and end
+                type ids as '<start id>_<end id>'
+    - 'type_ids': int32 matrix of the alternating node and edge type ids of each meta-path, padded with -1
+    - 'lengths': int32 number of node and edge types of each meta-path
+    - 'structural_values': float64 structural value of each meta-path, NaN if unknown
+    - 'embeddings': float32 matrix with the embedding of each meta-path, only if all meta-paths are embedded
+
+    Decoded columns are read-only views of the data received from redis, or of the decompressed data.
+    """
+
+    def __init__(self, type_ids: np.ndarray, lengths: np.ndarray, structural_values: np.ndarray,
+                 embeddings: np.ndarray = None):
+        self.type_ids = type_ids
+        self.lengths = lengths
+        self.structural_values = structural_values
+        self.embeddings = embeddings
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    @classmethod
+    def from_meta_paths(cls, meta_paths: List[MetaPath], node_type_ids: Dict[str, int] = None,
+                        edge_type_ids: Dict[str, int] = None) -> 'MetaPathCatalog':
+        """
+        :param node_type_ids: Maps node type names to ids. If not given, the meta-paths consist of type ids already.
+        :param edge_type_ids: Maps edge type names to ids. If not given, the meta-paths consist of type ids already.
+        """
+        lengths = np.array([len(meta_path) for meta_path in meta_paths], dtype=np.int32)
+        type_ids = np.full((len(meta_paths), int(lengths.max()) if len(meta_paths) else 0), PADDING, dtype=np.int32)
+        for row, meta_path in enumerate(meta_paths):
+            labels = meta_path.as_list()
+            if node_type_ids is not None:
+                labels[::2] = [node_type_ids[label] for label in labels[::2]]
+            if edge_type_ids is not None:
+                labels[1::2] = [edge_type_ids[label] for label in labels[1::2]]
+            type_ids[row, :len(labels)] = [int(label) for label in labels]
+
+        structural_values = np.array([np.nan if meta_path.get_structural_value() is None
+                                      else meta_path.get_structural_value() for meta_path in meta_paths],
+                                     dtype=np.float64)
+        embeddings = [meta_path.get_representation('embedding') for meta_path in meta_paths]
+        if meta_paths and all(embedding is not None for embedding in embeddings):
+            embeddings = np.array(embeddings, dtype=np.float32)
+        else:
+            embeddings = None
+        return cls(type_ids, lengths, structural_values, embeddings)
+
+    @classmethod
+    def from_type_ids(cls, type_ids: Sequence[int], lengths: Sequence[int],
+                      structural_values: Sequence[float]) -> 'MetaPathCatalog':
+        """
+        :param type_ids: Type ids of all meta-paths one after another, e.g. collected in an array.array.
+        :param lengths: Number of type ids of each meta-path.
+        """
+        lengths = np.asarray(lengths, dtype=np.int32)
+        matrix = np.full((len(lengths), int(lengths.max()) if len(lengths) else 0), PADDING, dtype=np.int32)
+        # The type ids fill the rows up to their lengths in row-major order
+        matrix[np.arange(matrix.shape[1]) < lengths[:, None]] = np.asarray(type_ids, dtype=np.int32)
+        return cls(matrix, lengths, np.asarray(structural_values, dtype=np.float64))
+
+    def to_meta_paths(self, node_types: Dict[int, str] = None, edge_types: Dict[int, str] = None) -> List[MetaPath]:
+        """
+        :param node_types: Maps node type ids to names. If not given, the meta-paths consist of the ids as strings.
+        :param edge_types: Maps edge type ids to names. If not given, the meta-paths consist of the ids as strings.
+        """
+        meta_paths = []
+        for row, length in enumerate(self.lengths.tolist()):
+            labels = self.type_ids[row, :length].tolist()
+            nodes = [node_types[label] for label in labels[::2]] if node_types is not None \
+                else [str(label) for label in labels[::2]]
+            edges = [edge_types[label] for label in labels[1::2]] if edge_types is not None \
+                else [str(label) for label in labels[1::2]]
+            meta_path = MetaPath(nodes=nodes, edges=edges)
+            if not np.isnan(self.structural_values[row]):
+                meta_path.store_structural_value(float(self.structural_values[row]))
+            if self.embeddings is not None:
+                meta_path.store_embedding(self.embeddings[row])
+            meta_paths.append(meta_path)
+        return meta_paths
+
+    def type_pairs(self) -> Dict[Tuple[int, int], int]:
+        """
+        :return: Number of meta-paths of each pair of start and end type id.
+        """
+        if len(self) == 0:
+            return {}
+        end_type_ids = self.type_ids[np.arange(len(self)), self.lengths - 1]
+        pairs, counts = np.unique(np.stack([self.type_ids[:, 0], end_type_ids], axis=1), axis=0, return_counts=True)
+        return {(int(start), int(end)): int(count) for (start, end), count in zip(pairs, counts)}
+
+    def rows_by_type(self) -> Tuple[Dict[int, List[int]], Dict[int, List[int]]]:
+        """
+        :return: Rows of the meta-paths, which contain a node type, and rows of the meta-paths, which contain
+                 an edge type, by type id.
+        """
+        def rows(columns):
+            return {int(type_id): np.unique(np.where(columns == type_id)[0]).tolist()
+                    for type_id in np.unique(columns) if type_id != PADDING}
+
+        return rows(self.type_ids[:, ::2]), rows(self.type_ids[:, 1::2])
+
+    def select(self, rows: List[int]) -> 'MetaPathCatalog':
+        """
+        :return: Catalog of the meta-paths in the given rows, in the given order.
+        """
+        rows = np.asarray(rows, dtype=int)
+        return MetaPathCatalog(self.type_ids[rows], self.lengths[rows], self.structural_values[rows],
+                               self.embeddings[rows] if self.embeddings is not None else None)
+
+    def encode(self, compression: str = None, level: int = 1, min_bytes: int = 0) -> Dict[str, bytes]:
+        """
+        :param compression: Name of the compression of the columns, see COMPRESSIONS. Uncompressed if None.
+        :param level: Compression level, from 0 (fastest) to 9 (smallest).
+        :param min_bytes: Catalogs with less data are stored uncompressed, because it wouldn't pay off.
+        :return: Fields of the redis hash.
+        """
+        fields = {'type_ids': np.ascontiguousarray(self.type_ids, dtype=np.int32).tobytes(),
+                  'lengths': np.ascontiguousarray(self.lengths, dtype=np.int32).tobytes(),
+                  'structural_values': np.ascontiguousarray(self.structural_values, dtype=np.float64).tobytes()}
+        if self.embeddings is not None:
+            fields['embeddings'] = np.ascontiguousarray(self.embeddings, dtype=np.float32).tobytes()
+        if compression is not None and sum(len(data) for data in fields.values()) < min_bytes:
+            compression = None
+        if compression is not None:
+            compress, _ = COMPRESSIONS[compression]
+            fields = {column: compress(data, level) for column, data in fields.items()}
+
+        header = {'version': VERSION, 'count': len(self), 'width': self.type_ids.shape[1],
+                  'dimensions': self.embeddings.shape[1] if self.embeddings is not None else 0,
+                  'compression': compression,
+                  'type_pairs': {'{}_{}'.format(*pair): count for pair, count in self.type_pairs().items()}}
+        fields['header'] = json.dumps(header).encode()
+        return fields
+
+    @classmethod
+    def decode(cls, fields: Dict[bytes, bytes]) -> 'MetaPathCatalog':
+        """
+        :param fields: Fields of the redis hash as returned by HGETALL.
+        :raises ValueError: If the layout version or the compression is unknown.
+        """
+        header = json.loads(fields[b'header'].decode())
+        if header['version'] not in SUPPORTED_VERSIONS:
+            raise ValueError("Unknown catalog layout version {}".format(header['version']))
+        compression = header.get('compression')
+        if compression is not None:
+            if compression not in COMPRESSIONS:
+                raise ValueError("Unknown catalog compression {}".format(compression))
+            _, decompress = COMPRESSIONS[compression]
+            fields = {column: decompress(data) if column.decode() in COLUMNS else data
+                      for column, data in fields.items()}
+        count, width, dimensions = header['count'], header['width'], header['dimensions']
+        type_ids = np.frombuffer(fields[b'type_ids'], dtype=np.int32, count=count * width).reshape(count, width)
+        lengths = np.frombuffer(fields[b'lengths'], dtype=np.int32, count=count)
+        structural_values = np.frombuffer(fields[b'structural_values'], dtype=np.float64, count=count)
+        embeddings = None
+        if dimensions > 0:
+            embeddings = np.frombuffer(fields[b'embeddings'], dtype=np.float32,
+                                       count=count * dimensions).reshape(count, dimensions)
+        return cls(type_ids, lengths, structural_values, embeddings)
@@ -1,18 +1,64 @@
-from neo4j.v1 import GraphDatabase
-from neo4j.exceptions import ClientError
-from typing import List
+from collections import defaultdict
+from neo4j.exceptions import ClientError, TransientError
+from typing import Iterator, List, Optional, Tuple
 from util.datastructures import MetaPath
 import logging
-from api.redis_own import Redis
+from api.connections import connections
+from util.tracing import metrics, span
+
+# Codes of the errors, with which neo4j terminates a transaction after its timeout
+TIMEOUT_ERROR_CODES = ('Neo.ClientError.Transaction.TransactionTimedOut',
+                       'Neo.ClientError.Transaction.TransactionTimedOutClientConfiguration')
+
+
+class _TracedSession:
+    """
+    Counts and times the queries of a neo4j session.
+    """
+
+    def __init__(self, session):
+        self._session = session
+
+    def __enter__(self):
+        self._session.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return self._session.__exit__(exc_type, exc_val, exc_tb)
+
+    def run(self, statement, parameters=None, **kwparameters):
+        metrics.increment('metaexp_neo4j_queries_total')
+        with span('neo4j'):
+            return self._session.run(statement, parameters, **kwparameters)
+
+    def begin_transaction(self, *args, **kwargs):
+        # Queries of explicit transactions are traced like those of the session
+        return _TracedSession(self._session.begin_transaction(*args, **kwargs))
+
+    def __getattr__(self, item):
+        return getattr(self._session, item)
+
+
+class _TracedDriver:
+    def __init__(self, driver):
+        self._driver = driver
+
+    def session(self, *args, **kwargs):
+        return _TracedSession(self._driver.session(*args, **kwargs))
+
+    def __getattr__(self, item):
+        return getattr(self._driver, item)
 
 
 class Neo4j:
     def __init__(self, uri, user, password):
-        self._driver = GraphDatabase.driver(uri, auth=(user, password))
+        # The driver is shared by all instances for the same database in this process
+        self._driver = _TracedDriver(connections.neo4j_driver(uri, user, password))
         self.logger = logging.getLogger('MetaExp.{}'.format(__class__.__name__))
 
     def close(self):
-        self._driver.close()
+        # Sessions are returned to the pool of the shared driver, which stays open
+        pass
 
     def __enter__(self):
         return self
@@ -88,32 +134,79 @@ class Neo4j:
 
 
     def get_structural_value(self, meta_path: MetaPath, start_nodes: List, end_nodes: List, dataset_name: str):
-        path = meta_path.get_representation('query')
-        n = meta_path.number_node_types()
-        start_ids = '[' + ','.join(map(str, start_nodes)) + ']'
-        end_ids = '[' + ','.join(map(str, end_nodes)) + ']'
-        query = "MATCH p = {} " \
-                "WHERE ID(n0) in {} and ID(n{}) in {} " \
-                "RETURN count(*) as count;".format(path, start_ids, n - 1, end_ids)
-        self.logger.debug("Querying for '{}'".format(query))
+        return next(self.get_structural_values([meta_path], start_nodes, end_nodes))[1]
+
+    def get_structural_values(self, meta_paths: List[MetaPath], start_nodes: List[int], end_nodes: List[int],
+                              timeout: float = None) -> Iterator[Tuple[int, int]]:
+        """
+        Counts the instances of many meta-paths between the start and end nodes.
+        Meta-paths, which only differ in their last edge and node type, are counted by one query. Its text only
+        depends on the shared prefix and the node ids are sent as parameters, so neo4j can reuse the plan.
+        :param timeout: Seconds after which neo4j terminates a query, the timeout of the server if not given.
+        :return: Generator of the position of each meta-path in `meta_paths` and its number of instances, which
+                 yields the counts of each prefix as soon as they are received.
+        """
+        prefixes = defaultdict(list)
+        for position, meta_path in enumerate(meta_paths):
+            labels = meta_path.as_list()
+            if len(labels) < 3:
+                raise ValueError("Meta-path {} has no edge".format(meta_path))
+            prefixes[tuple(labels[:-2])].append(position)
+
         with self._driver.session() as session:
-            statement_result = session.run(query)
-            return list(statement_result.records())[0]['count']
+            for prefix, positions in prefixes.items():
+                query = "MATCH {}-[last_edge]-(last_node) " \
+                        "WHERE ID(n0) IN $start_ids AND ID(last_node) IN $end_ids " \
+                        "AND type(last_edge) IN $edge_types " \
+                        "RETURN type(last_edge) AS edge, labels(last_node) AS labels, count(*) AS count;" \
+                    .format(MetaPath(edge_node_list=list(prefix)).get_representation('query'))
+                last_hops = [meta_paths[position].as_list()[-2:] for position in positions]
+                self.logger.debug("Counting {} meta-paths with '{}'".format(len(positions), query))
+                counts = [0] * len(positions)
+                with session.begin_transaction(timeout=timeout) as transaction:
+                    records = list(transaction.run(query, start_ids=list(start_nodes), end_ids=list(end_nodes),
+                                                   edge_types=list({edge for edge, _ in last_hops})))
+                for record in records:
+                    for i, (edge, node) in enumerate(last_hops):
+                        if edge == record['edge'] and node in record['labels']:
+                            counts[i] += record['count']
+                yield from zip(positions, counts)
 
-    def test_whether_meta_path_exists(self, meta_path_query_string):
+    def test_whether_meta_path_exists(self, meta_path_query_string, timeout: float = None,
+                                      retries: int = 1) -> Optional[bool]:
+        """
+        :param timeout: Seconds after which neo4j terminates the query, the timeout of the server if not given.
+        :param retries: Number of times the query is repeated after a transient error, e.g. a deadlock.
+        :return: Whether the meta-path has an instance, None if the query timed out or failed transiently. Queries,
+                 which neo4j rejects, e.g. because of a type name it can't parse, have no instance.
+        """
         self.logger.debug("Received match query string {}".format(meta_path_query_string))
         query = "cypher planner=rule MATCH p = {} " \
                 "RETURN p limit 1".format(meta_path_query_string)
         self.logger.debug("Querying for '{}'".format(query))
         with self._driver.session() as session:
-            try:
-                record = session.run(query).single()
-                self.logger.debug(record)
-                return bool(record)
-            except ClientError:
-                self.logger.debug("Query {} timed out".format(query))
-                return False
+            for attempt in range(retries + 1):
+                try:
+                    with session.begin_transaction(timeout=timeout) as transaction:
+                        record = transaction.run(query).single()
+                    self.logger.debug(record)
+                    return bool(record)
+                except TransientError:
+                    self.logger.debug("Query {} failed transiently in attempt {}".format(query, attempt + 1))
+                except ClientError as e:
+                    if e.code in TIMEOUT_ERROR_CODES:
+                        self.logger.debug("Query {} timed out".format(query))
+                        return None
+                    # Repeating the query would fail the same way
+                    self.logger.warning("Query {} failed with {}: {}".format(query, e.code, e.message))
+                    return False
+            return None
 
+    def get_node_and_relationship_counts(self) -> Tuple[int, int]:
+        with self._driver.session() as session:
+            nodes = session.run("MATCH (n) RETURN count(n) AS count;").single()['count']
+            relationships = session.run("MATCH ()-[r]->() RETURN count(r) AS count;").single()['count']
+            return nodes, relationships
 
     def get_meta_paths_schema(self, length: int):
         """
@@ -1,55 +1,508 @@
 import redis
+import json
 import logging
-import pickle
+import math
+import re
+import threading
+import time
+from collections import defaultdict
 
 from util.datastructures import MetaPath
-from typing import List, Tuple
-from util.config import REDIS_HOST, REDIS_PORT, REDIS_PASSWORD
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from uuid import uuid4
+from api.connections import connections
+from api.meta_path_catalog import MetaPathCatalog
+from api.type_map_cache import type_map_cache
+from util.config import (CATALOG_SCAN_CHUNK, GENERATION_DELETION_DELAY, CATALOG_COMPRESSION, CATALOG_COMPRESSION_LEVEL,
+                         CATALOG_COMPRESSION_MIN_BYTES)
+from util.tracing import metrics
+
+# Score of meta-paths without structural value in the ranking of a catalog
+UNKNOWN_STRUCTURAL_VALUE_SCORE = float('-inf')
+
+
+def _payload_size(value) -> int:
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(_payload_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(_payload_size(key) + _payload_size(item) for key, item in value.items())
+    return 0
+
+
+class _TracedPipeline(redis.client.Pipeline):
+    def execute(self, raise_on_error=True):
+        commands = [args for args, options in self.command_stack]
+        response = super().execute(raise_on_error)
+        for args in commands:
+            metrics.increment('metaexp_redis_commands_total', command=str(args[0]).upper())
+        metrics.increment('metaexp_redis_bytes_total', _payload_size(commands) + _payload_size(response))
+        return response
+
+
+class _TracedClient(redis.StrictRedis):
+    """
+    Counts the commands and the transferred bytes of all requests to redis.
+    """
+
+    def execute_command(self, *args, **options):
+        response = super().execute_command(*args, **options)
+        metrics.increment('metaexp_redis_commands_total', command=str(args[0]).upper())
+        metrics.increment('metaexp_redis_bytes_total', _payload_size(args) + _payload_size(response))
+        return response
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return _TracedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
 
 
 class Redis:
+    """
+    Access to the meta-paths of a data set.
 
-    def __init__(self, data_set_name: str):
-        self._client = redis.StrictRedis(host=REDIS_HOST, port=REDIS_PORT, password=REDIS_PASSWORD)
+    Every import writes into a new generation, whose keys start with '<data set>_v<generation>'. The generation is
+    activated by switching the pointer '<data set>_active_generation' at once, so readers never see a partially
+    imported data set. As the server only reads embedded meta-paths, an imported generation stays pending in
+    '<data set>_pending_generation' until its embeddings are stored. Generation 0 denotes keys without generation,
+    i.e. '<data set>_...', which were imported before generations were introduced. An instance reads the generation,
+    that was active when it was first used.
+
+    All keys of a data set start with '<data set>_' and are stored on the redis instance, which the data set name
+    is assigned to, so that transactions, SCAN and commands on several keys like ZINTERSTORE see all of them.
+    Catalogs can therefore only be stored under keys of the data set.
+    """
+
+    def __init__(self, data_set_name: str, generation: int = None):
+        """
+        :param generation: Generation to read and write, the active generation by default.
+        """
+        self._client = _TracedClient(connection_pool=connections.redis_pool(data_set_name))
         self.data_set = data_set_name
+        self._generation = generation
         self.logger = logging.getLogger('MetaExp.{}'.format(__class__.__name__))
 
-    def meta_paths(self, start_type: str, end_type: str) -> List:
+    @property
+    def generation(self) -> int:
+        if self._generation is None:
+            self._generation = self.active_generation()
+        return self._generation
+
+    @property
+    def namespace(self) -> str:
+        """
+        :return: Prefix of all keys of the generation.
+        """
+        return self.data_set if self.generation == 0 else "{}_v{}".format(self.data_set, self.generation)
+
+    def active_generation(self) -> int:
+        generation = self._client.get("{}_active_generation".format(self.data_set))
+        return int(generation) if generation is not None else 0
+
+    def create_generation(self) -> 'Redis':
+        """
+        :return: Access to a new, inactive generation of this data set, e.g. for an import.
+        """
+        generation = self._client.incr("{}_generation_counter".format(self.data_set))
+        self._client.sadd("{}_generations".format(self.data_set), generation)
+        self.logger.info("Created generation {} of {}".format(generation, self.data_set))
+        return Redis(self.data_set, generation)
+
+    def pending_generation(self) -> Optional[int]:
+        """
+        :return: Generation of the last import, which waits for its embeddings, or None.
+        """
+        generation = self._client.get("{}_pending_generation".format(self.data_set))
+        return int(generation) if generation is not None else None
+
+    def mark_pending(self):
+        """
+        Marks the generation of this instance as imported. It replaces the active one, when its embeddings are stored.
+        """
+        self._client.set("{}_pending_generation".format(self.data_set), self.generation)
+        self.logger.info("Generation {} of {} waits for its embeddings".format(self.generation, self.data_set))
+
+    def activate_pending(self) -> bool:
+        """
+        Activates the generation of this instance, if it is still the pending one, e.g. after its embeddings were
+        stored, and deletes the older generations later.
+        :return: Whether the generation was activated. It isn't, if a later import is pending already.
+        """
+        if self.pending_generation() != self.generation:
+            self.logger.info("Generation {} of {} was replaced by a later import".format(self.generation,
+                                                                                       self.data_set))
+            return False
+        self.delete_generations_later(self.activate())
+        return True
+
+    def activate(self) -> List[int]:
+        """
+        Makes the generation of this instance the active one and increments the import generation counter
+        in the same transaction. The generation isn't pending anymore.
+        :return: Older generations, which aren't used anymore and can be deleted.
+        """
+        pending = self.pending_generation()
+        pipe = self._client.pipeline(transaction=True)
+        pipe.set("{}_active_generation".format(self.data_set), self.generation)
+        pipe.incr("{}_import_generation".format(self.data_set))
+        pipe.smembers("{}_generations".format(self.data_set))
+        if pending is not None and pending <= self.generation:
+            pipe.delete("{}_pending_generation".format(self.data_set))
+        generations = pipe.execute()[2]
+        self.logger.info("Activated generation {} of {}".format(self.generation, self.data_set))
+        # Generations of imports started later may still be written
+        return [0] + sorted(generation for generation in map(int, generations) if generation < self.generation)
+
+    def delete_generation(self, generation: int, chunk_size: int = CATALOG_SCAN_CHUNK) -> int:
+        """
+        Removes all keys of an inactive generation with SCAN and UNLINK, so that redis frees the memory in the
+        background and isn't blocked.
+        :return: Number of deleted keys.
+        """
+        if generation == self.active_generation():
+            raise ValueError("Generation {} of {} is active".format(generation, self.data_set))
+        generation_keys = Redis(self.data_set, generation)
+        deleted = 0
+        chunk = []
+        for key in self._client.scan_iter(match='{}_*'.format(generation_keys.namespace), count=chunk_size):
+            if generation == 0 and not self._is_unversioned_key(key.decode()):
+                continue
+            chunk.append(key)
+            if len(chunk) == chunk_size:
+                deleted += self._client.unlink(*chunk)
+                chunk = []
+        if chunk:
+            deleted += self._client.unlink(*chunk)
+        self._client.srem("{}_generations".format(self.data_set), generation)
+        self.logger.info("Deleted {} keys of generation {} of {}".format(deleted, generation, self.data_set))
+        return deleted
+
+    def delete_generations_later(self, generations: List[int], delay: float = GENERATION_DELETION_DELAY):
+        """
+        Deletes the generations in a background thread after `delay` seconds, so that requests, which started
+        before the activation of a newer generation, can still read them.
+        """
+        def delete():
+            for generation in generations:
+                try:
+                    self.delete_generation(generation)
+                except Exception:
+                    self.logger.exception("Deleting generation {} of {} failed".format(generation, self.data_set))
+
+        timer = threading.Timer(delay, delete)
+        timer.start()
+        return timer
+
+    def _is_unversioned_key(self, key: str) -> bool:
+        control_keys = ['active_generation', 'generation_counter', 'generations', 'import_generation',
+                        'existence_checks', 'import_status', 'pending_generation']
+        suffix = key[len(self.data_set) + 1:]
+        return suffix not in control_keys and not re.match(r'^v\d+_', suffix)
+
+    def meta_paths(self, start_type: str, end_type: str, node_types: List[str] = None,
+                   edge_types: List[str] = None, offset: int = 0, limit: int = None) -> List:
+        """
+        :param node_types: If given, only meta-paths whose nodes are all of these types are returned.
+        :param edge_types: If given, only meta-paths whose edges are all of these types are returned.
+        :param offset: Number of meta-paths with the highest structural values to skip, if `limit` is given.
+        :param limit: If given, at most `limit` meta-paths are returned in descending order of structural value.
+        """
         self.logger.debug("Retrieving meta paths...")
-        pickled_list = self._client.lrange("{}_{}_{}_embedded".format(self.data_set, start_type, end_type), 0, -1)
-        self.logger.debug("Number of meta paths for {} and {} is {}".format(start_type, end_type, len(pickled_list)))
-        return [pickle.loads(pickled_entry) for pickled_entry in pickled_list]
+        key = "{}_{}_{}_embedded".format(self.namespace, start_type, end_type)
+        catalog = self.catalog(key)
+        if catalog is None:
+            return []
+        if limit is not None:
+            catalog = catalog.select(self.ranked_rows(key, offset, limit, node_types, edge_types))
+        elif node_types is not None or edge_types is not None:
+            catalog = catalog.select(self.filtered_rows(key, node_types, edge_types))
+        self.logger.debug("Number of meta paths for {} and {} is {}".format(start_type, end_type, len(catalog)))
+        node_types = {int(key): value for key, value in self.id_to_node_type_map().items()}
+        edge_types = {int(key): value for key, value in self.id_to_edge_type_map().items()}
+        return catalog.to_meta_paths(node_types, edge_types)
+
+    def top_meta_paths(self, start_type: str, end_type: str, k: int) -> List:
+        """
+        :return: The k meta-paths with the highest structural values.
+        """
+        return self.meta_paths(start_type, end_type, offset=0, limit=k)
 
-    def id_to_edge_type_map(self):
-        return self._client.hgetall("{}_edge_type_map".format(self.data_set))
+    def catalog(self, key: str) -> MetaPathCatalog:
+        """
+        :return: The meta-paths stored in the hash `key` or None, if there is no such hash.
+        """
+        fields = self._client.hgetall(key)
+        return MetaPathCatalog.decode(fields) if fields else None
 
-    def id_to_node_type_map(self):
-        return self._client.hgetall("{}_node_type_map".format(self.data_set))
+    def filtered_rows(self, key: str, node_types: List[str] = None, edge_types: List[str] = None) -> List[int]:
+        """
+        Computes the rows of the catalog `key` with the type indexes inside of redis.
+        :param node_types: If given, only rows of meta-paths whose nodes are all of these types are returned.
+        :param edge_types: If given, only rows of meta-paths whose edges are all of these types are returned.
+        """
+        excluded = self._excluded_type_indexes(key, node_types, edge_types)
+        # Every meta-path of the catalog is in the index of all rows
+        return sorted(int(row) for row in self._client.sdiff(self._index_key(key, 'all'), *excluded))
 
-    def node_type_to_id_map(self):
-        return self._client.hgetall("{}_node_type_map_reverse".format(self.data_set))
+    def _excluded_type_indexes(self, key: str, node_types: List[str] = None, edge_types: List[str] = None) -> List[str]:
+        excluded = []
+        if node_types is not None:
+            excluded.extend(self._index_key(key, 'node', type_id) for type_name, type_id in
+                            self.node_type_to_id_map().items() if type_name not in node_types)
+        if edge_types is not None:
+            excluded.extend(self._index_key(key, 'edge', type_id) for type_name, type_id in
+                            self.edge_type_to_id_map().items() if type_name not in edge_types)
+        return excluded
 
-    def edge_type_to_id_map(self):
-        return self._client.hgetall("{}_edge_type_map_reverse".format(self.data_set))
+    def ranked_rows(self, key: str, offset: int, limit: int, node_types: List[str] = None,
+                    edge_types: List[str] = None) -> List[int]:
+        """
+        Pages through the rows of the catalog `key` in descending order of structural value. Meta-paths without
+        structural value come last. If types are given, the filtered rows are ranked within one transaction.
+        """
+        if limit <= 0:
+            return []
+        ranking = self._index_key(key, 'by_structural_value')
+        if node_types is None and edge_types is None:
+            return [int(row) for row in self._client.zrevrange(ranking, offset, offset + limit - 1)]
 
-    def get_all_meta_paths(self):
-        result = []
-        # TODO: Match only keys without '_embedding'
-        for key in self._client.keys(pattern='{}_[0-9-]*_[0-9-]*'.format(self.data_set)):
-            result.extend([pickle.loads(pickled_entry) for pickled_entry in self._client.lrange(key, 0, -1)])
-        return result
+        filtered, filtered_ranking = self._index_key(key, 'tmp', uuid4().hex), self._index_key(key, 'tmp', uuid4().hex)
+        excluded = self._excluded_type_indexes(key, node_types, edge_types)
+        pipe = self._client.pipeline(transaction=True)
+        pipe.sdiffstore(filtered, self._index_key(key, 'all'), *excluded)
+        # Members of a set have the score 1, which must not change the structural value
+        pipe.zinterstore(filtered_ranking, {ranking: 1, filtered: 0})
+        pipe.zrevrange(filtered_ranking, offset, offset + limit - 1)
+        pipe.delete(filtered, filtered_ranking)
+        return [int(row) for row in pipe.execute()[2]]
 
-    def store_embeddings(self, mp_embeddings_list: List[Tuple[MetaPath, List[float]]]):
+    @staticmethod
+    def _index_key(catalog_key: str, kind: str, type_id=None) -> str:
+        if type_id is None:
+            return "{}_{}".format(catalog_key, kind)
+        return "{}_{}_{}".format(catalog_key, kind, type_id)
+
+    def type_pairs(self, embedded: bool = True) -> Dict[Tuple[str, str], int]:
+        """
+        :param embedded: Whether to count the embedded meta-paths used by the server or the imported ones.
+        :return: Number of meta-paths between each pair of start and end node type.
+        """
+        node_types = {int(key): value for key, value in self.id_to_node_type_map().items()}
+        pairs = {}
+        for pair, count in self._client.hgetall(self._type_pairs_key(embedded)).items():
+            start_id, end_id = pair.decode().split('_')
+            pairs[(node_types[int(start_id)], node_types[int(end_id)])] = int(count)
+        return pairs
+
+    def _type_pairs_key(self, embedded: bool) -> str:
+        return "{}_{}".format(self.namespace, 'embedded_type_pairs' if embedded else 'type_pairs')
+
+    def existence_checks(self, fingerprint: str) -> Dict[str, str]:
+        """
+        Results of the existence checks of previous imports. They are kept across generations in the hash
+        '<data set>_existence_checks' as long as the graph doesn't change.
+        :param fingerprint: Fingerprint of the graph. Results for another fingerprint are deleted.
+        :return: Result of each checked meta-path as stored by store_existence_checks.
+        """
+        key = "{}_existence_checks".format(self.data_set)
+        checks = {field.decode(): value.decode() for field, value in self._client.hgetall(key).items()}
+        if checks.pop('fingerprint', None) != fingerprint:
+            self.logger.info("Graph of {} changed, discarding {} existence checks".format(self.data_set, len(checks)))
+            self._client.delete(key)
+            return {}
+        return checks
+
+    def store_existence_checks(self, fingerprint: str, checks: Dict[str, str]):
+        """
+        :param checks: Result of each checked meta-path, given as string of type ids separated by '|'.
+        """
+        if checks:
+            self._client.hmset("{}_existence_checks".format(self.data_set), dict(checks, fingerprint=fingerprint))
+
+    def store_catalog(self, key: str, catalog: MetaPathCatalog):
+        """
+        Replaces the meta-paths stored in the hash `key`. Readers never see a partially written catalog.
+        """
+        self.store_catalogs({key: catalog})
+
+    def store_catalogs(self, catalogs: Dict[str, MetaPathCatalog], increment_import_generation: bool = False):
+        """
+        Replaces several catalogs and their indexes within one transaction. Catalogs are compressed as configured
+        by CATALOG_COMPRESSION, readers decompress them according to their header.
+        For every catalog '<key>', the set '<key>_all' contains all rows and the sets '<key>_node_<type id>' and
+        '<key>_edge_<type id>' contain the rows of the meta-paths with that type. The sorted set
+        '<key>_by_structural_value' ranks the rows by structural value, rows without one have the score -inf.
+        The set '<key>_indexes' lists these sets, so that they can be replaced. The hashes '<data set>_type_pairs'
+        and '<data set>_embedded_type_pairs' count the meta-paths of each pair of start and end type ids as given by the
+        headers of the catalogs. Pairs, which only the replaced catalog contained, are removed.
+        :param catalogs: Catalog by key. Keys may also be given as bytes, e.g. as returned by SCAN.
+        :param increment_import_generation: Whether the import generation is incremented in the same transaction,
+                                            so that cached catalogs are invalidated exactly when the new ones appear.
+        """
+        # The index keys are formatted from the catalog key, which must be a string for that
+        catalogs = {key.decode() if isinstance(key, bytes) else key: catalog for key, catalog in catalogs.items()}
+        for key in catalogs.keys():
+            if not key.startswith('{}_'.format(self.data_set)):
+                raise ValueError("Catalog {} isn't a key of {} and may be stored on another redis instance"
+                                 .format(key, self.data_set))
+        outdated = self._outdated_catalogs(catalogs.keys())
+
+        pipe = self._client.pipeline(transaction=True)
+        for (key, catalog), (outdated_indexes, outdated_header) in zip(catalogs.items(), outdated):
+            fields = catalog.encode(CATALOG_COMPRESSION, CATALOG_COMPRESSION_LEVEL, CATALOG_COMPRESSION_MIN_BYTES)
+            header = json.loads(fields['header'].decode())
+            self._delete_catalog(pipe, key, outdated_indexes, outdated_header, keep=header)
+            pipe.hmset(key, fields)
+            indexes = {self._index_key(key, 'all'): list(range(len(catalog)))}
+            rows_by_node_type, rows_by_edge_type = catalog.rows_by_type()
+            indexes.update({self._index_key(key, 'node', type_id): rows for type_id, rows in rows_by_node_type.items()})
+            indexes.update({self._index_key(key, 'edge', type_id): rows for type_id, rows in rows_by_edge_type.items()})
+            for index_key, rows in indexes.items():
+                if rows:
+                    pipe.sadd(index_key, *rows)
+            # Meta-paths without structural value are ranked last, so that paging still reaches them
+            ranking = {row: UNKNOWN_STRUCTURAL_VALUE_SCORE if math.isnan(value) else value
+                       for row, value in enumerate(catalog.structural_values.tolist())}
+            if ranking:
+                pipe.zadd(self._index_key(key, 'by_structural_value'), ranking)
+            pipe.sadd(self._index_key(key, 'indexes'), self._index_key(key, 'by_structural_value'), *indexes.keys())
+            if header['type_pairs']:
+                pipe.hmset(self._type_pairs_key(header['dimensions'] > 0), header['type_pairs'])
+        if increment_import_generation:
+            pipe.incr("{}_import_generation".format(self.data_set))
+        pipe.execute()
+
+    def delete_catalogs(self, keys: List[str]):
+        """
+        Deletes catalogs, their indexes and their counts of meta-paths by type pair within one transaction.
+        """
+        outdated = self._outdated_catalogs(keys)
+        pipe = self._client.pipeline(transaction=True)
+        for key, (outdated_indexes, outdated_header) in zip(keys, outdated):
+            self._delete_catalog(pipe, key, outdated_indexes, outdated_header)
+        pipe.execute()
+
+    def _outdated_catalogs(self, keys: Iterable[str]) -> List[Tuple[List[bytes], Optional[Dict]]]:
+        """
+        :return: Index keys and header of the stored catalog of each key.
+        """
+        pipe = self._client.pipeline(transaction=False)
+        for key in keys:
+            pipe.smembers(self._index_key(key, 'indexes'))
+            pipe.hget(key, 'header')
+        # Catalogs, which are still lists, e.g. during the migration, have no header
+        responses = pipe.execute(raise_on_error=False)
+        return [(list(indexes), json.loads(header.decode()) if isinstance(header, bytes) else None)
+                for indexes, header in zip(responses[::2], responses[1::2])]
+
+    def _delete_catalog(self, pipe, key: str, indexes: List[bytes], header: Optional[Dict], keep: Dict = None):
+        """
+        :param keep: Header of the catalog, which replaces the deleted one. Its type pairs are overwritten anyway.
+        """
+        pipe.delete(key, self._index_key(key, 'indexes'), *indexes)
+        # Catalogs stored before their header had type pairs are only overwritten
+        if header is None or 'type_pairs' not in header:
+            return
+        embedded = header['dimensions'] > 0
+        pairs = [pair for pair in header['type_pairs'] if keep is None or (keep['dimensions'] > 0) != embedded
+                 or pair not in keep['type_pairs']]
+        if pairs:
+            pipe.hdel(self._type_pairs_key(embedded), *pairs)
+
+    def import_generation(self) -> int:
+        """
+        Reads the active generation at the same time, so that this instance reads the data the counter belongs to.
+        :return: Counter, which is incremented after every import of this data set and every change of the
+                 active generation.
+        """
+        generation, active_generation = self._client.mget("{}_import_generation".format(self.data_set),
+                                                          "{}_active_generation".format(self.data_set))
+        if self._generation is None:
+            self._generation = int(active_generation) if active_generation is not None else 0
+        return int(generation) if generation is not None else 0
+
+    def increment_import_generation(self) -> int:
+        return self._client.incr("{}_import_generation".format(self.data_set))
+
+    def id_to_edge_type_map(self) -> Dict[str, str]:
+        return self._type_map('edge_type_map')
+
+    def id_to_node_type_map(self) -> Dict[str, str]:
+        return self._type_map('node_type_map')
+
+    def node_type_to_id_map(self) -> Dict[str, str]:
+        return self._type_map('node_type_map_reverse')
+
+    def edge_type_to_id_map(self) -> Dict[str, str]:
+        return self._type_map('edge_type_map_reverse')
+
+    def _type_map(self, name: str) -> Dict[str, str]:
+        key = "{}_{}".format(self.namespace, name)
+        return type_map_cache.get(self.data_set, self.generation, name, lambda: self._client.hgetall(key))
+
+    def get_all_meta_paths(self) -> List[MetaPath]:
+        return list(self.iter_meta_paths())
+
+    def iter_meta_paths(self, chunk_size: int = CATALOG_SCAN_CHUNK) -> Iterator[MetaPath]:
+        """
+        Yields the meta-paths of all catalogs, which were written by the importer, i.e. which consist of type ids.
+        Keys are iterated with SCAN, so that redis isn't blocked, and only `chunk_size` catalogs are fetched at once.
+        """
+        key_pattern = re.compile(r'^{}_-?\d+_-?\d+$'.format(re.escape(self.namespace)))
+        seen = set()
+        chunk = []
+        for key in self._client.scan_iter(match='{}_*'.format(self.namespace), count=chunk_size):
+            # SCAN may return a key more than once
+            if key in seen or not key_pattern.match(key.decode()):
+                continue
+            seen.add(key)
+            chunk.append(key)
+            if len(chunk) == chunk_size:
+                yield from self._fetch_meta_paths(chunk)
+                chunk = []
+        yield from self._fetch_meta_paths(chunk)
+
+    def _fetch_meta_paths(self, keys: List[bytes]) -> Iterator[MetaPath]:
+        pipe = self._client.pipeline(transaction=False)
+        for key in keys:
+            pipe.hgetall(key)
+        for fields in pipe.execute():
+            if fields:
+                yield from MetaPathCatalog.decode(fields).to_meta_paths()
+
+    def store_embeddings(self, mp_embeddings_list: List[Tuple[MetaPath, List[float]]],
+                         progress: Callable[..., None] = None) -> Dict[str, float]:
+        """
+        Replaces the embedded meta-paths of each pair of start and end type.
+        :param mp_embeddings_list: Meta-paths consisting of type ids and their embeddings.
+        :param progress: Called with the number of stored and the total number of meta-paths.
+        :return: Number of stored meta-paths, duration and throughput.
+        """
+        start = time.perf_counter()
+        node_type_map = self.id_to_node_type_map()
+        grouped_meta_paths = defaultdict(list)
         for mp_object, embedding in mp_embeddings_list:
             mp = mp_object.get_representation('UI')
-            structural_value = mp_object.get_structural_value()
-            self.logger.debug("Got mp {}".format(mp))
-            node_type_map, edge_type_map = self.id_to_node_type_map(), self.id_to_edge_type_map()
-            start_type, end_type = node_type_map[str(mp[0]).encode()].decode(), node_type_map[str(mp[-1]).encode()].decode()
-            node_list = [node_type_map[str(node).encode()].decode() for node in mp[::2]]
-            edge_list = [edge_type_map[str(edge).encode()].decode() for edge in mp[1::2]]
-            meta_path = MetaPath(nodes=node_list, edges=edge_list)
+            start_type, end_type = node_type_map[str(mp[0])], node_type_map[str(mp[-1])]
+            meta_path = MetaPath(edge_node_list=mp)
             meta_path.store_embedding(embedding)
-            meta_path.store_structural_value(structural_value)
-            self.logger.debug("Created meta path object {}".format(meta_path))
-            self._client.lpush("{}_{}_{}_embedded".format(self.data_set, start_type, end_type), pickle.dumps(meta_path))
+            meta_path.store_structural_value(mp_object.get_structural_value())
+            grouped_meta_paths[(start_type, end_type)].append(meta_path)
+
+        catalogs = {}
+        encoded = 0
+        for (start_type, end_type), meta_paths in grouped_meta_paths.items():
+            catalogs["{}_{}_{}_embedded".format(self.namespace, start_type, end_type)] = \
+                MetaPathCatalog.from_meta_paths(meta_paths)
+            encoded += len(meta_paths)
+            if progress is not None:
+                progress(encoded, len(mp_embeddings_list), 'encode embeddings')
+        self.store_catalogs(catalogs, increment_import_generation=True)
+
+        seconds = time.perf_counter() - start
+        statistics = {'meta_paths': len(mp_embeddings_list), 'catalogs': len(catalogs), 'seconds': seconds,
+                      'meta_paths_per_second': len(mp_embeddings_list) / seconds if seconds > 0 else 0.0}
+        self.logger.info("Stored {meta_paths} embedded meta-paths in {catalogs} catalogs within {seconds:.2f}s "
+                         "({meta_paths_per_second:.0f} meta-paths/s)".format(**statistics))
+        if progress is not None:
+            progress(len(mp_embeddings_list), len(mp_embeddings_list), 'store embeddings')
+        return statistics
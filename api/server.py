@@ -1,5 +1,4 @@
-from flask import Flask, jsonify, request, abort, session
-from flask_session import Session
+from flask import Flask, jsonify, request, abort, session, Response
 from flask_cors import CORS
 import json
 import os
@@ -7,13 +6,22 @@ import time
 import datetime
 from flask_ask import Ask, statement
 import logging
-from typing import Dict
+from typing import Dict, List, Tuple
 
-import embeddings.meta2vec
 from util.config import *
 from active_learning.active_learner import UncertaintySamplingAlgorithm
 from explanation.explanation import SimilarityScore, Explanation
 from api.redis_own import Redis
+from util.datastructures import MetaPath
+from api.catalog_cache import catalog_cache
+from api.session_store import RedisSessionInterface
+from api.session_codec import SessionCodec
+from api.jobs import JobManager
+from api.worker_metrics import WorkerMetrics
+from api.speculation import SpeculativeSelector, SPECULATION_KEY
+from api.connections import connections
+from util.tracing import span, finish_trace
+from util.lazy_logging import LazyFormat
 from util.metapaths_database_importer import RedisImporter
 
 
@@ -22,49 +30,135 @@ ask = Ask(app, '/alexa')
 set_up_logger()
 logger = logging.getLogger('MetaExp.Server')
 
-# TODO: Change if we have a database in the background
-SESSION_TYPE = 'filesystem'
-SESSION_FILE_DIR = SESSION_CACHE_DIR
-SESSION_FILE_THRESHOLD = SESSION_THRESHOLD
-# We need leading zeros on the modifier
-SESSION_FILE_MODE = int(SESSION_MODE, 8)
-SESSION_PERMANENT = True
+PERMANENT_SESSION_LIFETIME = SESSION_LIFETIME
 app.config.from_object(__name__)
 # TODO: Change for deployment, e.g. use environment variable
 app.config["SECRET_KEY"] = "37Y,=i9.,U3RxTx92@9j9Z[}"
-Session(app)
+
+
+def load_meta_paths(data_set_name, start_type, end_type, node_types=None, edge_types=None, limit=None):
+    return catalog_cache.meta_paths(Redis(data_set_name), start_type, end_type, node_types, edge_types, limit=limit)
+
+
+app.session_interface = RedisSessionInterface(Redis(SESSION_KEY_PREFIX), SessionCodec(load_meta_paths))
+speculative_selector = SpeculativeSelector(app.session_interface, int(SESSION_LIFETIME.total_seconds()))
+worker_metrics = WorkerMetrics(Redis(METRICS_KEY_PREFIX))
 
 CORS(app, supports_credentials=True, resources={r"/*": {
     "origins": ["https://hpi.de/mueller/metaexp-demo-api/", "http://172.20.14.22:3000", "http://localhost",
                 "http://localhost:3000", "http://metaexp.herokuapp.com"]}})
 
 
+@app.teardown_request
+def record_request_latency(exception):
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    phases = finish_trace(route)
+    logger.debug(LazyFormat("Phases of {}: {}", route, phases))
+    worker_metrics.start()
+
+
+@app.route('/metrics', methods=['GET'])
+def send_metrics():
+    """
+    :return: Latencies, phase durations, redis and neo4j calls and cache hits of all server processes in the
+             prometheus text format, labeled by worker
+    """
+    return Response(worker_metrics.prometheus_text(), mimetype='text/plain; version=0.0.4')
+
+
 def run(port, hostname, debug_mode):
     app.run(host=hostname, port=port, debug=debug_mode, threaded=True)
 
 
+def import_meta_paths(job, enable_existence_check=True, concurrency=EXISTENCE_CHECK_CONCURRENCY,
+                      timeout=EXISTENCE_CHECK_TIMEOUT):
+    RedisImporter(enable_existence_check=enable_existence_check, progress=job.report_progress,
+                  concurrency=concurrency, timeout=timeout).import_all()
+
+
+def import_test_data_set(job):
+    RedisImporter(enable_existence_check=False, progress=job.report_progress).import_data_set(
+        {'name': 'Helmholtz', 'bolt-url': 'bolt://172.20.14.22:7697', 'username': 'neo4j',
+         'password': ''})
+
+
+def train_embeddings(job, database):
+    # Tensorflow is only loaded by the process, which executes the training
+    import embeddings.meta2vec
+    redis = Redis(database)
+    # Embeds the meta-paths of the last import, if it isn't active yet
+    pending = redis.pending_generation()
+    if pending is not None:
+        redis = Redis(database, pending)
+    logger.debug("Start computation of embeddings...")
+    job.report_progress(0, phase='training')
+    meta_path_list_embeddings = embeddings.meta2vec.calculate_metapath_embeddings(redis.iter_meta_paths(),
+                                                                                  metapath_embedding_size=30)
+    logger.debug(LazyFormat("Received {} embeddings", len(meta_path_list_embeddings)))
+    redis.store_embeddings(meta_path_list_embeddings, progress=job.report_progress)
+    if pending is not None:
+        redis.activate_pending()
+
+
+jobs = JobManager(Redis(JOB_KEY_PREFIX))
+jobs.register('redis-import', import_meta_paths, ['enable_existence_check', 'concurrency', 'timeout'])
+jobs.register('test-import', import_test_data_set)
+jobs.register('train-embeddings', train_embeddings, ['database'])
+
+
 @app.route('/redis-import', methods=['GET'])
 def redis_import():
-    RedisImporter(enable_existence_check=True).import_all()
-    return jsonify({'status': 200})
+    return jsonify({'status': 202, 'job_id': jobs.submit('redis-import', enable_existence_check=True)}), 202
 
 
 @app.route('/test-import', methods=['GET'])
 def test_import():
-    RedisImporter(enable_existence_check=False).import_data_set(
-        {'name': 'Helmholtz', 'bolt-url': 'bolt://172.20.14.22:7697', 'username': 'neo4j',
-         'password': ''})
-    return jsonify({'status': 200})
+    return jsonify({'status': 202, 'job_id': jobs.submit('test-import')}), 202
 
 
 @app.route('/train-embeddings/<string:database>', methods=['GET'])
 def train_embedding(database):
-    redis = Redis(database)
-    logger.debug("Start computation of embeddings...")
-    meta_path_list_embeddings = embeddings.meta2vec.calculate_metapath_embeddings(redis.get_all_meta_paths(),
-                                                                                  metapath_embedding_size=30)
-    logger.debug("Received embeddings {}".format(meta_path_list_embeddings))
-    redis.store_embeddings(meta_path_list_embeddings)
+    return jsonify({'status': 202, 'job_id': jobs.submit('train-embeddings', database=database)}), 202
+
+
+@app.route('/jobs/<string:kind>', methods=['POST'])
+def submit_job(kind):
+    """
+    Starts a background job. The parameters of the job are given as json object.
+    :return: The id of the job, which is used to query its status.
+    """
+    if kind not in jobs.kinds():
+        abort(404)
+    try:
+        parameters = jobs.check_parameters(kind, request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({'status': 400, 'error': str(e)}), 400
+    return jsonify({'status': 202, 'job_id': jobs.submit(kind, **parameters)}), 202
+
+
+@app.route('/jobs/<string:job_id>', methods=['GET'])
+def send_job_status(job_id):
+    status = jobs.status(job_id)
+    if status is None:
+        abort(404)
+    return jsonify(status)
+
+
+@app.route('/jobs/<string:job_id>/progress', methods=['GET'])
+def send_job_progress(job_id):
+    """
+    :return: Number of processed meta-paths, e.g. checked for existence or embedded, and the status of the job.
+    """
+    progress = jobs.progress(job_id)
+    if progress is None:
+        abort(404)
+    return jsonify(progress)
+
+
+@app.route('/jobs/<string:job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    if not jobs.cancel(job_id):
+        abort(404)
     return jsonify({'status': 200})
 
 
@@ -74,7 +168,7 @@ def login():
     data = request.get_json()
 
     # retrieve data from login
-    logger.debug("Login route received data: {}".format(data))
+    logger.debug(LazyFormat("Login route received data: {}", data))
     session['username'] = data['username']
     session['dataset'] = data['dataset']
     session['purpose'] = data['purpose']
@@ -92,10 +186,10 @@ def login():
 
     redis = Redis(session['dataset']['name'])
 
-    # TODO feed this selection to the ALgorithms
-    session['selected_node_types'] = [(node_type.decode(), True) for node_type in redis.node_type_to_id_map().keys()]
-    session['selected_edge_types'] = [(edge_type.decode(), True) for edge_type in redis.edge_type_to_id_map().keys()]
-    logger.debug(session)
+    session['selected_node_types'] = [(node_type, True) for node_type in redis.node_type_to_id_map().keys()]
+    session['selected_edge_types'] = [(edge_type, True) for edge_type in redis.edge_type_to_id_map().keys()]
+    logger.debug(LazyFormat("Selected {} node and {} edge types", len(session['selected_node_types']),
+                            len(session['selected_edge_types'])))
     return jsonify({'status': 200})
 
 
@@ -124,6 +218,32 @@ def stop_meta_path_rating():
     return jsonify({'status': 200})
 
 
+def select_types(selection: List[Tuple[str, bool]], type_names: List[str]) -> List[Tuple[str, bool]]:
+    """
+    :param type_names: Names of the types to select, all other types are deselected.
+    """
+    return [(type_name, type_name in type_names) for type_name, _ in selection]
+
+
+def selected_types(selection: List[Tuple[str, bool]]) -> List[str]:
+    """
+    :return: The selected types or None, if all types are selected and no meta-path has to be filtered.
+    """
+    if all(selected for _, selected in selection):
+        return None
+    return [type_name for type_name, selected in selection if selected]
+
+
+@app.route("/type-pairs", methods=["GET"])
+def send_type_pairs():
+    """
+    :return: Pairs of start and end node types, between which meta-paths can be rated, and their number of meta-paths
+    """
+    type_pairs = Redis(session['dataset']['name']).type_pairs()
+    return jsonify([{'start_label': start_type, 'end_label': end_type, 'meta_paths': count}
+                    for (start_type, end_type), count in sorted(type_pairs.items())])
+
+
 @app.route("/node-types", methods=["POST"])
 def receive_meta_path_start_and_end_label():
     redis = Redis(session['dataset']['name'])
@@ -134,14 +254,27 @@ def receive_meta_path_start_and_end_label():
     start_node_ids = json_response['start_node_ids']
     end_node_ids = json_response['end_node_ids']
 
-    logger.debug("Recieved following meta-paths from redis: {}".format(redis.meta_paths(start_type, end_type)))
-    session['active_learning_algorithm'] = UncertaintySamplingAlgorithm(
-        redis.meta_paths(start_type, end_type),
-        hypothesis='Gaussian Process')
+    # Optionally restricts the meta-paths to the given types
+    if 'node_types' in json_response:
+        session['selected_node_types'] = select_types(session['selected_node_types'], json_response['node_types'])
+    if 'edge_types' in json_response:
+        session['selected_edge_types'] = select_types(session['selected_edge_types'], json_response['edge_types'])
+    node_types = selected_types(session['selected_node_types'])
+    edge_types = selected_types(session['selected_edge_types'])
+    # Large catalogs are loaded lazily, starting with the meta-paths with the highest structural values
+    limit = json_response.get('limit')
+    if limit is None and redis.type_pairs().get((start_type, end_type), 0) > LARGE_CATALOG_META_PATHS:
+        limit = INITIAL_META_PATHS
+    meta_paths = catalog_cache.meta_paths(redis, start_type, end_type, node_types, edge_types, limit=limit)
+    logger.debug(LazyFormat("Received {} meta-paths from redis", len(meta_paths)))
+    session['active_learning_algorithm'] = UncertaintySamplingAlgorithm(meta_paths, hypothesis='Gaussian Process')
+    session['active_learning_algorithm'].catalog = (session['dataset']['name'], start_type, end_type, node_types,
+                                                    edge_types, limit)
     session['similarity_score'] = SimilarityScore(session['active_learning_algorithm'].get_complete_rating,
                                                   session['dataset'],
                                                   start_node_ids,
                                                   end_node_ids)
+    count_node_set_instances(meta_paths)
 
     return jsonify({'status': 200})
 
@@ -152,20 +285,41 @@ def send_node_types():
     """		
     return jsonify(session['selected_node_types'])
 
-@app.route("/next-meta-paths/<int:batch_size>", methods=["GET"])
-def send_next_metapaths_to_rate(batch_size):
+def count_node_set_instances(meta_paths: List[MetaPath], first_id: int = 0):
     """
-        Returns the next `batchsize` meta-paths to rate.
-
-        Metapaths are formatted like this:
-        {'id': 3,
-        'metapath': ['Phenotype', 'HAS', 'Association', 'HAS', 'SNP', 'HAS', 'Phenotype'],
-        'rating': 0.5}
+    Replaces the structural values of the similarity score by the number of instances of the meta-paths between the
+    start and end nodes of the session. The meta-paths have the ids `first_id`, `first_id + 1`, ...
     """
+    with span('structural_values'):
+        session['similarity_score'].count_node_set_instances(meta_paths, first_id)
+
 
+def expand_meta_paths(algorithm, batch_size: int):
+    """
+    Adds the next meta-paths by structural value to an algorithm, which started on a part of a large catalog only,
+    once less than a batch of them is left to rate.
+    """
+    if algorithm.catalog is None or len(algorithm.catalog) < 6 or algorithm.catalog[5] is None:
+        return
+    if not algorithm.has_one_batch_left(batch_size):
+        return
+    data_set_name, start_type, end_type, node_types, edge_types, limit = algorithm.catalog
+    meta_paths = catalog_cache.meta_paths(Redis(data_set_name), start_type, end_type, node_types, edge_types,
+                                          offset=limit, limit=EXPANSION_META_PATHS)
+    if meta_paths:
+        logger.info("Expanding session by {} meta-paths".format(len(meta_paths)))
+        first_id = len(algorithm.meta_paths)
+        algorithm.extend(meta_paths)
+        if 'similarity_score' in session:
+            count_node_set_instances(meta_paths, first_id)
+        algorithm.catalog = (data_set_name, start_type, end_type, node_types, edge_types, limit + len(meta_paths))
+
+
+def next_batch(batch_size: int) -> Dict:
+    expand_meta_paths(session['active_learning_algorithm'], batch_size)
     next_metapaths, is_last_batch, reference_paths = session['active_learning_algorithm'].get_next(
-        batch_size=batch_size)
-    logger.debug("Received meta paths from active learner {}".format(next_metapaths))
+        batch_size=batch_size, speculation=session.get(SPECULATION_KEY))
+    logger.debug(LazyFormat("Received meta paths from active learner {}", next_metapaths))
 
     paths = {'meta_paths': next_metapaths,
              'next_batch_available': not is_last_batch}
@@ -174,12 +328,51 @@ def send_next_metapaths_to_rate(batch_size):
         paths['min_path'] = reference_paths['min_path']
         paths['max_path'] = reference_paths['max_path']
 
-    logger.debug("Responding to server: {}".format(paths))
+    logger.debug(LazyFormat("Responding to server: {}", paths))
     if "time" in session.keys():
         session['time_old'] = session['time']
     session['time'] = datetime.datetime.now()
+    return paths
 
-    return jsonify(paths)
+
+def speculate_after_response(response, paths: Dict, batch_size: int):
+    """
+    Selects the batch after `paths` in the background, once the session is saved and the response is sent.
+    """
+    if not paths['next_batch_available']:
+        return response
+    session_id = session.sid
+    algorithm = session['active_learning_algorithm']
+    rated_ids = [meta_path['id'] for meta_path in paths['meta_paths']]
+    response.call_on_close(lambda: speculative_selector.submit(session_id, algorithm, rated_ids, batch_size))
+    return response
+
+
+@app.route("/next-meta-paths/<int:batch_size>", methods=["GET"])
+def send_next_metapaths_to_rate(batch_size):
+    """
+        Returns the next `batchsize` meta-paths to rate.
+
+        Metapaths are formatted like this:
+        {'id': 3,
+        'metapath': ['Phenotype', 'HAS', 'Association', 'HAS', 'SNP', 'HAS', 'Phenotype'],
+        'rating': 0.5}
+    """
+    paths = next_batch(batch_size)
+    with span('json_encode'):
+        response = jsonify(paths)
+    return speculate_after_response(response, paths, batch_size)
+
+
+@app.route("/health", methods=["GET"])
+def send_health():
+    """
+    :return: Availability of redis and the neo4j databases and the usage of the connection pools of this process
+    """
+    health = connections.health()
+    healthy = health['redis'] and all(health['neo4j'].values())
+    return jsonify({'healthy': healthy, 'connections': health, 'pools': connections.statistics()}), \
+           200 if healthy else 503
 
 
 @app.route("/get-available-datasets", methods=["GET"])
@@ -201,10 +394,10 @@ def transform_rating(data: Dict) -> Dict:
         abort(400)
     # Extract ids of meta_paths, which received a smaller rating than min_path
     new_min_paths = [mp for mp in data['meta_paths'] if mp['rating'] < new_min_path_rating]
-    logger.debug("Found meta paths, which are rated less than the min path: {}".format(new_min_paths))
+    logger.debug(LazyFormat("Found meta paths, which are rated less than the min path: {}", new_min_paths))
     # Extract ids of meta_pats, which received a higher rating than max_path
     new_max_paths = [mp for mp in data['meta_paths'] if mp['rating'] > new_max_path_rating]
-    logger.debug("Found meta paths, which are rated better than the max path: {}".format(new_max_paths))
+    logger.debug(LazyFormat("Found meta paths, which are rated better than the max path: {}", new_max_paths))
     # Transform rating of new_min_paths meta paths
     for min_path in new_min_paths:
         rating_diff_to_min_path = abs(min_path['rating'] - data['min_path']['rating'])
@@ -221,22 +414,13 @@ def transform_rating(data: Dict) -> Dict:
         logger.debug(min_ref_path)
         max_path['rating'] = min_ref_path['rating'] + rating_diff_to_min_path
 
-    logger.debug("Rating was transformed: {}".format(data['meta_paths']))
+    logger.debug(LazyFormat("Rating was transformed: {}", data['meta_paths']))
     return data
 
 
-# TODO: Maybe post each rated meta-path
-@app.route("/rate-meta-paths", methods=["POST"])
-def receive_rated_metapaths():
+def receive_ratings():
     """
-    Receives the rated meta-paths.
-
-    Format:
-    'meta_paths': [{'id': 3,
-                   'metapath': ['Phenotype', 'HAS', 'Association', 'HAS', 'SNP', 'HAS', 'Phenotype'],
-                   'rating': 0.75},...]
-    'min_path':{}
-    'max_path':{}
+    Validates the rated meta-paths of the request and updates the active learning algorithm with them.
     """
     time_results_received = datetime.datetime.now()
     if not request.is_json:
@@ -244,14 +428,25 @@ def receive_rated_metapaths():
         abort(400)
 
     data = request.get_json()
-    logger.debug("Login route received data: {}".format(data))
+    logger.debug(LazyFormat("Rating route received data: {}", data))
+    if not isinstance(data, dict) or not isinstance(data.get('meta_paths'), list):
+        logger.error("Aborting, because the request has no list of meta_paths")
+        abort(400)
 
     expected_keys = ['id', 'metapath', 'rating']
+    meta_path_count = len(session['active_learning_algorithm'].meta_paths)
     for datapoint in data['meta_paths']:
+        if not isinstance(datapoint, dict):
+            logger.error("Aborting, because a rated meta-path isn't an object: {}".format(datapoint))
+            abort(400)
         if not all(key in datapoint for key in expected_keys):
             logger.error("Aborting, because keys {} are misssing in this part of json: {}".format(
                 [key for key in expected_keys if key not in datapoint], datapoint))
             abort(400)
+        if not isinstance(datapoint['id'], int) or not 0 <= datapoint['id'] < meta_path_count \
+                or not isinstance(datapoint['rating'], (int, float)):
+            logger.error("Aborting, because of an unknown id or invalid rating in {}".format(datapoint))
+            abort(400)
 
     if not session['active_learning_algorithm'].is_first_batch():
         data = transform_rating(data)
@@ -264,9 +459,40 @@ def receive_rated_metapaths():
         if "time" in session.keys():
             data['time_to_rate'] = (time_results_received - session['time']).total_seconds()
 
+
+# TODO: Maybe post each rated meta-path
+@app.route("/rate-meta-paths", methods=["POST"])
+def receive_rated_metapaths():
+    """
+    Receives the rated meta-paths.
+
+    Format:
+    'meta_paths': [{'id': 3,
+                   'metapath': ['Phenotype', 'HAS', 'Association', 'HAS', 'SNP', 'HAS', 'Phenotype'],
+                   'rating': 0.75},...]
+    'min_path':{}
+    'max_path':{}
+    """
+    receive_ratings()
     return jsonify({'status': 200})
 
 
+@app.route("/rate-and-next-meta-paths/<int:batch_size>", methods=["POST"])
+def receive_rated_and_send_next_metapaths(batch_size):
+    """
+    Receives the rated meta-paths like /rate-meta-paths and returns the next `batch_size` meta-paths to rate
+    and the reference paths like /next-meta-paths, so that each batch needs only one request.
+    """
+    # Checked before the ratings are applied, so that a rejected request changes nothing
+    if batch_size < 1:
+        abort(400)
+    receive_ratings()
+    paths = next_batch(batch_size)
+    with span('json_encode'):
+        response = jsonify(paths)
+    return speculate_after_response(response, paths, batch_size)
+
+
 @app.route("/get-similarity-score", methods=["GET"])
 def send_similarity_score():
     """
@@ -0,0 +1,207 @@
+import hashlib
+import importlib
+import json
+import logging
+import struct
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from active_learning.active_learner import HypothesisBasedAlgorithm, State
+from active_learning.hypothesis import GaussianProcessHypothesis
+from explanation.explanation import SimilarityScore
+from util.datastructures import MetaPath
+
+MAGIC = b'MXS'
+VERSION = 1
+
+ALGORITHM = 1
+SIMILARITY_SCORE = 2
+
+# magic, version, kind, length of the json header
+_PREAMBLE = struct.Struct('<3sBBI')
+
+
+def _pack(kind: int, header: Dict, arrays: Dict[str, np.ndarray]) -> bytes:
+    """
+    Layout: preamble | json header | arrays.
+    The header describes dtype, shape and offset of each array relative to the start of the array section.
+    """
+    header = dict(header, arrays={})
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        header['arrays'][name] = [array.dtype.str, list(array.shape), offset]
+        offset += array.nbytes
+    encoded_header = json.dumps(header, default=float).encode()
+    return b''.join([_PREAMBLE.pack(MAGIC, VERSION, kind, len(encoded_header)), encoded_header] +
+                    [np.ascontiguousarray(array).tobytes() for array in arrays.values()])
+
+
+def _unpack(data: bytes) -> Tuple[int, int, Dict, Dict[str, np.ndarray]]:
+    magic, version, kind, header_length = _PREAMBLE.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Data is not an encoded session entry")
+    header_end = _PREAMBLE.size + header_length
+    header = json.loads(data[_PREAMBLE.size:header_end].decode())
+    arrays = {}
+    for name, (dtype, shape, offset) in header.pop('arrays').items():
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        arrays[name] = np.frombuffer(data, dtype=dtype, count=count,
+                                     offset=header_end + offset).reshape(shape)
+    return version, kind, header, arrays
+
+
+def is_encoded(data: bytes) -> bool:
+    return data[:len(MAGIC)] == MAGIC
+
+
+def catalog_fingerprint(meta_paths) -> str:
+    """
+    :return: Hash of the types of the meta-paths in their order, which identifies the meta-path of each id.
+    """
+    digest = hashlib.sha1()
+    for meta_path in meta_paths:
+        digest.update('|'.join(str(label) for label in meta_path.as_list()).encode())
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+class SessionCodec:
+    """
+    Compact serialization of the active learning state of a session.
+
+    Instead of pickling the meta-paths, the State enums and the kernel matrix, an algorithm is stored as
+    the meta-path catalog it was created from, a bitmask of visited meta-paths, the ratings of the visited
+    meta-paths, the training set of the gaussian process and the state of the random generator.
+    Everything else is rebuilt when the entry is loaded. Similarity scores are stored without the complete
+    rating, which is derived from the algorithm again.
+    """
+
+    def __init__(self, load_meta_paths: Callable[[str, str, str, Optional[List[str]], Optional[List[str]],
+                                                  Optional[int]], List[MetaPath]]):
+        """
+        :param load_meta_paths: Returns the meta-paths of a catalog given by data set, start type, end type, selected
+                                node types, selected edge types and the number of meta-paths with the highest
+                                structural values, i.e. by the `catalog` of an algorithm.
+        """
+        self.load_meta_paths = load_meta_paths
+        self.logger = logging.getLogger('MetaExp.{}'.format(__class__.__name__))
+        self._decoders = {1: self._decode_v1}
+
+    def can_encode(self, value, references: Dict[int, str]) -> bool:
+        """
+        :param references: Maps the ids of objects stored in other session entries to the keys of those entries.
+        """
+        if isinstance(value, HypothesisBasedAlgorithm):
+            return value.catalog is not None and type(value.hypothesis) is GaussianProcessHypothesis
+        if isinstance(value, SimilarityScore):
+            return id(getattr(value.get_complete_rating, '__self__', None)) in references
+        return False
+
+    def encode(self, value, references: Dict[int, str]) -> bytes:
+        if isinstance(value, HypothesisBasedAlgorithm):
+            return self._encode_algorithm(value)
+        return self._encode_similarity_score(value, references)
+
+    def decode(self, data: bytes, resolve_reference: Callable[[str], object]):
+        """
+        :param resolve_reference: Returns the value of another session entry.
+        :raises ValueError: If the layout version is unknown or the meta-path catalog changed.
+        """
+        version, kind, header, arrays = _unpack(data)
+        if version not in self._decoders:
+            raise ValueError("Unknown session layout version {}".format(version))
+        return self._decoders[version](kind, header, arrays, resolve_reference)
+
+    def _encode_algorithm(self, algorithm: HypothesisBasedAlgorithm) -> bytes:
+        visited = algorithm.visited == State.VISITED
+        visited_ids = np.where(visited)[0]
+        training_ids, training_ratings = algorithm.hypothesis.training_set
+        generator, keys, position, has_gauss, cached_gaussian = algorithm.random.get_state()
+        hypothesis_name = [name for name, hypothesis in algorithm.available_hypotheses.items()
+                           if hypothesis is GaussianProcessHypothesis][0]
+        known_attributes = ['meta_paths', 'meta_paths_rating', 'visited', 'random', 'hypothesis', 'catalog']
+        header = {
+            'class': [type(algorithm).__module__, type(algorithm).__qualname__],
+            'catalog': list(algorithm.catalog),
+            'meta_path_count': len(algorithm.meta_paths),
+            'catalog_fingerprint': catalog_fingerprint(algorithm.meta_paths),
+            'hypothesis': hypothesis_name,
+            'random': [generator, int(position), int(has_gauss), float(cached_gaussian)],
+            # Parameters of subclasses, e.g. beta of GPSelect
+            'attributes': {key: value for key, value in algorithm.__dict__.items()
+                           if key not in known_attributes and isinstance(value, (int, float, str, bool))}
+        }
+        arrays = {
+            'visited': np.packbits(visited),
+            'ratings': algorithm.meta_paths_rating[visited_ids].astype(np.float64),
+            'training_ids': np.asarray(training_ids, dtype=np.int32),
+            'training_ratings': np.asarray(training_ratings, dtype=np.float64),
+            'random_keys': keys.astype(np.uint32)
+        }
+        return _pack(ALGORITHM, header, arrays)
+
+    def _encode_similarity_score(self, similarity_score: SimilarityScore, references: Dict[int, str]) -> bytes:
+        header = {
+            'algorithm': references[id(similarity_score.get_complete_rating.__self__)],
+            'dataset': similarity_score.dataset,
+            'algorithm_type': similarity_score.algorithm_type,
+            'similarity_score': similarity_score.similarity_score,
+            'contributing_meta_paths': similarity_score.contributing_meta_paths
+        }
+        arrays = {
+            'start_node_ids': np.asarray(similarity_score.start_node_ids, dtype=np.int64),
+            'end_node_ids': np.asarray(similarity_score.end_node_ids, dtype=np.int64)
+        }
+        if similarity_score.node_set_structural_values is not None:
+            ids, values = zip(*sorted(similarity_score.node_set_structural_values.items())) \
+                if similarity_score.node_set_structural_values else ((), ())
+            arrays['structural_value_ids'] = np.asarray(ids, dtype=np.int64)
+            arrays['structural_values'] = np.asarray(values, dtype=np.float64)
+        return _pack(SIMILARITY_SCORE, header, arrays)
+
+    def _decode_v1(self, kind, header, arrays, resolve_reference):
+        if kind == ALGORITHM:
+            return self._decode_algorithm_v1(header, arrays)
+        elif kind == SIMILARITY_SCORE:
+            return self._decode_similarity_score_v1(header, arrays, resolve_reference)
+        raise ValueError("Unknown kind of session entry {}".format(kind))
+
+    def _decode_algorithm_v1(self, header, arrays) -> HypothesisBasedAlgorithm:
+        module, class_name = header['class']
+        algorithm_class = getattr(importlib.import_module(module), class_name)
+        if not issubclass(algorithm_class, HypothesisBasedAlgorithm):
+            raise ValueError("{} is not an active learning algorithm".format(class_name))
+
+        meta_paths = self.load_meta_paths(*header['catalog'])
+        if len(meta_paths) != header['meta_path_count']:
+            raise ValueError("Meta-path catalog {} changed from {} to {} meta-paths".format(
+                header['catalog'], header['meta_path_count'], len(meta_paths)))
+        # Entries written before the fingerprint was introduced are only checked by their number of meta-paths
+        if header.get('catalog_fingerprint', catalog_fingerprint(meta_paths)) != catalog_fingerprint(meta_paths):
+            raise ValueError("Meta-paths of catalog {} changed".format(header['catalog']))
+        algorithm = algorithm_class(meta_paths, hypothesis=header['hypothesis'])
+        algorithm.catalog = tuple(header['catalog'])
+        algorithm.__dict__.update(header['attributes'])
+
+        visited_ids = np.where(np.unpackbits(arrays['visited'])[:len(meta_paths)])[0]
+        algorithm.visited[visited_ids] = State.VISITED
+        algorithm.meta_paths_rating[visited_ids] = arrays['ratings']
+        generator, position, has_gauss, cached_gaussian = header['random']
+        algorithm.random.set_state((generator, arrays['random_keys'].copy(), position, has_gauss, cached_gaussian))
+        algorithm.hypothesis.restore(arrays['training_ids'].astype(int), arrays['training_ratings'].copy())
+        return algorithm
+
+    def _decode_similarity_score_v1(self, header, arrays, resolve_reference) -> SimilarityScore:
+        algorithm = resolve_reference(header['algorithm'])
+        similarity_score = SimilarityScore(algorithm.get_complete_rating, header['dataset'],
+                                           arrays['start_node_ids'].tolist(), arrays['end_node_ids'].tolist(),
+                                           header['algorithm_type'])
+        similarity_score.similarity_score = header['similarity_score']
+        similarity_score.contributing_meta_paths = header['contributing_meta_paths']
+        if 'structural_values' in arrays:
+            similarity_score.store_node_set_structural_values(
+                dict(zip(arrays['structural_value_ids'].tolist(), arrays['structural_values'].tolist())))
+        return similarity_score
@@ -0,0 +1,200 @@
+import io
+import logging
+import pickle
+from uuid import uuid4
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from api.redis_own import Redis
+from api.session_codec import SessionCodec, is_encoded
+from util.tracing import span, start_trace
+
+
+class _StoredEntry:
+    """
+    Placeholder for a session entry that was read from redis but not yet unpickled.
+    """
+
+    def __init__(self, raw: bytes):
+        self.raw = raw
+
+
+class _EntryPickler(pickle.Pickler):
+    """
+    Pickles one session entry. Objects which are stored as their own session entry are replaced by a reference,
+    so that e.g. the bound method inside a SimilarityScore still points to the active learning algorithm of the
+    same session after loading.
+    """
+
+    def __init__(self, file, references):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.references = references
+
+    def persistent_id(self, obj):
+        return self.references.get(id(obj))
+
+
+class _EntryUnpickler(pickle.Unpickler):
+    def __init__(self, file, session):
+        super().__init__(file)
+        self.session = session
+
+    def persistent_load(self, pid):
+        return self.session[pid]
+
+
+class RedisSession(CallbackDict, SessionMixin):
+    """
+    A session, whose entries are stored as fields of a redis hash.
+    Entries are only unpickled when they are accessed and only written back if their pickled value changed.
+    Active learning state is serialized by the session codec instead of pickle, if one is given.
+    """
+
+    def __init__(self, sid: str, stored_entries=None, new=False, codec: SessionCodec = None):
+        def on_update(self):
+            self.modified = True
+
+        stored_entries = stored_entries or {}
+        super().__init__({key: _StoredEntry(raw) for key, raw in stored_entries.items()}, on_update)
+        self.sid = sid
+        self.new = new
+        self.codec = codec
+        self.modified = False
+        # Pickled values as they are currently stored in redis
+        self.stored_entries = dict(stored_entries)
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if isinstance(value, _StoredEntry):
+            value = self._load_entry(key, value.raw)
+        return value
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def loaded_items(self):
+        """
+        :return: All entries, that were accessed or set during this request.
+        """
+        return [(key, value) for key, value in dict.items(self) if not isinstance(value, _StoredEntry)]
+
+    def _load_entry(self, key, raw: bytes):
+        with span('session_decode'):
+            return self._decode_entry(key, raw)
+
+    def _decode_entry(self, key, raw: bytes):
+        if is_encoded(raw):
+            if self.codec is None:
+                raise KeyError(key)
+            try:
+                value = self.codec.decode(raw, self.__getitem__)
+            except ValueError as e:
+                # The stored state can't be restored, e.g. after the meta-paths were re-imported
+                dict.__delitem__(self, key)
+                self.modified = True
+                raise KeyError(key) from e
+        else:
+            value = _EntryUnpickler(io.BytesIO(raw), self).load()
+        # Bypass the update callback, loading an entry does not modify the session
+        dict.__setitem__(self, key, value)
+        return value
+
+    def dump_entry(self, key) -> bytes:
+        references = {id(value): other_key for other_key, value in self.loaded_items()
+                      if other_key != key and hasattr(value, '__dict__')}
+        value = dict.__getitem__(self, key)
+        if self.codec is not None and self.codec.can_encode(value, references):
+            return self.codec.encode(value, references)
+        buffer = io.BytesIO()
+        _EntryPickler(buffer, references).dump(value)
+        return buffer.getvalue()
+
+    def changed_entries(self):
+        """
+        :return: The pickled entries, which differ from the stored ones, and the keys of removed entries.
+        """
+        changed = {}
+        for key, _ in self.loaded_items():
+            raw = self.dump_entry(key)
+            if self.stored_entries.get(key) != raw:
+                changed[key] = raw
+        removed = [key for key in self.stored_entries.keys() if key not in self]
+        return changed, removed
+
+
+class RedisSessionInterface(SessionInterface):
+    """
+    Stores sessions in redis, so that every worker can continue every session.
+    The session with id `sid` is stored in the hash '<prefix>_<sid>', which expires with the session.
+    """
+
+    def __init__(self, redis: Redis, codec: SessionCodec = None):
+        self.redis = redis
+        self.codec = codec
+        self.logger = logging.getLogger('MetaExp.{}'.format(__class__.__name__))
+
+    def _key(self, sid: str) -> str:
+        return "{}_{}".format(self.redis.data_set, sid)
+
+    def open_session(self, app, request):
+        # Opening the session is the first step of every request
+        start_trace()
+        sid = request.cookies.get(app.config['SESSION_COOKIE_NAME'])
+        if not sid:
+            return RedisSession(uuid4().hex, new=True, codec=self.codec)
+        with span('session_load'):
+            stored_entries = {key.decode(): raw for key, raw in self.redis._client.hgetall(self._key(sid)).items()}
+        self.logger.debug("Loaded {} entries of session {}".format(len(stored_entries), sid))
+        return RedisSession(sid, stored_entries, new=not stored_entries, codec=self.codec)
+
+    def save_session(self, app, session: RedisSession, response):
+        with span('session_save'):
+            self._save_session(app, session, response)
+
+    def _save_session(self, app, session: RedisSession, response):
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.stored_entries:
+                self.redis._client.delete(self._key(session.sid))
+                response.delete_cookie(app.config['SESSION_COOKIE_NAME'], domain=domain, path=path)
+            return
+
+        changed, removed = session.changed_entries()
+        self.logger.debug("Writing {} changed and removing {} entries of session {}".format(
+            len(changed), len(removed), session.sid))
+        lifetime = int(app.permanent_session_lifetime.total_seconds())
+        pipe = self.redis._client.pipeline(transaction=False)
+        if changed:
+            pipe.hmset(self._key(session.sid), changed)
+        if removed:
+            pipe.hdel(self._key(session.sid), *removed)
+        pipe.expire(self._key(session.sid), lifetime)
+        pipe.execute()
+
+        response.set_cookie(app.config['SESSION_COOKIE_NAME'], session.sid,
+                            expires=self.get_expiration_time(app, session),
+                            httponly=self.get_cookie_httponly(app),
+                            domain=domain, path=path, secure=self.get_cookie_secure(app))
+
+    def store_entry(self, sid: str, key: str, value, lifetime: int):
+        """
+        Writes a single entry of an existing session outside of a request, e.g. from a background thread.
+        Requests only write back the entries they changed, so the entry is kept by requests running concurrently.
+        :param lifetime: Seconds until the session expires.
+        """
+        if not self.redis._client.exists(self._key(sid)):
+            return
+        buffer = io.BytesIO()
+        _EntryPickler(buffer, {}).dump(value)
+        pipe = self.redis._client.pipeline(transaction=False)
+        pipe.hset(self._key(sid), key, buffer.getvalue())
+        pipe.expire(self._key(sid), lifetime)
+        pipe.execute()
@@ -0,0 +1,40 @@
+import bisect
+import hashlib
+from typing import Any, List
+
+
+class HashRing:
+    """
+    Consistent hashing of names onto instances.
+
+    Every instance is placed at `replicas` points of a ring of 128 bit md5 hashes and a name belongs to the first
+    instance, whose point follows the hash of the name. If an instance is added, only the names between its new
+    points and their predecessors move, i.e. about 1/n of all names.
+    """
+
+    def __init__(self, instances: List[Any], replicas: int = 100):
+        """
+        :param instances: Instances with a unique string representation, which determines their points.
+        :param replicas: Number of points of each instance. More points distribute the names more evenly.
+        """
+        if not instances:
+            raise ValueError("A hash ring needs at least one instance")
+        self.instances = list(instances)
+        points = sorted((self._hash("{}#{}".format(instance, replica)), index)
+                        for index, instance in enumerate(self.instances) for replica in range(replicas))
+        self._points = [point for point, _ in points]
+        self._owners = [index for _, index in points]
+
+    @staticmethod
+    def _hash(name: str) -> int:
+        return int(hashlib.md5(name.encode()).hexdigest(), 16)
+
+    def index(self, name: str) -> int:
+        """
+        :return: Position of the instance, which the name belongs to, in the list of instances.
+        """
+        position = bisect.bisect(self._points, self._hash(name)) % len(self._points)
+        return self._owners[position]
+
+    def instance(self, name: str) -> Any:
+        return self.instances[self.index(name)]
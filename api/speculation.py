@@ -0,0 +1,60 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from active_learning.active_learner import HypothesisBasedAlgorithm
+from api.session_store import RedisSessionInterface
+from util.config import SPECULATION_WORKERS
+from util.tracing import span
+
+# Session entry holding the speculated batch
+SPECULATION_KEY = 'speculation'
+
+
+class SpeculativeSelector:
+    """
+    Selects the next batch of a session in the background, while the user is still rating the current one.
+    The result is stored as an entry of the session, so that it is available to every server process.
+    The next request passes it to get_next of the algorithm, which uses it if the actual ratings match the guess.
+    """
+
+    def __init__(self, session_interface: RedisSessionInterface, lifetime: int, workers: int = SPECULATION_WORKERS):
+        """
+        :param lifetime: Seconds until a session expires.
+        """
+        self.session_interface = session_interface
+        self.lifetime = lifetime
+        self.workers = workers
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger('MetaExp.{}'.format(__class__.__name__))
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # gunicorn forks the workers after loading the app, threads of the parent aren't available in the children
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers)
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def submit(self, sid: str, algorithm, rated_ids: List[int], batch_size: int):
+        """
+        Must only be called after the session was saved, as the algorithm is used by the background thread.
+        :param rated_ids: Ids of the batch, which was just sent to the user.
+        """
+        if not isinstance(algorithm, HypothesisBasedAlgorithm) or not rated_ids:
+            return
+        self._get_executor().submit(self._speculate, sid, algorithm, rated_ids, batch_size)
+
+    def _speculate(self, sid: str, algorithm: HypothesisBasedAlgorithm, rated_ids: List[int], batch_size: int):
+        try:
+            with span('speculate'):
+                speculation = algorithm.speculate(rated_ids, batch_size)
+            if speculation is not None:
+                self.session_interface.store_entry(sid, SPECULATION_KEY, speculation, self.lifetime)
+                self.logger.debug("Speculated next batch {} of session {}".format(speculation.next_ids, sid))
+        except Exception:
+            self.logger.exception("Speculation for session {} failed".format(sid))
@@ -0,0 +1,49 @@
+import threading
+from typing import Callable, Dict
+
+from util.tracing import metrics
+
+
+class TypeMapCache:
+    """
+    Process-wide cache of the decoded node and edge type maps of each data set.
+
+    The maps of a generation never change after they were written by the import, so a generation is cached until
+    another generation of the same data set becomes active. Every worker notices the new generation on the next
+    request, when it reads the active generation pointer. Empty maps aren't cached, as the generation may still be
+    imported.
+    """
+
+    def __init__(self):
+        # data set -> (generation, map name -> map)
+        self._maps = {}
+        self._lock = threading.Lock()
+
+    def get(self, data_set: str, generation: int, name: str, load: Callable[[], Dict[bytes, bytes]]) -> Dict[str, str]:
+        """
+        :param name: Name of the map, e.g. 'node_type_map'.
+        :param load: Reads the map from redis.
+        """
+        with self._lock:
+            cached_generation, maps = self._maps.get(data_set, (None, {}))
+            if cached_generation == generation and name in maps:
+                metrics.increment('metaexp_cache_requests_total', cache='type_map', result='hit')
+                return maps[name]
+        metrics.increment('metaexp_cache_requests_total', cache='type_map', result='miss')
+
+        type_map = {key.decode(): value.decode() for key, value in load().items()}
+        if type_map:
+            with self._lock:
+                cached_generation, maps = self._maps.get(data_set, (None, {}))
+                if cached_generation != generation:
+                    maps = {}
+                    self._maps[data_set] = (generation, maps)
+                maps[name] = type_map
+        return type_map
+
+    def clear(self):
+        with self._lock:
+            self._maps.clear()
+
+
+type_map_cache = TypeMapCache()
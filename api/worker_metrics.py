@@ -0,0 +1,87 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+from api.redis_own import Redis
+from util.config import METRICS_PUBLISH_INTERVAL, METRICS_LIFETIME
+from util.tracing import Metrics, metrics
+
+
+class WorkerMetrics:
+    """
+    Metrics of all server processes. Each gunicorn worker has its own registry and a scrape of /metrics is answered
+    by an arbitrary worker, so every worker publishes a snapshot of its registry to the redis key
+    '<prefix>_worker_<host>-<pid>' every `interval` seconds. The set '<prefix>_workers' lists these keys.
+    Snapshots of stopped workers expire after `lifetime` seconds. The metrics are reported with the label 'worker',
+    a restarted worker starts new series.
+    """
+
+    def __init__(self, redis: Redis, registry: Metrics = metrics, interval: float = METRICS_PUBLISH_INTERVAL,
+                 lifetime: float = METRICS_LIFETIME):
+        self.redis = redis
+        self.registry = registry
+        self.interval = interval
+        self.lifetime = lifetime
+        self._publisher_pid = None
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger('MetaExp.{}'.format(__class__.__name__))
+
+    @staticmethod
+    def worker() -> str:
+        return '{}-{}'.format(socket.gethostname(), os.getpid())
+
+    def _key(self, worker: str) -> str:
+        return "{}_worker_{}".format(self.redis.data_set, worker)
+
+    def _workers_key(self) -> str:
+        return "{}_workers".format(self.redis.data_set)
+
+    def start(self):
+        """
+        Starts publishing the metrics of this process, if it doesn't already.
+        """
+        # gunicorn forks the workers after loading the app, threads of the parent aren't available in the children
+        if self._publisher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._publisher_pid != os.getpid():
+                self._publisher_pid = os.getpid()
+                threading.Thread(target=self._publish_periodically, daemon=True, name='metrics-publisher').start()
+
+    def _publish_periodically(self):
+        pid = os.getpid()
+        while self._publisher_pid == pid:
+            try:
+                self.publish()
+            except Exception:
+                self.logger.exception("Publishing the metrics of worker {} failed".format(self.worker()))
+            time.sleep(self.interval)
+
+    def publish(self):
+        worker = self.worker()
+        pipe = self.redis._client.pipeline(transaction=False)
+        pipe.set(self._key(worker), json.dumps(self.registry.snapshot()), ex=int(self.lifetime))
+        pipe.sadd(self._workers_key(), worker)
+        pipe.expire(self._workers_key(), int(self.lifetime))
+        pipe.execute()
+
+    def prometheus_text(self) -> str:
+        """
+        :return: Metrics of all workers, which published them within their lifetime, in the prometheus text format.
+        """
+        # The metrics of the scraped worker are always up to date
+        self.publish()
+        workers = sorted(member.decode() for member in self.redis._client.smembers(self._workers_key()))
+        snapshots = {}
+        stopped = []
+        for worker, snapshot in zip(workers, self.redis._client.mget([self._key(worker) for worker in workers])):
+            if snapshot is None:
+                stopped.append(worker)
+            else:
+                snapshots[worker] = json.loads(snapshot.decode())
+        if stopped:
+            self.redis._client.srem(self._workers_key(), *stopped)
+        return self.registry.prometheus_text(snapshots)
@@ -0,0 +1,105 @@
+"""
+Compares the compressions of the meta-path catalogs on the test data sets under tests/data: size on the network,
+memory used by redis and the time to encode and decode a catalog.
+
+Run from the repository root:
+    python -m deployment.benchmark_compression [--dimensions 100] [--redis localhost:6379]
+
+The test data sets have no embeddings, so random embeddings with the given dimensions are added. Trained embeddings
+compress about as badly, so the catalogs without embeddings show the gain for the type ids and structural values.
+Without --redis, the memory used by redis isn't measured. The benchmark writes and deletes the key
+'benchmark_compression' only.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import redis
+
+from api.meta_path_catalog import MetaPathCatalog
+from util.config import MOCK_DATASETS_DIR
+from util.datastructures import MetaPath
+from util.meta_path_loader_dispatcher import MetaPathLoaderDispatcher
+
+SETTINGS = [(None, 0), ('zlib', 1), ('zlib', 6), ('zlib', 9), ('lzma', 0), ('lzma', 6)]
+BENCHMARK_KEY = 'benchmark_compression'
+
+
+def mock_meta_paths():
+    with open(os.path.join(MOCK_DATASETS_DIR, 'mock_metapaths.txt')) as f:
+        structural_values = json.load(f)
+    return [MetaPath(edge_node_list=meta_path.split(' | ')).store_structural_value(float(structural_value))
+            for meta_path, structural_value in structural_values.items()]
+
+
+def data_sets():
+    yield 'mock_metapaths', mock_meta_paths()
+    for name, loader in MetaPathLoaderDispatcher.dataset_to_loader.items():
+        yield name, loader.load_meta_paths()
+
+
+def type_ids(names):
+    return {name: i for i, name in enumerate(sorted(set(names)))}
+
+
+def to_catalog(meta_paths, dimensions):
+    node_types = type_ids(node for mp in meta_paths for node in mp.as_list()[::2])
+    edge_types = type_ids(edge for mp in meta_paths for edge in mp.as_list()[1::2])
+    catalog = MetaPathCatalog.from_meta_paths(meta_paths, node_types, edge_types)
+    if dimensions > 0:
+        catalog.embeddings = np.random.RandomState(0).normal(size=(len(catalog), dimensions)).astype(np.float32)
+    return catalog
+
+
+def fastest(function, runs):
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - start)
+    return min(durations), result
+
+
+def measure(catalog, compression, level, runs, client):
+    encode_seconds, fields = fastest(lambda: catalog.encode(compression, level), runs)
+    received = {key.encode(): value for key, value in fields.items()}
+    decode_seconds, _ = fastest(lambda: MetaPathCatalog.decode(received), runs)
+    memory = None
+    if client is not None:
+        client.delete(BENCHMARK_KEY)
+        client.hmset(BENCHMARK_KEY, fields)
+        memory = client.memory_usage(BENCHMARK_KEY, samples=0)
+        client.delete(BENCHMARK_KEY)
+    return {'network_bytes': sum(len(value) for value in fields.values()), 'redis_bytes': memory,
+            'encode_ms': encode_seconds * 1000, 'decode_ms': decode_seconds * 1000}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dimensions', type=int, default=100, help="Dimensions of the random embeddings, 0 for none")
+    parser.add_argument('--runs', type=int, default=5, help="Runs per measurement, the fastest one is reported")
+    parser.add_argument('--redis', help="host:port of a redis instance to measure the memory usage with")
+    args = parser.parse_args()
+
+    client = None
+    if args.redis:
+        host, port = args.redis.split(':')
+        client = redis.StrictRedis(host=host, port=int(port))
+
+    print("{:<48} {:>6} {:>5} {:>7} {:>12} {:>7} {:>12} {:>10} {:>10}".format(
+        'data set', 'paths', 'dims', 'method', 'network [B]', 'ratio', 'redis [B]', 'enc [ms]', 'dec [ms]'))
+    for name, meta_paths in data_sets():
+        for dimensions in sorted({0, args.dimensions}):
+            catalog = to_catalog(meta_paths, dimensions)
+            uncompressed = None
+            for compression, level in SETTINGS:
+                result = measure(catalog, compression, level, args.runs, client)
+                uncompressed = uncompressed or result['network_bytes']
+                print("{:<48} {:>6} {:>5} {:>7} {:>12} {:>7.2f} {:>12} {:>10.3f} {:>10.3f}".format(
+                    name[:48], len(catalog), dimensions,
+                    "{}-{}".format(compression, level) if compression else 'none', result['network_bytes'],
+                    uncompressed / result['network_bytes'],
+                    result['redis_bytes'] if result['redis_bytes'] is not None else '-',
+                    result['encode_ms'], result['decode_ms']))
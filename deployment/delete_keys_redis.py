@@ -1,6 +1,58 @@
-from util.config import REDIS_PASSWORD, REDIS_PORT, REDIS_HOST
+"""
+Deletes the generations of the data sets, which aren't active anymore, e.g. those of cancelled imports, and the
+hashes '<data set>_sessions', which earlier versions wrote and nothing reads.
+Keys are found with SCAN and removed with UNLINK, so the server can keep serving requests meanwhile.
+
+Run from the repository root:
+    python -m deployment.delete_keys_redis [--data-set Helmholtz] [--all]
+"""
+import argparse
+
 import redis
 
-if __name__=='__main__':
-    client = redis.StrictRedis(host=REDIS_HOST, password=REDIS_PASSWORD, port=REDIS_PORT)
-    print(client.delete(*client.keys()))
\ No newline at end of file
+from api.connections import connections
+from api.redis_own import Redis
+from util.config import AVAILABLE_DATA_SETS
+
+
+def delete_inactive_generations(redis: Redis) -> int:
+    active_generation = redis.active_generation()
+    generations = [int(generation) for generation in redis._client.smembers("{}_generations".format(redis.data_set))]
+    if active_generation != 0:
+        # Keys imported before there were generations
+        generations.append(0)
+    return sum(redis.delete_generation(generation) for generation in generations if generation != active_generation)
+
+
+def delete_session_indexes(data_set: str) -> int:
+    # They were written next to the sessions, which may be stored on another instance than the data set
+    return sum(redis.StrictRedis(connection_pool=pool).unlink("{}_sessions".format(data_set))
+               for pool in connections.redis_pools().values())
+
+
+def delete_all(client: redis.StrictRedis) -> int:
+    deleted = 0
+    chunk = []
+    for key in client.scan_iter(count=1000):
+        chunk.append(key)
+        if len(chunk) == 1000:
+            deleted += client.unlink(*chunk)
+            chunk = []
+    if chunk:
+        deleted += client.unlink(*chunk)
+    return deleted
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data-set', action='append', help="Data sets to clean up, all by default")
+    parser.add_argument('--all', action='store_true', help="Delete every key of all redis instances instead")
+    args = parser.parse_args()
+
+    if args.all:
+        for address, pool in connections.redis_pools().items():
+            print("{}: deleted {} keys".format(address, delete_all(redis.StrictRedis(connection_pool=pool))))
+    else:
+        for data_set in args.data_set or [data_set['name'] for data_set in AVAILABLE_DATA_SETS]:
+            deleted = delete_inactive_generations(Redis(data_set)) + delete_session_indexes(data_set)
+            print("{}: deleted {} keys".format(data_set, deleted))
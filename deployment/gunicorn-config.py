@@ -12,5 +12,6 @@ if "METAEXP_DEV" in os.environ.keys() and os.environ["METAEXP_DEV"] == "true":
 if "METAEXP_HTTPS" in os.environ.keys() and os.environ["METAEXP_HTTPS"] == "true":
     certfile = "/32de-python/https/api.crt"
     keyfile = "/32de-python/https/api.key"
-timeout = 99999
+# Imports and training run as background jobs, requests don't block a worker for long
+timeout = 120
 workers = 36
\ No newline at end of file
@@ -0,0 +1,67 @@
+"""
+Measures import time and resident memory of a fresh server process.
+
+Run from the repository root:
+    python deployment/measure_startup.py [--runs 5]
+
+The 'serving' profile is what every gunicorn worker loads. The 'training' profile additionally loads the
+embedding training, which is what each worker paid before training was only imported by jobs.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+PROFILES = {
+    'serving': ['api.server'],
+    'training': ['api.server', 'embeddings.meta2vec'],
+}
+
+HEAVY_MODULES = ['tensorflow', 'matplotlib', 'pandas', 'sklearn']
+
+MEASUREMENT = """
+import importlib, json, resource, sys, time
+start = time.perf_counter()
+for module in {modules!r}:
+    importlib.import_module(module)
+duration = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': duration,
+    # kilobytes on linux
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy_modules': [name for name in {heavy!r} if name in sys.modules]
+}}))
+"""
+
+
+def measure(modules, runs):
+    results = []
+    for _ in range(runs):
+        output = subprocess.check_output(
+            [sys.executable, '-c', MEASUREMENT.format(modules=modules, heavy=HEAVY_MODULES)],
+            cwd=os.getcwd(), env=dict(os.environ, PYTHONPATH=os.getcwd()))
+        results.append(json.loads(output.decode().strip().splitlines()[-1]))
+    return {
+        'seconds': min(result['seconds'] for result in results),
+        'max_rss_mb': min(result['max_rss_mb'] for result in results),
+        'heavy_modules': results[0]['heavy_modules']
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=3, help="Number of fresh processes per profile")
+    parser.add_argument('--profile', choices=list(PROFILES.keys()), action='append',
+                        help="Profiles to measure, all by default")
+    args = parser.parse_args()
+
+    print("{:<10} {:>10} {:>12}  {}".format('profile', 'import [s]', 'max rss [MB]', 'heavy modules'))
+    for profile in args.profile or PROFILES.keys():
+        try:
+            result = measure(PROFILES[profile], args.runs)
+        except subprocess.CalledProcessError:
+            print("{:<10} failed to import {}".format(profile, ', '.join(PROFILES[profile])))
+            continue
+        print("{:<10} {:>10.2f} {:>12.1f}  {}".format(profile, result['seconds'], result['max_rss_mb'],
+                                                       ', '.join(result['heavy_modules'])))
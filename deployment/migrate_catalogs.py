@@ -0,0 +1,50 @@
+"""
+Converts meta-path catalogs of the active generation, which are stored as redis lists of pickled MetaPath objects,
+into the columnar format of MetaPathCatalog. Keys, which are already converted, are skipped, so the migration can be
+repeated.
+
+Run from the repository root:
+    python -m deployment.migrate_catalogs [--data-set Helmholtz]
+"""
+import argparse
+import pickle
+
+from api.meta_path_catalog import MetaPathCatalog
+from api.redis_own import Redis
+from util.config import AVAILABLE_DATA_SETS
+
+
+def migrate(redis: Redis) -> int:
+    """
+    :return: Number of converted keys.
+    """
+    node_type_ids = {key: int(value) for key, value in redis.node_type_to_id_map().items()}
+    edge_type_ids = {key: int(value) for key, value in redis.edge_type_to_id_map().items()}
+    converted = 0
+    for key in redis._client.scan_iter(match='{}_*'.format(redis.namespace)):
+        if redis._client.type(key) != b'list':
+            continue
+        # SCAN returns bytes, but the index keys of the catalog are derived from the key as string
+        key = key.decode()
+        meta_paths = [pickle.loads(entry) for entry in redis._client.lrange(key, 0, -1)]
+        if key.endswith('_embedded'):
+            # Embedded meta-paths were stored with type names instead of ids
+            catalog = MetaPathCatalog.from_meta_paths(meta_paths, node_type_ids, edge_type_ids)
+        else:
+            catalog = MetaPathCatalog.from_meta_paths(meta_paths)
+        redis.store_catalog(key, catalog)
+        converted += 1
+        print("Converted {} with {} meta-paths".format(key, len(catalog)))
+    if converted:
+        # Server processes drop their cached catalogs of this data set
+        redis.increment_import_generation()
+    return converted
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data-set', action='append', help="Data sets to migrate, all by default")
+    args = parser.parse_args()
+
+    for data_set in args.data_set or [data_set['name'] for data_set in AVAILABLE_DATA_SETS]:
+        print("{}: converted {} catalogs".format(data_set, migrate(Redis(data_set))))
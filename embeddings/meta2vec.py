@@ -1,6 +1,6 @@
 import argparse
 import json
-from typing import Tuple
+from typing import Iterable, Tuple
 import logging
 
 from util.datastructures import MetaPath
@@ -12,24 +12,28 @@ from embeddings.input import *
 from embeddings.models import model_word2vec, model_paragraph_vectors_skipgram, model_paragraph_vectors_dbow
 
 
-def calculate_metapath_embeddings(metapaths: List[MetaPath], model_dir: str = './model_dir-7', gpu_memory: float = 0.3,
+def calculate_metapath_embeddings(metapaths: Iterable[MetaPath], model_dir: str = './model_dir-7', gpu_memory: float = 0.3,
                                   loss: str = "cross_entropy", optimizer: str = "adam",
                                   metapath_embedding_size: int = None,
                                   node_embedding_size=4, model_type='skip-gram') -> List[Tuple[MetaPath, List[float]]]:
     """
 
     :param metapath_embedding_size:
-    :param metapaths: The meta-paths to be embedded.
+    :param metapaths: The meta-paths to be embedded, e.g. streamed from redis. They are iterated only once.
+                      The training needs all of them in memory, so only their type ids and structural values are
+                      kept instead of the MetaPath objects.
     :return: The embedding of the meta-paths in the same order as the given meta-paths.
              Every list represents a vector.
     """
     result = []
+    structural_values = []
     for metapath in metapaths:
         result.append([int(label) for label in metapath.as_list()])
+        structural_values.append(metapath.get_structural_value())
     input = MetaPathsInput.from_paths_list(result)
 
     if metapath_embedding_size is None:
-        metapath_embedding_size = int(len(metapaths) / 100)  # TODO: there's some formula in the literatur
+        metapath_embedding_size = int(len(result) / 100)  # TODO: there's some formula in the literatur
 
     model_fn = choose_model_function(model='paragraph_vectors', model_type=model_type)
     classifier = create_paragraph_estimator(model_dir=model_dir, model_fn=model_fn,
@@ -51,8 +55,9 @@ def calculate_metapath_embeddings(metapaths: List[MetaPath], model_dir: str = '.
     trained_embeddings = classifier.get_variable_value(name='paragraph_embeddings')
 
     embedded_metapaths = []
-    for id, metapath in enumerate(trained_embeddings):
-        embedded_metapaths.append((metapaths[id], metapath.tolist()))
+    for id, embedding in enumerate(trained_embeddings):
+        metapath = MetaPath(edge_node_list=[str(label) for label in result[id]])
+        embedded_metapaths.append((metapath.store_structural_value(structural_values[id]), embedding.tolist()))
 
     logger.debug("Returning embedded meta-paths")
     return embedded_metapaths
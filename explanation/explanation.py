@@ -1,7 +1,11 @@
-from typing import List
-from util.config import BASELINE_MODE
+from typing import Dict, List
+from util.config import BASELINE_MODE, NODE_SET_COUNT_TIMEOUT
+from util.datastructures import MetaPath
+from api.neo4j_own import Neo4j
 import numpy as np
 import logging
+import time
+from util.lazy_logging import LazyFormat
 
 
 class Explanation:
@@ -72,6 +76,8 @@ class SimilarityScore:
 	contributing_meta_paths = []
 	explained_meta_paths_top_k = []
 	structural_value = []
+	# Number of instances between the node sets by meta-path id, replaces the structural values of the data set
+	node_set_structural_values = None
 
 	def __init__(self, get_complete_rating, dataset, start_node_ids, end_node_ids, algorithm_type=BASELINE_MODE):
 		self.algorithm_type = algorithm_type
@@ -93,13 +99,57 @@ class SimilarityScore:
 		self.__dict__.update(d)
 		self.logger = logging.getLogger('MetaExp.{}'.format(__class__.__name__))
 
+	def store_node_set_structural_values(self, structural_values: Dict[int, float]):
+		"""
+		:param structural_values: Number of instances between the start and end nodes by meta-path id
+		"""
+		if self.node_set_structural_values is None:
+			self.node_set_structural_values = {}
+		self.node_set_structural_values.update(structural_values)
+
+	def count_node_set_instances(self, meta_paths: List[MetaPath], first_id: int = 0,
+								 timeout: float = NODE_SET_COUNT_TIMEOUT) -> bool:
+		"""
+		Replaces the structural values of the data set by the number of instances of the meta-paths between the start
+		and end nodes. If neo4j fails or doesn't count all meta-paths within `timeout` seconds, the structural values
+		of the data set are kept for all meta-paths.
+		:param first_id: Id of the first meta-path, the others have the ids `first_id + 1`, ...
+		:return: Whether the meta-paths were counted.
+		"""
+		if not meta_paths or not self.start_node_ids or not self.end_node_ids:
+			return False
+		if first_id > 0 and self.node_set_structural_values is None:
+			# The previous meta-paths weren't counted, counts of some meta-paths only wouldn't be comparable
+			return False
+		deadline = time.perf_counter() + timeout
+		counts = {}
+		try:
+			with Neo4j(self.dataset['bolt-url'], self.dataset['username'], self.dataset['password']) as neo4j:
+				for position, count in neo4j.get_structural_values(meta_paths, self.start_node_ids, self.end_node_ids,
+																   timeout=timeout):
+					counts[first_id + position] = count
+					if time.perf_counter() > deadline:
+						raise TimeoutError("Counting took more than {}s".format(timeout))
+		except Exception:
+			self.logger.exception("Counting the instances between the node sets failed, using the structural values "
+								  "of the data set")
+			self.node_set_structural_values = None
+			return False
+		self.store_node_set_structural_values(counts)
+		return True
+
+	def get_structural_value(self, mp: dict) -> float:
+		if self.node_set_structural_values is None:
+			return mp['metapath'].get_structural_value()
+		return self.node_set_structural_values.get(mp['id'], 0)
+
 	def refresh(self):
 		self.meta_paths = self.get_complete_rating()
 
 		self.compute_similarity_score()
 		self.compute_top_k_contributing_meta_paths(5)
 		self.compute_contributing_meta_paths()
-		self.logger.debug("CONTRIBUTING METAPATHS!!!!! {}".format(self.contributing_meta_paths))
+		self.logger.debug(LazyFormat("Contributing meta paths {}", self.contributing_meta_paths))
 
 		return True
 
@@ -109,18 +159,18 @@ class SimilarityScore:
 		over all meta-paths. First simplified, not experimentally tested baseline.
 		:return: similarity score between both node sets as float
 		"""
-		structural_values = np.array([mp['metapath'].get_structural_value() for mp in self.meta_paths])
+		structural_values = np.array([self.get_structural_value(mp) for mp in self.meta_paths])
 		domain_values = np.array([mp['domain_value'] for mp in self.meta_paths])
-		self.logger.debug("All domain values {}".format(domain_values))
+		self.logger.debug(LazyFormat("All domain values {}", domain_values))
 		domain_values = self.apply_rescaling(domain_values)
-		self.logger.debug("All domain values after rescale {}".format(domain_values))
+		self.logger.debug(LazyFormat("All domain values after rescale {}", domain_values))
 		structural_values = self.min_max_normalization(structural_values)
 		self.structural_value = structural_values
 		self.similarity_scores = structural_values * domain_values
 		self.similarity_score = np.sum(self.similarity_scores) / len(self.similarity_scores)
-		self.logger.debug("Structural Values {}".format(self.structural_value))
-		self.logger.debug("Domain Values {}".format(domain_values))
-		self.logger.debug("Similarities scores is {}".format(self.similarity_scores))
+		self.logger.debug(LazyFormat("Structural Values {}", self.structural_value))
+		self.logger.debug(LazyFormat("Domain Values {}", domain_values))
+		self.logger.debug(LazyFormat("Similarities scores is {}", self.similarity_scores))
 		self.logger.debug("Similarity score ist {}".format(self.similarity_score))
 
 	@staticmethod
@@ -158,7 +208,8 @@ class SimilarityScore:
 		self.explained_meta_paths_top_k = []
 		for i in meta_paths_top_k_idx:
 			self.meta_paths[i]['similarity_score'] = self.similarity_scores[i]
-			self.meta_paths[i]['metapath'].store_structural_value(self.structural_value[i])
+			# Meta-path objects are shared between sessions, so the normalized value is kept besides them
+			self.meta_paths[i]['structural_value'] = self.structural_value[i]
 			self.explained_meta_paths_top_k.append(self.meta_paths[i])
 
 	def construct_query(self, query_mp, node_type_count, limit):
@@ -177,7 +228,7 @@ class SimilarityScore:
 				'value': round(mp['similarity_score'], 2),
 				'color': 'hsl({}, 70%, 50%)'.format(np.random.rand() * 255),
 				'similarity_score': mp['similarity_score'],
-				'structural_value': round(float(mp['metapath'].get_structural_value()), 2),
+				'structural_value': round(float(mp['structural_value']), 2),
 				'metapath': mp['metapath'].get_representation('UI'),
 				'instance_query': self.construct_query(mp['metapath'].get_representation('query'),
 													   mp['metapath'].number_node_types(), 5)
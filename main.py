@@ -1,6 +1,3 @@
-import active_learning.active_learner as active_learning
-import domain_scoring.domain_scoring as domain_scoring
-import explanation.explanation as explanation
 from api import server
 import argparse
 import util.config as config
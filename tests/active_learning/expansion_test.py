@@ -0,0 +1,43 @@
+import unittest
+
+import numpy as np
+
+from active_learning.active_learner import UncertaintySamplingAlgorithm, State
+from util.datastructures import MetaPath
+
+
+class ExpansionTest(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.RandomState(42)
+        self.meta_paths = [MetaPath(edge_node_list=['Gene', 'HAS', 'Disease'])
+                               .store_embedding(random.rand(10).tolist())
+                           for _ in range(30)]
+        self.algorithm = UncertaintySamplingAlgorithm(self.meta_paths[:20], hypothesis='Gaussian Process')
+        self.algorithm.update([{'id': 3, 'rating': 0.2}, {'id': 12, 'rating': 0.9}])
+
+    def test_extend_keeps_ratings(self):
+        self.algorithm.extend(self.meta_paths[20:])
+
+        self.assertEqual(30, len(self.algorithm.meta_paths))
+        self.assertEqual(0.9, self.algorithm.meta_paths_rating[12])
+        self.assertEqual(2, np.sum(self.algorithm.visited == State.VISITED))
+        self.assertEqual(State.NOT_VISITED, self.algorithm.visited[25])
+
+    def test_extended_meta_paths_are_predicted(self):
+        self.algorithm.extend(self.meta_paths[20:])
+        full = UncertaintySamplingAlgorithm(self.meta_paths, hypothesis='Gaussian Process')
+        full.update([{'id': 3, 'rating': 0.2}, {'id': 12, 'rating': 0.9}])
+
+        np.testing.assert_array_almost_equal(full.hypothesis.predict_rating(range(30)),
+                                             self.algorithm.hypothesis.predict_rating(range(30)))
+        self.assertEqual((30, 30), self.algorithm.hypothesis.get_similarity().shape)
+
+    def test_extended_meta_paths_are_selected(self):
+        self.algorithm.extend(self.meta_paths[20:])
+        batch = [meta_path['id'] for meta_path in self.algorithm.get_next(batch_size=28)[0]]
+        self.assertTrue(any(meta_id >= 20 for meta_id in batch))
+
+
+if __name__ == '__main__':
+    unittest.main()
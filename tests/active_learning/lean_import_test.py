@@ -0,0 +1,28 @@
+import subprocess
+import sys
+import unittest
+
+
+class LeanImportTest(unittest.TestCase):
+    """
+    The modules used to serve rating, selection and similarity requests must not load training or plotting stacks.
+    """
+
+    def _loaded_modules(self, module):
+        output = subprocess.check_output(
+            [sys.executable, '-c', 'import sys, {}; print(" ".join(sys.modules.keys()))'.format(module)])
+        return output.decode().split()
+
+    def test_active_learning_without_plotting(self):
+        loaded = self._loaded_modules('active_learning.active_learner')
+        self.assertNotIn('matplotlib', loaded)
+        self.assertNotIn('tensorflow', loaded)
+
+    def test_session_state_without_training(self):
+        loaded = self._loaded_modules('api.session_codec')
+        self.assertNotIn('matplotlib', loaded)
+        self.assertNotIn('tensorflow', loaded)
+
+
+if __name__ == '__main__':
+    unittest.main()
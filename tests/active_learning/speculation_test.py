@@ -0,0 +1,88 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from active_learning.active_learner import UncertaintySamplingAlgorithm, State
+from util.datastructures import MetaPath
+from util.tracing import metrics
+
+
+class SpeculationTest(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.RandomState(42)
+        self.meta_paths = [MetaPath(edge_node_list=['Gene', 'HAS', 'Disease'])
+                               .store_embedding(random.rand(30).tolist())
+                           for _ in range(200)]
+        self.algorithm = UncertaintySamplingAlgorithm(self.meta_paths, hypothesis='Gaussian Process')
+        self.algorithm.update([{'id': 3, 'rating': 0.2}, {'id': 42, 'rating': 0.9}])
+        self.batch = [meta_path['id'] for meta_path in self.algorithm.get_next(batch_size=5)[0]]
+        metrics.reset()
+
+    def rate_batch(self, ratings):
+        self.algorithm.update([{'id': meta_id, 'rating': rating} for meta_id, rating in zip(self.batch, ratings)])
+
+    def test_speculation_does_not_change_algorithm(self):
+        self.algorithm.speculate(self.batch, 5)
+        self.assertEqual(2, np.sum(self.algorithm.visited == State.VISITED))
+        self.assertEqual(2, len(self.algorithm.hypothesis.training_set[0]))
+
+    def test_matching_ratings_use_speculated_batch(self):
+        speculation = self.algorithm.speculate(self.batch, 5)
+        self.rate_batch(np.array(speculation.guessed_ratings) + 0.01)
+
+        next_batch = [meta_path['id'] for meta_path in self.algorithm.get_next(5, speculation)[0]]
+
+        self.assertEqual(speculation.next_ids, next_batch)
+        self.assertEqual(1, metrics.counter('metaexp_speculation_total', result='hit'))
+        self.assertEqual(speculation.next_ids, [int(meta_id) for meta_id in self.algorithm._select(5)])
+
+    def test_different_ratings_select_again(self):
+        speculation = self.algorithm.speculate(self.batch, 5)
+        self.rate_batch(1 - np.array(speculation.guessed_ratings))
+
+        self.algorithm.get_next(5, speculation)
+
+        self.assertEqual(1, metrics.counter('metaexp_speculation_total', result='miss'))
+
+    def test_outdated_speculation_is_ignored(self):
+        speculation = self.algorithm.speculate(self.batch, 5)
+        self.rate_batch(speculation.guessed_ratings)
+        self.algorithm.update([{'id': 100, 'rating': 0.5}])
+
+        self.assertFalse(self.algorithm.matches(speculation, 5))
+        self.assertFalse(self.algorithm.matches(self.algorithm.speculate(self.batch, 5), 4))
+
+    def test_ties_are_broken_like_the_actual_selection(self):
+        # All meta-paths are equally uncertain, the random generator of the algorithm picks among them
+        meta_paths = [MetaPath(edge_node_list=['Gene', 'HAS', 'Disease']).store_embedding([1.0, 0.0])
+                      for _ in range(50)]
+        algorithm = UncertaintySamplingAlgorithm(meta_paths, hypothesis='Gaussian Process')
+        batch = [meta_path['id'] for meta_path in algorithm.get_next(batch_size=5)[0]]
+        state = algorithm.random.get_state()[1].copy()
+
+        speculation = algorithm.speculate(batch, 5)
+        np.testing.assert_array_equal(state, algorithm.random.get_state()[1])
+        algorithm.update([{'id': meta_id, 'rating': rating}
+                          for meta_id, rating in zip(batch, speculation.guessed_ratings)])
+        self.assertEqual(speculation.next_ids, [int(meta_id) for meta_id in algorithm._select(5)])
+
+
+class SelectTest(unittest.TestCase):
+
+    def test_neighbours_of_selected_meta_path_are_skipped(self):
+        meta_paths = [MetaPath(edge_node_list=['Gene', 'HAS', 'Disease']).store_embedding([1.0, float(i)])
+                      for i in range(6)]
+        algorithm = UncertaintySamplingAlgorithm(meta_paths, hypothesis='Gaussian Process')
+        similarity = np.ones((6, 6))
+        # 3 and 4 are removed after 0 is selected, as two neighbours are removed per selection for 6 meta-paths
+        similarity[0] = [1.0, 0.9, 0.8, 0.0, 0.1, 0.7]
+        with mock.patch.object(algorithm, 'compute_selection_criterion',
+                               return_value=np.array([0.9, 0.1, 0.2, 0.3, 0.85, 0.8])), \
+                mock.patch.object(algorithm.hypothesis, 'get_similarity', return_value=similarity):
+            self.assertEqual([0, 5], [int(meta_id) for meta_id in algorithm._select(2)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from api.catalog_cache import MetaPathCatalogCache, estimate_size
+from util.datastructures import MetaPath
+
+
+class CatalogRedis:
+    def __init__(self, data_set):
+        self.data_set = data_set
+        self.generation = 0
+        self.requests = 0
+
+    def import_generation(self):
+        return self.generation
+
+    def meta_paths(self, start_type, end_type, node_types=None, edge_types=None, offset=0, limit=None):
+        self.requests += 1
+        return [MetaPath(edge_node_list=[start_type, 'HAS', end_type]).store_embedding([0.0] * 10)]
+
+
+class MetaPathCatalogCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.catalog_size = estimate_size(CatalogRedis('').meta_paths('A', 'B'))
+        self.cache = MetaPathCatalogCache(max_bytes=2 * self.catalog_size)
+        self.redis = CatalogRedis('Helmholtz')
+
+    def test_hit(self):
+        first = self.cache.meta_paths(self.redis, 'A', 'B')
+        second = self.cache.meta_paths(self.redis, 'A', 'B')
+
+        self.assertIs(first, second)
+        self.assertEqual(1, self.redis.requests)
+        self.assertEqual((1, 1), (self.cache.hits, self.cache.misses))
+
+    def test_new_import_generation(self):
+        self.cache.meta_paths(self.redis, 'A', 'B')
+        self.redis.generation += 1
+        self.cache.meta_paths(self.redis, 'A', 'B')
+
+        self.assertEqual(2, self.redis.requests)
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.meta_paths(self.redis, 'A', 'B')
+        self.cache.meta_paths(self.redis, 'A', 'C')
+        self.cache.meta_paths(self.redis, 'A', 'B')
+        self.cache.meta_paths(self.redis, 'A', 'D')
+
+        self.assertEqual(3, self.redis.requests)
+        self.cache.meta_paths(self.redis, 'A', 'B')
+        self.assertEqual(3, self.redis.requests)
+        self.cache.meta_paths(self.redis, 'A', 'C')
+        self.assertEqual(4, self.redis.requests)
+        self.assertLessEqual(self.cache.used_bytes, self.cache.max_bytes)
+
+    def test_data_sets_are_separated(self):
+        self.cache.meta_paths(self.redis, 'A', 'B')
+        other_redis = CatalogRedis('Freebase')
+        self.cache.meta_paths(other_redis, 'A', 'B')
+
+        self.assertEqual(1, other_redis.requests)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+from api.connections import ConnectionRegistry
+
+
+class ConnectionRegistryTest(unittest.TestCase):
+
+    def test_pool_is_shared(self):
+        registry = ConnectionRegistry()
+        self.assertIs(registry.redis_pool(), registry.redis_pool())
+
+    def test_pool_is_replaced_after_fork(self):
+        registry = ConnectionRegistry()
+        pool = registry.redis_pool()
+        # Pretend the registry was inherited from a parent process
+        registry._pid = -1
+
+        self.assertIsNot(pool, registry.redis_pool())
+        self.assertEqual(0, registry.statistics()['redis'][registry.redis_address('')]['created'])
+
+    def test_data_sets_are_routed_to_their_instance(self):
+        instances = [{'host': 'localhost', 'port': port} for port in (6379, 6380, 6381)]
+        registry = ConnectionRegistry(instances)
+        data_sets = ['data_set_{}'.format(i) for i in range(30)]
+
+        ports = set()
+        for data_set in data_sets:
+            pool = registry.redis_pool(data_set)
+            self.assertIs(pool, registry.redis_pools()[registry.redis_address(data_set)])
+            self.assertEqual(registry.redis_address(data_set), 'localhost:{}'.format(pool.connection_kwargs['port']))
+            ports.add(pool.connection_kwargs['port'])
+        self.assertEqual({6379, 6380, 6381}, ports)
+        self.assertEqual(3, len(registry.statistics()['redis']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import fakeredis
+import redis
+
+from api.connections import ConnectionRegistry
+from api.type_map_cache import type_map_cache
+
+
+def fake_connections(instances: int = 1) -> ConnectionRegistry:
+    """
+    :return: Registry of `instances` separate in-memory redis instances, e.g. to replace api.redis_own.connections
+             with unittest.mock.patch.
+    """
+    registry = ConnectionRegistry([{'host': 'redis{}'.format(i), 'port': 6379} for i in range(instances)])
+    registry._redis_pools = {address: redis.ConnectionPool(connection_class=fakeredis.FakeConnection,
+                                                           server=fakeredis.FakeServer())
+                             for address in registry._redis_instances}
+    # The type maps of other tests may be cached for the same data set and generation
+    type_map_cache.clear()
+    return registry
+
+
+def store_type_maps(client: redis.StrictRedis, namespace: str, node_types: dict, edge_types: dict):
+    """
+    Writes the type maps like the importer does.
+    :param node_types: Node type name by id.
+    :param edge_types: Edge type name by id.
+    """
+    for name, type_map in [('node_type_map', node_types), ('edge_type_map', edge_types)]:
+        client.hmset('{}_{}'.format(namespace, name), type_map)
+        client.hmset('{}_{}_reverse'.format(namespace, name), {value: key for key, value in type_map.items()})
+
+
+def import_server():
+    """
+    Imports api.server with in-memory redis instances. The server creates its job manager and session store at
+    import, so the pools of the global registry are replaced beforehand.
+    :return: The server module or None, if its dependencies, e.g. flask_ask, aren't installed.
+    """
+    from api.connections import connections
+    connections._check_process()
+    connections._redis_pools = {address: redis.ConnectionPool(connection_class=fakeredis.FakeConnection,
+                                                              server=fakeredis.FakeServer())
+                                for address in connections._redis_instances}
+    type_map_cache.clear()
+    try:
+        from api import server
+    except ImportError:
+        return None
+    return server
@@ -0,0 +1,223 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from api.jobs import JobManager, JobCancelled, QUEUED, RUNNING, FINISHED, FAILED, CANCELLED
+from api.redis_own import Redis
+from tests.api.fake_redis import fake_connections, import_server
+
+
+class JobManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('api.redis_own.connections', fake_connections())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.jobs = JobManager(Redis('job'), heartbeat_interval=0.05, heartbeat_timeout=60)
+
+    def _wait(self, job_id, statuses=(FINISHED, FAILED, CANCELLED)):
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            state = self.jobs.status(job_id)
+            if state['status'] in statuses:
+                return state
+            time.sleep(0.01)
+        self.fail("Job {} didn't reach {}".format(job_id, statuses))
+
+    def test_job_runs_with_parameters(self):
+        calls = []
+        self.jobs.register('add', lambda job, a, b: calls.append(a + b), ['a', 'b'])
+        job_id = self.jobs.submit('add', a=1, b=2)
+
+        state = self._wait(job_id)
+        self.assertEqual(FINISHED, state['status'])
+        self.assertEqual({'a': 1, 'b': 2}, state['parameters'])
+        self.assertEqual('add', state['kind'])
+        self.assertEqual([3], calls)
+        self.assertLessEqual(state['submitted'], state['started'])
+        self.assertLessEqual(state['started'], state['finished'])
+
+    def test_unknown_kind_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.jobs.submit('unknown')
+        self.assertIsNone(self.jobs.status('unknown'))
+        self.assertIsNone(self.jobs.progress('unknown'))
+        self.assertFalse(self.jobs.cancel('unknown'))
+
+    def test_failing_job_stores_error(self):
+        def fail(job):
+            raise RuntimeError("neo4j unreachable")
+
+        self.jobs.register('fail', fail)
+        state = self._wait(self.jobs.submit('fail'))
+        self.assertEqual(FAILED, state['status'])
+        self.assertIn('neo4j unreachable', state['error'])
+
+    def test_progress_is_reported(self):
+        reported = threading.Event()
+        release = threading.Event()
+
+        def work(job):
+            job.report_progress(3, 10, phase='checking')
+            reported.set()
+            release.wait(5)
+
+        self.jobs.register('work', work)
+        job_id = self.jobs.submit('work')
+        self.assertTrue(reported.wait(5))
+
+        self.assertEqual({'status': RUNNING, 'done': 3, 'total': 10, 'phase': 'checking'},
+                         self.jobs.progress(job_id))
+        release.set()
+        self.assertEqual(FINISHED, self._wait(job_id)['status'])
+
+    def test_cancelled_job_stops_at_next_progress_report(self):
+        started = threading.Event()
+        release = threading.Event()
+        reached = []
+
+        def work(job):
+            started.set()
+            release.wait(5)
+            # The last item of a phase is always reported
+            job.report_progress(1, 1)
+            reached.append(True)
+
+        self.jobs.register('work', work)
+        job_id = self.jobs.submit('work')
+        self.assertTrue(started.wait(5))
+        self.assertTrue(self.jobs.cancel(job_id))
+        self.assertTrue(self.jobs.status(job_id)['cancel_requested'])
+        release.set()
+
+        self.assertEqual(CANCELLED, self._wait(job_id)['status'])
+        self.assertEqual([], reached)
+        self.assertFalse(self.jobs.cancel(job_id))
+
+    def test_report_progress_raises_job_cancelled(self):
+        raised = []
+
+        def work(job):
+            self.jobs.cancel(job.job_id)
+            try:
+                job.report_progress(1, 1)
+            except JobCancelled:
+                raised.append(True)
+                raise
+
+        self.jobs.register('work', work)
+        self.assertEqual(CANCELLED, self._wait(self.jobs.submit('work'))['status'])
+        self.assertEqual([True], raised)
+
+    def test_running_job_keeps_heartbeat(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def work(job):
+            started.set()
+            release.wait(5)
+
+        self.jobs.register('work', work)
+        job_id = self.jobs.submit('work')
+        self.assertTrue(started.wait(5))
+        submitted = self.jobs.status(job_id)['heartbeat']
+        time.sleep(0.2)
+
+        state = self.jobs.status(job_id)
+        self.assertEqual(RUNNING, state['status'])
+        self.assertGreater(state['heartbeat'], submitted)
+        release.set()
+        self._wait(job_id)
+
+    def test_job_without_heartbeat_is_reported_failed(self):
+        # The process executing the job died after it started the job
+        self.jobs.redis._client.hmset('job_lost', {'kind': 'work', 'status': RUNNING, 'parameters': '{}',
+                                                   'submitted': time.time() - 120, 'started': time.time() - 120,
+                                                   'heartbeat': time.time() - 90, 'done': 5})
+
+        state = self.jobs.status('lost')
+        self.assertEqual(FAILED, state['status'])
+        self.assertIn('heartbeat', state['error'])
+        self.assertEqual(FAILED, self.jobs.redis._client.hget('job_lost', 'status').decode())
+        self.assertFalse(self.jobs.cancel('lost'))
+
+    def test_recent_heartbeat_is_not_failed(self):
+        self.jobs.redis._client.hmset('job_busy', {'kind': 'work', 'status': QUEUED, 'parameters': '{}',
+                                                   'submitted': time.time() - 120, 'heartbeat': time.time() - 5,
+                                                   'done': 0})
+        self.assertEqual(QUEUED, self.jobs.status('busy')['status'])
+
+    def test_only_registered_parameters_are_accepted(self):
+        self.jobs.register('import', lambda job, timeout=1: None, ['timeout'])
+
+        self.assertEqual({'timeout': 5}, self.jobs.check_parameters('import', {'timeout': 5}))
+        self.assertEqual({}, self.jobs.check_parameters('import', {}))
+        with self.assertRaises(ValueError):
+            self.jobs.check_parameters('import', {'timeout': 5, 'password': 'secret'})
+        with self.assertRaises(ValueError):
+            self.jobs.check_parameters('import', [5])
+
+
+server = import_server()
+
+
+@unittest.skipIf(server is None, "The server dependencies aren't installed")
+class JobRoutesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = server.app.test_client()
+        self.calls = []
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+        def train(job, database):
+            self.calls.append(database)
+            job.report_progress(1, 2, phase='training')
+            self.release.wait(5)
+
+        patcher = mock.patch.dict(server.jobs._functions, {'train-embeddings': train})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _status(self, job_id, statuses):
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            state = self.client.get('/jobs/{}'.format(job_id)).get_json()
+            if state['status'] in statuses:
+                return state
+            time.sleep(0.01)
+        self.fail("Job {} didn't reach {}".format(job_id, statuses))
+
+    def test_submit_status_progress_and_cancel(self):
+        response = self.client.post('/jobs/train-embeddings', json={'database': 'Helmholtz'})
+        self.assertEqual(202, response.status_code)
+        job_id = response.get_json()['job_id']
+
+        self._status(job_id, [RUNNING])
+        self.assertEqual(['Helmholtz'], self.calls)
+        progress = self.client.get('/jobs/{}/progress'.format(job_id)).get_json()
+        self.assertEqual({'status': RUNNING, 'done': 1, 'total': 2, 'phase': 'training'}, progress)
+
+        self.assertEqual(200, self.client.post('/jobs/{}/cancel'.format(job_id)).status_code)
+        self.assertTrue(self._status(job_id, [RUNNING])['cancel_requested'])
+        self.release.set()
+        self._status(job_id, [FINISHED, CANCELLED])
+
+    def test_unknown_parameters_are_rejected(self):
+        response = self.client.post('/jobs/train-embeddings', json={'database': 'Helmholtz', 'workers': 64})
+        self.assertEqual(400, response.status_code)
+        self.assertIn('workers', response.get_json()['error'])
+        response = self.client.post('/jobs/train-embeddings', json=['Helmholtz'])
+        self.assertEqual(400, response.status_code)
+        self.assertEqual([], self.calls)
+
+    def test_unknown_jobs(self):
+        self.assertEqual(404, self.client.post('/jobs/unknown', json={}).status_code)
+        self.assertEqual(404, self.client.get('/jobs/unknown').status_code)
+        self.assertEqual(404, self.client.get('/jobs/unknown/progress').status_code)
+        self.assertEqual(404, self.client.post('/jobs/unknown/cancel').status_code)
+
+
+if __name__ == '__main__':
+    unittest.main()
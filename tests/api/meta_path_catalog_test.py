@@ -0,0 +1,114 @@
+import json
+import unittest
+
+import numpy as np
+
+from api.meta_path_catalog import MetaPathCatalog
+from util.datastructures import MetaPath
+
+
+class MetaPathCatalogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.meta_paths = [MetaPath(edge_node_list=['0', '1', '2']).store_structural_value(3.5)
+                               .store_embedding([0.1, 0.2]),
+                           MetaPath(edge_node_list=['0', '0', '1', '1', '2']).store_structural_value(1.0)
+                               .store_embedding([0.3, 0.4])]
+
+    def _round_trip(self, catalog):
+        return MetaPathCatalog.decode({key.encode(): value for key, value in catalog.encode().items()})
+
+    def test_round_trip(self):
+        decoded = self._round_trip(MetaPathCatalog.from_meta_paths(self.meta_paths))
+        meta_paths = decoded.to_meta_paths()
+
+        self.assertEqual([mp.as_list() for mp in self.meta_paths], [mp.as_list() for mp in meta_paths])
+        self.assertEqual([3.5, 1.0], [mp.get_structural_value() for mp in meta_paths])
+        np.testing.assert_array_almost_equal([0.3, 0.4], meta_paths[1].get_representation('embedding'))
+
+    def test_columns(self):
+        catalog = self._round_trip(MetaPathCatalog.from_meta_paths(self.meta_paths))
+
+        np.testing.assert_array_equal([[0, 1, 2, -1, -1], [0, 0, 1, 1, 2]], catalog.type_ids)
+        np.testing.assert_array_equal([3, 5], catalog.lengths)
+        self.assertEqual(np.float32, catalog.embeddings.dtype)
+        # Columns are views of the received data
+        self.assertFalse(catalog.type_ids.flags.writeable)
+        self.assertFalse(catalog.embeddings.flags.owndata)
+
+    def test_from_type_ids(self):
+        catalog = MetaPathCatalog.from_type_ids([0, 1, 2, 0, 0, 1, 1, 2], [3, 5], [3.5, 1.0])
+        expected = MetaPathCatalog.from_meta_paths(self.meta_paths)
+
+        np.testing.assert_array_equal(expected.type_ids, catalog.type_ids)
+        np.testing.assert_array_equal(expected.lengths, catalog.lengths)
+        np.testing.assert_array_equal(expected.structural_values, catalog.structural_values)
+        self.assertIsNone(catalog.embeddings)
+        self.assertEqual(0, len(MetaPathCatalog.from_type_ids([], [], [])))
+
+    def test_type_names(self):
+        named = [MetaPath(edge_node_list=['Gene', 'HAS', 'Disease']).store_structural_value(2.0)]
+        catalog = MetaPathCatalog.from_meta_paths(named, {'Gene': 0, 'Disease': 1}, {'HAS': 4})
+        np.testing.assert_array_equal([[0, 4, 1]], catalog.type_ids)
+
+        meta_paths = self._round_trip(catalog).to_meta_paths({0: 'Gene', 1: 'Disease'}, {4: 'HAS'})
+        self.assertEqual(['Gene', 'HAS', 'Disease'], meta_paths[0].as_list())
+        self.assertIsNone(meta_paths[0].get_representation('embedding'))
+
+    def test_missing_structural_value(self):
+        catalog = self._round_trip(MetaPathCatalog.from_meta_paths([MetaPath(edge_node_list=['0', '1', '0'])]))
+        self.assertIsNone(catalog.to_meta_paths()[0].get_structural_value())
+
+    def test_indexes(self):
+        catalog = MetaPathCatalog.from_meta_paths(self.meta_paths)
+        rows_by_node_type, rows_by_edge_type = catalog.rows_by_type()
+
+        self.assertEqual({0: [0, 1], 1: [1], 2: [0, 1]}, rows_by_node_type)
+        self.assertEqual({0: [1], 1: [0, 1]}, rows_by_edge_type)
+        self.assertEqual({(0, 2): 2}, catalog.type_pairs())
+
+    def test_select(self):
+        selected = MetaPathCatalog.from_meta_paths(self.meta_paths).select([1])
+        self.assertEqual([['0', '0', '1', '1', '2']], [mp.as_list() for mp in selected.to_meta_paths()])
+        self.assertEqual(1, len(selected.embeddings))
+
+    def test_type_pairs_in_header(self):
+        header = json.loads(MetaPathCatalog.from_meta_paths(self.meta_paths).encode()['header'].decode())
+
+        self.assertEqual({'0_2': 2}, header['type_pairs'])
+        self.assertEqual({}, json.loads(MetaPathCatalog.from_meta_paths([]).encode()['header'].decode())['type_pairs'])
+
+    def test_unknown_version(self):
+        fields = {key.encode(): value for key, value in MetaPathCatalog.from_meta_paths(self.meta_paths)
+                  .encode().items()}
+        fields[b'header'] = json.dumps(dict(json.loads(fields[b'header'].decode()), version=0)).encode()
+        with self.assertRaises(ValueError):
+            MetaPathCatalog.decode(fields)
+
+    def test_compressed_round_trip(self):
+        catalog = MetaPathCatalog.from_meta_paths(self.meta_paths)
+        for compression in ['zlib', 'lzma']:
+            fields = {key.encode(): value for key, value in catalog.encode(compression, level=6).items()}
+            self.assertEqual(compression, json.loads(fields[b'header'].decode())['compression'])
+
+            decoded = MetaPathCatalog.decode(fields)
+            np.testing.assert_array_equal(catalog.type_ids, decoded.type_ids)
+            np.testing.assert_array_equal(catalog.structural_values, decoded.structural_values)
+            np.testing.assert_array_equal(catalog.embeddings, decoded.embeddings)
+
+    def test_small_catalog_is_not_compressed(self):
+        fields = MetaPathCatalog.from_meta_paths(self.meta_paths).encode('zlib', min_bytes=4096)
+        self.assertIsNone(json.loads(fields['header'].decode())['compression'])
+
+    def test_version_without_compression(self):
+        fields = {key.encode(): value for key, value in MetaPathCatalog.from_meta_paths(self.meta_paths)
+                  .encode().items()}
+        header = json.loads(fields[b'header'].decode())
+        del header['compression']
+        fields[b'header'] = json.dumps(dict(header, version=1)).encode()
+
+        self.assertEqual(2, len(MetaPathCatalog.decode(fields)))
+
+
+if __name__ == '__main__':
+    unittest.main()
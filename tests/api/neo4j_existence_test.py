@@ -0,0 +1,72 @@
+import unittest
+import unittest.mock
+
+from neo4j.exceptions import ClientError, TransientError
+
+from api.neo4j_own import Neo4j
+
+
+class FailingSession:
+    def __init__(self, errors, record=None):
+        # Raised by the first queries, one per query
+        self.errors = list(errors)
+        self.record = record
+        self.attempts = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def begin_transaction(self, timeout=None):
+        return self
+
+    def run(self, statement, parameters=None, **kwparameters):
+        self.attempts += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return self
+
+    def single(self):
+        return self.record
+
+
+class ExistenceTest(unittest.TestCase):
+
+    def neo4j(self, session):
+        neo4j = Neo4j.__new__(Neo4j)
+        neo4j._driver = unittest.mock.Mock()
+        neo4j._driver.session.return_value = session
+        neo4j.logger = unittest.mock.Mock()
+        return neo4j
+
+    def test_transient_error_is_retried(self):
+        session = FailingSession([TransientError("deadlock")], record={'p': 1})
+
+        self.assertTrue(self.neo4j(session).test_whether_meta_path_exists("(e0:A)-[n1:r]-(e2:B)"))
+        self.assertEqual(2, session.attempts)
+
+    def test_repeated_transient_errors_are_unknown(self):
+        session = FailingSession([TransientError("deadlock")] * 2, record={'p': 1})
+
+        self.assertIsNone(self.neo4j(session).test_whether_meta_path_exists("(e0:A)-[n1:r]-(e2:B)"))
+
+    def test_timeout_is_unknown(self):
+        session = FailingSession([ClientError.hydrate("transaction timed out",
+                                                      'Neo.ClientError.Transaction.TransactionTimedOut')])
+
+        self.assertIsNone(self.neo4j(session).test_whether_meta_path_exists("(e0:A)-[n1:r]-(e2:B)", timeout=1))
+        self.assertEqual(1, session.attempts)
+
+    def test_rejected_query_has_no_instance(self):
+        session = FailingSession([ClientError.hydrate("invalid input", 'Neo.ClientError.Statement.SyntaxError')])
+        neo4j = self.neo4j(session)
+
+        self.assertIs(False, neo4j.test_whether_meta_path_exists("(e0:A B)-[n1:r]-(e2:B)", timeout=1))
+        self.assertEqual(1, session.attempts)
+        neo4j.logger.warning.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
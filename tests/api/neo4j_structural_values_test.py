@@ -0,0 +1,71 @@
+import unittest
+import unittest.mock
+
+from api.neo4j_own import Neo4j
+from util.datastructures import MetaPath
+
+
+class FakeSession:
+    def __init__(self, records):
+        # prefix query -> records
+        self.records = records
+        self.queries = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def begin_transaction(self, timeout=None):
+        self.timeout = timeout
+        return self
+
+    def run(self, statement, parameters=None, **kwparameters):
+        self.queries.append((statement, kwparameters))
+        return next(records for prefix, records in self.records.items() if statement.startswith(prefix))
+
+
+class FakeDriver:
+    def __init__(self, session):
+        self._session = session
+
+    def session(self):
+        return self._session
+
+
+class StructuralValuesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.session = FakeSession({
+            "MATCH (n0:Gene)-[e0:HAS]-(n1:Disease)-[last_edge]": [
+                {'edge': 'CAUSES', 'labels': ['Phenotype'], 'count': 4},
+                {'edge': 'HAS', 'labels': ['Gene', 'Target'], 'count': 2}],
+            "MATCH (n0:Gene)-[last_edge]": [{'edge': 'HAS', 'labels': ['Gene'], 'count': 7}]})
+        self.neo4j = Neo4j.__new__(Neo4j)
+        self.neo4j._driver = FakeDriver(self.session)
+        self.neo4j.logger = unittest.mock.Mock()
+
+    def test_paths_with_shared_prefix_are_counted_together(self):
+        meta_paths = [MetaPath(edge_node_list=['Gene', 'HAS', 'Disease', 'CAUSES', 'Phenotype']),
+                      MetaPath(edge_node_list=['Gene', 'HAS', 'Gene']),
+                      MetaPath(edge_node_list=['Gene', 'HAS', 'Disease', 'HAS', 'Gene']),
+                      MetaPath(edge_node_list=['Gene', 'HAS', 'Disease', 'HAS', 'Phenotype'])]
+
+        counts = dict(self.neo4j.get_structural_values(meta_paths, [1, 2], [3]))
+
+        self.assertEqual({0: 4, 1: 7, 2: 2, 3: 0}, counts)
+        self.assertEqual(2, len(self.session.queries))
+        statement, parameters = self.session.queries[0]
+        # Node ids are parameters, so the query text only depends on the prefix
+        self.assertNotIn('[1, 2]', statement)
+        self.assertEqual([1, 2], parameters['start_ids'])
+        self.assertEqual({'CAUSES', 'HAS'}, set(parameters['edge_types']))
+
+    def test_single_meta_path(self):
+        meta_path = MetaPath(edge_node_list=['Gene', 'HAS', 'Gene'])
+        self.assertEqual(7, self.neo4j.get_structural_value(meta_path, [1], [2], 'Helmholtz'))
+
+
+if __name__ == '__main__':
+    unittest.main()
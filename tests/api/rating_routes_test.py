@@ -0,0 +1,88 @@
+import unittest
+from unittest import mock
+
+from sklearn.gaussian_process import GaussianProcessRegressor
+
+from active_learning.active_learner import UncertaintySamplingAlgorithm
+from tests.api.fake_redis import import_server
+from util.datastructures import MetaPath
+
+server = import_server()
+
+
+@unittest.skipIf(server is None, "The server dependencies aren't installed")
+class RateAndNextMetaPathsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = server.app.test_client()
+        meta_paths = [MetaPath(edge_node_list=['A', 'r', 'B'] * length + ['A']).store_embedding([length, 1.0])
+                      for length in range(1, 7)]
+        with self.client.session_transaction() as session:
+            session['active_learning_algorithm'] = UncertaintySamplingAlgorithm(meta_paths,
+                                                                                hypothesis='Gaussian Process')
+        # The background selection of the following batch would fit the gaussian process as well
+        patcher = mock.patch.object(server.speculative_selector, 'submit')
+        self.submit = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def algorithm(self) -> UncertaintySamplingAlgorithm:
+        with self.client.session_transaction() as session:
+            return session['active_learning_algorithm']
+
+    def first_batch(self):
+        response = self.client.get('/next-meta-paths/2')
+        self.assertEqual(200, response.status_code)
+        return response.get_json()['meta_paths']
+
+    def test_ratings_are_applied_and_next_batch_is_sent(self):
+        batch = self.first_batch()
+        ratings = {meta_path['id']: rating for meta_path, rating in zip(batch, [0.2, 0.9])}
+        rated = [dict(meta_path, rating=ratings[meta_path['id']]) for meta_path in batch]
+
+        with mock.patch.object(GaussianProcessRegressor, 'fit', autospec=True,
+                               side_effect=GaussianProcessRegressor.fit) as fit:
+            response = self.client.post('/rate-and-next-meta-paths/2', json={'meta_paths': rated})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(1, fit.call_count)
+
+        paths = response.get_json()
+        self.assertEqual(2, len(paths['meta_paths']))
+        self.assertTrue(paths['next_batch_available'])
+        self.assertFalse(set(ratings) & {meta_path['id'] for meta_path in paths['meta_paths']})
+        self.assertEqual({'min_path', 'max_path', 'meta_paths', 'next_batch_available'}, set(paths.keys()))
+        self.assertEqual(sorted(ratings), sorted([paths['min_path']['id'], paths['max_path']['id']]))
+
+        algorithm = self.algorithm()
+        for meta_path_id, rating in ratings.items():
+            self.assertAlmostEqual(rating, algorithm.meta_paths_rating[meta_path_id])
+        # The following batch is selected once the response is sent
+        response.close()
+        self.assertEqual(sorted(meta_path['id'] for meta_path in paths['meta_paths']),
+                         sorted(self.submit.call_args[0][2]))
+
+    def test_invalid_batch_size_is_rejected(self):
+        rated = [dict(meta_path, rating=0.5) for meta_path in self.first_batch()]
+
+        self.assertEqual(400, self.client.post('/rate-and-next-meta-paths/0', json={'meta_paths': rated}).status_code)
+        self.assertEqual(404, self.client.post('/rate-and-next-meta-paths/two',
+                                               json={'meta_paths': rated}).status_code)
+        # Nothing was rated
+        self.assertTrue(self.algorithm().is_first_batch())
+
+    def test_invalid_payload_is_rejected(self):
+        meta_path = self.first_batch()[0]
+        payloads = [None, [meta_path], {'ratings': [meta_path]}, {'meta_paths': meta_path},
+                    {'meta_paths': [{'id': meta_path['id'], 'rating': 0.5}]},
+                    {'meta_paths': [dict(meta_path, id=100)]},
+                    {'meta_paths': [dict(meta_path, rating='good')]}]
+        for payload in payloads:
+            if payload is None:
+                response = self.client.post('/rate-and-next-meta-paths/2', data='ratings')
+            else:
+                response = self.client.post('/rate-and-next-meta-paths/2', json=payload)
+            self.assertEqual(400, response.status_code, payload)
+        self.assertTrue(self.algorithm().is_first_batch())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from unittest import mock
+
+from api.meta_path_catalog import MetaPathCatalog
+from api.redis_own import Redis
+from tests.api.fake_redis import fake_connections, store_type_maps
+from util.datastructures import MetaPath
+
+
+def catalog(*meta_paths):
+    return MetaPathCatalog.from_meta_paths([MetaPath(edge_node_list=labels).store_structural_value(1.0)
+                                            for labels in meta_paths])
+
+
+class IterMetaPathsTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('api.redis_own.connections', fake_connections())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.redis = Redis('Graph')
+        store_type_maps(self.redis._client, 'Graph', {'0': 'A', '1': 'B'}, {'2': 'r', '3': 's'})
+        # Catalogs of the importer with their type indexes, rankings and type pair counts
+        self.redis.store_catalogs({'Graph_0_1': catalog(['0', '2', '1'], ['0', '3', '1']),
+                                   'Graph_1_0': catalog(['1', '2', '0'])})
+        # Catalogs served to the users, which consist of type names
+        self.redis.store_embeddings([(MetaPath(edge_node_list=['0', '2', '1']), [0.5, 0.5])])
+        self.redis._client.hset('Graph_sessions', 'sid', 1)
+
+    def meta_paths(self, redis: Redis, chunk_size: int = 10):
+        return sorted(meta_path.as_list() for meta_path in redis.iter_meta_paths(chunk_size))
+
+    def test_only_catalogs_of_the_importer_are_read(self):
+        keys = {key.decode() for key in self.redis._client.keys('Graph_*')}
+        self.assertTrue({'Graph_sessions', 'Graph_0_1_all', 'Graph_0_1_node_0', 'Graph_0_1_edge_2',
+                         'Graph_0_1_by_structural_value', 'Graph_0_1_indexes', 'Graph_type_pairs',
+                         'Graph_A_B_embedded', 'Graph_node_type_map'} <= keys)
+
+        self.assertEqual([['0', '2', '1'], ['0', '3', '1'], ['1', '2', '0']], self.meta_paths(self.redis))
+
+    def test_catalogs_are_fetched_in_chunks(self):
+        self.assertEqual([['0', '2', '1'], ['0', '3', '1'], ['1', '2', '0']], self.meta_paths(self.redis, 1))
+
+    def test_other_generations_are_skipped(self):
+        generation = self.redis.create_generation()
+        store_type_maps(generation._client, generation.namespace, {'0': 'A', '1': 'B'}, {'2': 'r', '3': 's'})
+        generation.store_catalogs({'{}_0_1'.format(generation.namespace): catalog(['0', '3', '1', '3', '1'])})
+
+        self.assertEqual([['0', '2', '1'], ['0', '3', '1'], ['1', '2', '0']], self.meta_paths(self.redis))
+        self.assertEqual([['0', '3', '1', '3', '1']], self.meta_paths(Redis('Graph', generation.generation)))
+
+    def test_other_data_sets_are_skipped(self):
+        # Shares the prefix of the data set, but not its namespace
+        other = Redis('Graph2')
+        other._client.hmset('Graph2_0_1', catalog(['0', '2', '0']).encode())
+
+        self.assertEqual([['0', '2', '1'], ['0', '3', '1'], ['1', '2', '0']], self.meta_paths(self.redis))
+
+
+if __name__ == '__main__':
+    unittest.main()
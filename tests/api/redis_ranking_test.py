@@ -0,0 +1,45 @@
+import unittest
+from unittest import mock
+
+from api.redis_own import Redis
+from tests.api.fake_redis import fake_connections, store_type_maps
+from util.datastructures import MetaPath
+
+
+class RankingTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('api.redis_own.connections', fake_connections())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.redis = Redis('Graph')
+        store_type_maps(self.redis._client, 'Graph', {'0': 'A', '1': 'B'}, {'2': 'r', '3': 's', '4': 't'})
+        meta_paths = [MetaPath(edge_node_list=['0', '2', '1']).store_structural_value(1.0),
+                      MetaPath(edge_node_list=['0', '3', '1']),
+                      MetaPath(edge_node_list=['0', '4', '1']).store_structural_value(3.0),
+                      MetaPath(edge_node_list=['0', '2', '0', '3', '1'])]
+        self.redis.store_embeddings([(meta_path, [0.5, 0.5]) for meta_path in meta_paths])
+
+    def page(self, offset, limit, **types):
+        return [meta_path.as_list() for meta_path in self.redis.meta_paths('A', 'B', offset=offset, limit=limit,
+                                                                          **types)]
+
+    def test_meta_paths_without_structural_value_come_last(self):
+        self.assertEqual([['A', 't', 'B'], ['A', 'r', 'B']], self.page(0, 2))
+        self.assertEqual(sorted([['A', 's', 'B'], ['A', 'r', 'A', 's', 'B']]), sorted(self.page(2, 2)))
+        self.assertEqual([], self.page(4, 2))
+        self.assertEqual(4, self.redis._client.zcard('Graph_A_B_embedded_by_structural_value'))
+
+    def test_filtered_meta_paths_without_structural_value_come_last(self):
+        self.assertEqual([['A', 't', 'B'], ['A', 's', 'B']], self.page(0, 5, edge_types=['s', 't']))
+        self.assertEqual([['A', 's', 'B']], self.page(1, 5, edge_types=['s', 't']))
+
+    def test_structural_values_are_kept(self):
+        structural_values = {tuple(meta_path.as_list()): meta_path.get_structural_value()
+                             for meta_path in self.redis.meta_paths('A', 'B', offset=0, limit=4)}
+        self.assertEqual(3.0, structural_values[('A', 't', 'B')])
+        self.assertIsNone(structural_values[('A', 's', 'B')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+from unittest import mock
+
+import redis
+
+from api.meta_path_catalog import MetaPathCatalog
+from api.redis_own import Redis
+from tests.api.fake_redis import fake_connections, store_type_maps
+from util.datastructures import MetaPath
+
+
+class RedisRoutingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.connections = fake_connections(instances=2)
+        patcher = mock.patch('api.redis_own.connections', self.connections)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.data_sets = ['Helmholtz', 'Freebase']
+        # The ring assigns the data sets to different instances
+        self.assertNotEqual(*[self.connections.redis_address(data_set) for data_set in self.data_sets])
+        for i, data_set in enumerate(self.data_sets):
+            store_type_maps(Redis(data_set)._client, data_set, {'0': 'A', '1': 'B'}, {'2': 'r', '3': 's'})
+            meta_paths = [MetaPath(edge_node_list=['0', '2', '1']).store_structural_value(2.0 + i),
+                          MetaPath(edge_node_list=['0', '3', '1']).store_structural_value(1.0)]
+            Redis(data_set).store_embeddings([(meta_path, [0.5, 0.5]) for meta_path in meta_paths])
+
+    def instance(self, data_set: str) -> redis.StrictRedis:
+        address = self.connections.redis_address(data_set)
+        return redis.StrictRedis(connection_pool=self.connections.redis_pools()[address])
+
+    def other_instance(self, data_set: str) -> redis.StrictRedis:
+        address = self.connections.redis_address(data_set)
+        return redis.StrictRedis(connection_pool=next(pool for other, pool in self.connections.redis_pools().items()
+                                                      if other != address))
+
+    def test_keys_are_written_to_the_instance_of_their_data_set(self):
+        for data_set in self.data_sets:
+            keys = [key.decode() for key in self.instance(data_set).keys('{}_*'.format(data_set))]
+            self.assertIn('{}_A_B_embedded'.format(data_set), keys)
+            self.assertIn('{}_A_B_embedded_by_structural_value'.format(data_set), keys)
+            self.assertIn('{}_A_B_embedded_edge_2'.format(data_set), keys)
+            self.assertEqual([], self.other_instance(data_set).keys('{}_*'.format(data_set)))
+
+    def test_ranked_and_filtered_reads(self):
+        for data_set in self.data_sets:
+            self.assertEqual([['A', 'r', 'B']], [meta_path.as_list() for meta_path in
+                                                 Redis(data_set).meta_paths('A', 'B', limit=1)])
+            # SDIFFSTORE and ZINTERSTORE on the index keys within one transaction
+            self.assertEqual([['A', 's', 'B']], [meta_path.as_list() for meta_path in
+                                                 Redis(data_set).meta_paths('A', 'B', edge_types=['s'], limit=5)])
+            self.assertEqual({('A', 'B'): 2}, Redis(data_set).type_pairs())
+
+    def test_generations_stay_on_the_instance_of_their_data_set(self):
+        data_set = 'Freebase'
+        generation = Redis(data_set).create_generation()
+        store_type_maps(generation._client, generation.namespace, {'0': 'A', '1': 'B'}, {'2': 'r'})
+        generation.store_catalogs({'{}_0_1'.format(generation.namespace): MetaPathCatalog.from_meta_paths(
+            [MetaPath(edge_node_list=['0', '2', '1'])])})
+        self.assertEqual([0], generation.activate())
+
+        self.assertEqual(b'1', self.instance(data_set).get('Freebase_active_generation'))
+        self.assertIsNone(self.other_instance(data_set).get('Freebase_active_generation'))
+        # SCAN only finds the meta-paths of the data set on its instance
+        self.assertEqual([['0', '2', '1']], [meta_path.as_list() for meta_path in Redis(data_set).iter_meta_paths()])
+
+        self.assertGreater(Redis(data_set).delete_generation(0), 0)
+        self.assertEqual([], self.instance(data_set).keys('Freebase_A_B_embedded*'))
+        self.assertEqual(2, len(Redis('Helmholtz').meta_paths('A', 'B')))
+
+    def test_catalogs_of_other_data_sets_are_rejected(self):
+        catalog = MetaPathCatalog.from_meta_paths([MetaPath(edge_node_list=['0', '2', '1'])])
+
+        with self.assertRaises(ValueError):
+            Redis('Helmholtz').store_catalog('Freebase_0_1', catalog)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+from unittest import mock
+
+from api.meta_path_catalog import MetaPathCatalog
+from api.redis_own import Redis
+from tests.api.fake_redis import fake_connections, store_type_maps
+from util.datastructures import MetaPath
+
+
+class StoreEmbeddingsTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('api.redis_own.connections', fake_connections())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.redis = Redis('Graph')
+        store_type_maps(self.redis._client, 'Graph', {'0': 'A', '1': 'B', '2': 'C'}, {'3': 'r', '4': 's'})
+        # Catalogs of the importer for three pairs of start and end type
+        self.redis.store_catalogs({
+            'Graph_0_1': MetaPathCatalog.from_meta_paths(
+                [MetaPath(edge_node_list=['0', '3', '1']).store_structural_value(2.0),
+                 MetaPath(edge_node_list=['0', '4', '1']).store_structural_value(1.0)]),
+            'Graph_1_2': MetaPathCatalog.from_meta_paths(
+                [MetaPath(edge_node_list=['1', '3', '2']).store_structural_value(3.0)]),
+            'Graph_2_0': MetaPathCatalog.from_meta_paths(
+                [MetaPath(edge_node_list=['2', '4', '0', '3', '0'])])})
+
+    def embed(self, chunk_size: int):
+        # Like the training, which reads the catalogs of the importer chunk by chunk
+        return [(meta_path, [float(len(meta_path)), 1.0]) for meta_path in self.redis.iter_meta_paths(chunk_size)]
+
+    def test_catalogs_of_all_chunks_are_stored(self):
+        progress = []
+        statistics = self.redis.store_embeddings(self.embed(chunk_size=1),
+                                                 progress=lambda *report: progress.append(report))
+
+        self.assertEqual(4, statistics['meta_paths'])
+        self.assertEqual(3, statistics['catalogs'])
+        self.assertGreaterEqual(statistics['seconds'], 0)
+        self.assertGreater(statistics['meta_paths_per_second'], 0)
+        self.assertEqual((4, 4, 'store embeddings'), progress[-1])
+        self.assertEqual(4, max(done for done, _, phase in progress if phase == 'encode embeddings'))
+
+        self.assertEqual({('A', 'B'): 2, ('B', 'C'): 1, ('C', 'A'): 1}, self.redis.type_pairs())
+        meta_paths = self.redis.meta_paths('A', 'B')
+        self.assertEqual([['A', 'r', 'B'], ['A', 's', 'B']], sorted(meta_path.as_list() for meta_path in meta_paths))
+        self.assertEqual([2.0, 1.0], [meta_path.get_structural_value() for meta_path in meta_paths])
+        self.assertEqual([3.0, 1.0], list(meta_paths[0].get_representation('embedding')))
+        self.assertIsNone(self.redis.meta_paths('C', 'A')[0].get_structural_value())
+
+    def test_catalogs_are_written_in_one_transaction(self):
+        with mock.patch.object(Redis, 'store_catalogs', autospec=True, side_effect=Redis.store_catalogs) as store:
+            self.redis.store_embeddings(self.embed(chunk_size=2))
+
+        store.assert_called_once()
+        self.assertEqual({'Graph_A_B_embedded', 'Graph_B_C_embedded', 'Graph_C_A_embedded'},
+                         set(store.call_args[0][1].keys()))
+        # Invalidates the cached catalogs of the server processes together with the write
+        self.assertEqual(b'1', self.redis._client.get('Graph_import_generation'))
+
+    def test_embeddings_replace_previous_ones(self):
+        self.redis.store_embeddings(self.embed(chunk_size=2))
+        self.redis.store_embeddings([(meta_path, [0.0, 0.0]) for meta_path in self.redis.iter_meta_paths()
+                                     if meta_path.as_list()[0] == '0'])
+
+        self.assertEqual(2, len(self.redis.meta_paths('A', 'B')))
+        self.assertEqual([0.0, 0.0], list(self.redis.meta_paths('A', 'B')[0].get_representation('embedding')))
+        self.assertEqual(b'2', self.redis._client.get('Graph_import_generation'))
+
+
+if __name__ == '__main__':
+    unittest.main()
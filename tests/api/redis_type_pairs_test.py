@@ -0,0 +1,60 @@
+import unittest
+from unittest import mock
+
+from api.meta_path_catalog import MetaPathCatalog
+from api.redis_own import Redis
+from tests.api.fake_redis import fake_connections, store_type_maps
+from util.datastructures import MetaPath
+
+
+def catalog(*meta_paths, embedded=False):
+    meta_paths = [MetaPath(edge_node_list=labels) for labels in meta_paths]
+    if embedded:
+        meta_paths = [meta_path.store_embedding([0.5, 0.5]) for meta_path in meta_paths]
+    return MetaPathCatalog.from_meta_paths(meta_paths)
+
+
+class TypePairsTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('api.redis_own.connections', fake_connections())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.redis = Redis('Graph')
+        store_type_maps(self.redis._client, 'Graph', {'0': 'A', '1': 'B', '2': 'C'}, {'3': 'r', '4': 's'})
+        self.redis.store_catalogs({'Graph_A_B_embedded': catalog(['0', '3', '1'], ['0', '4', '1'], embedded=True),
+                                   'Graph_0_1': catalog(['0', '3', '1'], ['0', '4', '1'])})
+
+    def test_pairs_are_counted(self):
+        self.assertEqual({('A', 'B'): 2}, self.redis.type_pairs())
+        self.assertEqual({('A', 'B'): 2}, self.redis.type_pairs(embedded=False))
+
+    def test_replaced_catalog_with_less_meta_paths(self):
+        self.redis.store_catalog('Graph_A_B_embedded', catalog(['0', '3', '1'], embedded=True))
+
+        self.assertEqual({('A', 'B'): 1}, self.redis.type_pairs())
+        self.assertEqual({('A', 'B'): 2}, self.redis.type_pairs(embedded=False))
+
+    def test_replaced_catalog_without_meta_paths(self):
+        self.redis.store_catalog('Graph_A_B_embedded', catalog())
+
+        self.assertEqual({}, self.redis.type_pairs())
+        self.assertEqual([], self.redis.meta_paths('A', 'B'))
+
+    def test_replaced_catalog_of_another_pair(self):
+        self.redis.store_catalog('Graph_0_1', catalog(['0', '3', '2']))
+
+        self.assertEqual({('A', 'C'): 1}, self.redis.type_pairs(embedded=False))
+
+    def test_deleted_catalog(self):
+        self.redis.delete_catalogs(['Graph_A_B_embedded'])
+
+        self.assertEqual({}, self.redis.type_pairs())
+        self.assertEqual({('A', 'B'): 2}, self.redis.type_pairs(embedded=False))
+        self.assertEqual([b'Graph_0_1'], [key for key in self.redis._client.keys('Graph_*_*')
+                                          if not key.startswith(b'Graph_0_1_')
+                                          and not key.decode().endswith(('map', 'reverse', 'type_pairs'))])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import pickle
+import unittest
+
+import numpy as np
+
+from active_learning.active_learner import UncertaintySamplingAlgorithm, State
+from api.session_codec import SessionCodec, VERSION
+from explanation.explanation import SimilarityScore
+from util.datastructures import MetaPath
+
+
+class SessionCodecTest(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.RandomState(42)
+        self.meta_paths = [MetaPath(edge_node_list=['Gene', 'HAS', 'Disease'])
+                               .store_embedding(random.rand(30).tolist())
+                               .store_structural_value(float(i))
+                           for i in range(500)]
+        self.codec = SessionCodec(lambda data_set, start_type, end_type, node_types, edge_types, limit:
+                                  self.meta_paths)
+        self.algorithm = UncertaintySamplingAlgorithm(self.meta_paths, hypothesis='Gaussian Process')
+        self.algorithm.catalog = ('Helmholtz', 'Gene', 'Disease', None, None, None)
+        self.algorithm.update([{'id': 3, 'rating': 0.2}, {'id': 42, 'rating': 0.9}, {'id': 7, 'rating': 0.6}])
+
+    def test_algorithm_round_trip(self):
+        encoded = self.codec.encode(self.algorithm, {})
+        decoded = self.codec.decode(encoded, None)
+
+        np.testing.assert_array_equal(self.algorithm.visited == State.VISITED, decoded.visited == State.VISITED)
+        np.testing.assert_array_equal(self.algorithm.meta_paths_rating, decoded.meta_paths_rating)
+        np.testing.assert_array_almost_equal(self.algorithm.hypothesis.get_uncertainty(range(500)),
+                                             decoded.hypothesis.get_uncertainty(range(500)))
+        self.assertEqual(self.algorithm.random.randint(1000), decoded.random.randint(1000))
+        self.assertEqual(self.algorithm.catalog, decoded.catalog)
+
+    def test_encoding_is_smaller_than_pickle(self):
+        self.algorithm.hypothesis.get_similarity()
+        encoded = self.codec.encode(self.algorithm, {})
+        self.assertLess(len(encoded), 5 * 1024)
+        self.assertLess(len(encoded) * 100, len(pickle.dumps(self.algorithm)))
+
+    def test_similarity_score_keeps_algorithm_reference(self):
+        similarity_score = SimilarityScore(self.algorithm.get_complete_rating, {'name': 'Helmholtz'}, [1, 2], [3])
+        encoded = self.codec.encode(similarity_score, {id(self.algorithm): 'active_learning_algorithm'})
+        decoded = self.codec.decode(encoded, lambda key: self.algorithm)
+
+        self.assertIs(self.algorithm, decoded.get_complete_rating.__self__)
+        self.assertEqual([1, 2], decoded.start_node_ids)
+        self.assertIsNone(decoded.node_set_structural_values)
+
+    def test_similarity_score_keeps_node_set_structural_values(self):
+        similarity_score = SimilarityScore(self.algorithm.get_complete_rating, {'name': 'Helmholtz'}, [1, 2], [3])
+        similarity_score.store_node_set_structural_values({0: 4, 7: 1})
+        encoded = self.codec.encode(similarity_score, {id(self.algorithm): 'active_learning_algorithm'})
+        decoded = self.codec.decode(encoded, lambda key: self.algorithm)
+
+        self.assertEqual({0: 4, 7: 1}, decoded.node_set_structural_values)
+        self.assertEqual(0, decoded.get_structural_value({'id': 3, 'metapath': self.meta_paths[3]}))
+
+    def test_unknown_version(self):
+        encoded = bytearray(self.codec.encode(self.algorithm, {}))
+        encoded[3] = VERSION + 1
+        with self.assertRaises(ValueError):
+            self.codec.decode(bytes(encoded), None)
+
+    def test_changed_catalog(self):
+        encoded = self.codec.encode(self.algorithm, {})
+        self.meta_paths = self.meta_paths[:-1]
+        with self.assertRaises(ValueError):
+            self.codec.decode(encoded, None)
+
+    def test_reordered_catalog(self):
+        encoded = self.codec.encode(self.algorithm, {})
+        # Same number of meta-paths, but the ids refer to other meta-paths, e.g. after a re-import
+        self.meta_paths = [MetaPath(edge_node_list=['Gene', 'HAS', 'Phenotype'])] + self.meta_paths[:-1]
+        with self.assertRaises(ValueError):
+            self.codec.decode(encoded, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
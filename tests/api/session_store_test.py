@@ -0,0 +1,96 @@
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+from api.redis_own import Redis
+from api.session_store import RedisSession, RedisSessionInterface
+from tests.api.fake_redis import fake_connections
+
+
+class Algorithm:
+    def __init__(self):
+        self.ratings = [0.5, 0.7]
+
+    def get_complete_rating(self):
+        return self.ratings
+
+
+class Score:
+    def __init__(self, get_complete_rating):
+        self.get_complete_rating = get_complete_rating
+
+
+class RedisSessionTest(unittest.TestCase):
+
+    def _store_and_reload(self, session):
+        changed, removed = session.changed_entries()
+        stored = dict(session.stored_entries)
+        stored.update(changed)
+        for key in removed:
+            del stored[key]
+        return RedisSession(session.sid, stored)
+
+    def test_unchanged_entries_are_not_written(self):
+        session = RedisSession('sid', new=True)
+        session['username'] = 'alice'
+        session['algorithm'] = Algorithm()
+        session = self._store_and_reload(session)
+
+        self.assertEqual('alice', session['username'])
+        self.assertEqual(({}, []), session.changed_entries())
+
+        session['algorithm'].ratings.append(1.0)
+        changed, removed = session.changed_entries()
+        self.assertEqual(['algorithm'], list(changed.keys()))
+        self.assertEqual([], removed)
+
+    def test_entries_are_loaded_lazily(self):
+        session = RedisSession('sid', new=True)
+        session['algorithm'] = Algorithm()
+        session = self._store_and_reload(session)
+
+        self.assertEqual([], session.loaded_items())
+        self.assertIn('algorithm', session)
+
+    def test_removed_entries(self):
+        session = RedisSession('sid', new=True)
+        session['username'] = 'alice'
+        session = self._store_and_reload(session)
+        session.clear()
+
+        self.assertEqual(({}, ['username']), session.changed_entries())
+
+    def test_shared_references_are_preserved(self):
+        session = RedisSession('sid', new=True)
+        session['algorithm'] = Algorithm()
+        session['score'] = Score(session['algorithm'].get_complete_rating)
+        session = self._store_and_reload(session)
+
+        session['algorithm'].ratings.append(1.0)
+        self.assertEqual([0.5, 0.7, 1.0], session['score'].get_complete_rating())
+
+
+class RedisSessionInterfaceTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('api.redis_own.connections', fake_connections())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.app = Flask(__name__)
+        self.interface = RedisSessionInterface(Redis('session'))
+
+    def test_only_the_expiring_session_hash_is_written(self):
+        session = RedisSession('sid', new=True)
+        session['username'] = 'alice'
+        session['dataset'] = {'name': 'Helmholtz'}
+        with self.app.test_request_context():
+            self.interface.save_session(self.app, session, self.app.response_class())
+
+        client = self.interface.redis._client
+        self.assertEqual([b'session_sid'], client.keys('*'))
+        self.assertEqual(int(self.app.permanent_session_lifetime.total_seconds()), client.ttl('session_sid'))
+
+
+if __name__ == '__main__':
+    unittest.main()
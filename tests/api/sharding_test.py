@@ -0,0 +1,39 @@
+import unittest
+from api.sharding import HashRing
+
+
+class HashRingTest(unittest.TestCase):
+    names = ['data_set_{}'.format(i) for i in range(1000)]
+
+    def test_routing_is_stable(self):
+        ring = HashRing(['localhost:6379', 'localhost:6380', 'localhost:6381'])
+        same_ring = HashRing(['localhost:6381', 'localhost:6379', 'localhost:6380'])
+
+        for name in self.names:
+            self.assertEqual(ring.instance(name), ring.instance(name))
+            self.assertEqual(ring.instance(name), same_ring.instance(name))
+
+    def test_names_are_distributed(self):
+        ring = HashRing(['localhost:6379', 'localhost:6380', 'localhost:6381'])
+        counts = {}
+        for name in self.names:
+            counts[ring.instance(name)] = counts.get(ring.instance(name), 0) + 1
+
+        self.assertEqual(3, len(counts))
+        self.assertGreater(min(counts.values()), 200)
+
+    def test_adding_an_instance_moves_few_names(self):
+        ring = HashRing(['localhost:6379', 'localhost:6380'])
+        larger_ring = HashRing(['localhost:6379', 'localhost:6380', 'localhost:6381'])
+        moved = [name for name in self.names if ring.instance(name) != larger_ring.instance(name)]
+
+        self.assertTrue(all(larger_ring.instance(name) == 'localhost:6381' for name in moved))
+        self.assertLess(len(moved), 450)
+
+    def test_ring_without_instances(self):
+        with self.assertRaises(ValueError):
+            HashRing([])
+
+
+if __name__ == '__main__':
+    unittest.main()
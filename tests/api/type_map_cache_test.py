@@ -0,0 +1,40 @@
+import unittest
+
+from api.type_map_cache import TypeMapCache
+
+
+class TypeMapCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = TypeMapCache()
+        self.loads = 0
+
+    def load(self, type_map):
+        def load():
+            self.loads += 1
+            return type_map
+        return load
+
+    def test_maps_are_decoded_and_cached(self):
+        first = self.cache.get('Helmholtz', 1, 'node_type_map', self.load({b'0': b'Gene'}))
+        second = self.cache.get('Helmholtz', 1, 'node_type_map', self.load({b'0': b'Gene'}))
+
+        self.assertEqual({'0': 'Gene'}, first)
+        self.assertIs(first, second)
+        self.assertEqual(1, self.loads)
+
+    def test_new_generation_replaces_maps(self):
+        self.cache.get('Helmholtz', 1, 'node_type_map', self.load({b'0': b'Gene'}))
+        self.cache.get('Helmholtz', 1, 'edge_type_map', self.load({b'0': b'HAS'}))
+
+        self.assertEqual({'0': 'SNP'}, self.cache.get('Helmholtz', 2, 'node_type_map', self.load({b'0': b'SNP'})))
+        self.cache.get('Helmholtz', 2, 'edge_type_map', self.load({b'0': b'HAS'}))
+        self.assertEqual(4, self.loads)
+
+    def test_empty_maps_are_not_cached(self):
+        self.cache.get('Helmholtz', 1, 'node_type_map', self.load({}))
+        self.assertEqual({'0': 'Gene'}, self.cache.get('Helmholtz', 1, 'node_type_map', self.load({b'0': b'Gene'})))
+
+
+if __name__ == '__main__':
+    unittest.main()
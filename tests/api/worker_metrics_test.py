@@ -0,0 +1,55 @@
+import unittest
+from unittest import mock
+
+from api.redis_own import Redis
+from api.worker_metrics import WorkerMetrics
+from tests.api.fake_redis import fake_connections
+from util.tracing import Metrics
+
+
+class WorkerMetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('api.redis_own.connections', fake_connections())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.first = WorkerMetrics(Redis('metrics'), Metrics())
+        self.second = WorkerMetrics(Redis('metrics'), Metrics())
+
+    def test_scrape_reports_all_workers(self):
+        self.first.registry.increment('requests_total', route='/login')
+        self.first.registry.observe('latency_seconds', 0.2, buckets=[0.1, 1.0])
+        self.second.registry.increment('requests_total', 2, route='/login')
+        with mock.patch.object(WorkerMetrics, 'worker', return_value='host-2'):
+            self.second.publish()
+
+        with mock.patch.object(WorkerMetrics, 'worker', return_value='host-1'):
+            text = self.first.prometheus_text()
+        self.assertIn('requests_total{route="/login",worker="host-1"} 1', text)
+        self.assertIn('requests_total{route="/login",worker="host-2"} 2', text)
+        self.assertIn('latency_seconds_bucket{worker="host-1",le="1.0"} 1', text)
+        # Samples of all workers belong to one metric family
+        self.assertEqual(1, text.count('# TYPE requests_total counter'))
+
+    def test_scrape_is_up_to_date(self):
+        with mock.patch.object(WorkerMetrics, 'worker', return_value='host-1'):
+            self.first.publish()
+            self.first.registry.increment('requests_total', route='/login')
+            self.assertIn('requests_total{route="/login",worker="host-1"} 1', self.first.prometheus_text())
+
+    def test_stopped_workers_are_removed(self):
+        self.second.registry.increment('requests_total', route='/login')
+        with mock.patch.object(WorkerMetrics, 'worker', return_value='host-2'):
+            self.second.publish()
+        # The snapshot of the stopped worker expired
+        self.second.redis._client.delete('metrics_worker_host-2')
+
+        with mock.patch.object(WorkerMetrics, 'worker', return_value='host-1'):
+            text = self.first.prometheus_text()
+        self.assertNotIn('host-2', text)
+        self.assertEqual({b'host-1'}, self.first.redis._client.smembers('metrics_workers'))
+        self.assertGreater(self.first.redis._client.ttl('metrics_worker_host-1'), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
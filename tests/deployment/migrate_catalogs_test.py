@@ -0,0 +1,51 @@
+import pickle
+import unittest
+from unittest import mock
+
+from api.redis_own import Redis
+from deployment.migrate_catalogs import migrate
+from tests.api.fake_redis import fake_connections, store_type_maps
+from util.datastructures import MetaPath
+
+
+class MigrateCatalogsTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('api.redis_own.connections', fake_connections())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.redis = Redis('DS')
+        store_type_maps(self.redis._client, 'DS', {'1': 'A', '2': 'B'}, {'3': 'r', '4': 's'})
+        # Catalogs as stored before the columnar format
+        embedded = [(['A', 'r', 'B'], 3.0), (['A', 's', 'B'], 2.0), (['A', 'r', 'A', 's', 'B'], 1.0)]
+        for labels, structural_value in embedded:
+            meta_path = MetaPath(edge_node_list=labels).store_structural_value(structural_value)
+            self.redis._client.rpush('DS_A_B_embedded', pickle.dumps(meta_path.store_embedding([0.5, 0.5])))
+        self.redis._client.rpush('DS_1_2', pickle.dumps(MetaPath(edge_node_list=['1', '3', '2'])))
+
+    def test_migrated_catalogs_are_ranked_and_filtered(self):
+        self.assertEqual(2, migrate(self.redis))
+
+        self.assertEqual(3, len(Redis('DS').meta_paths('A', 'B')))
+        ranked = Redis('DS').meta_paths('A', 'B', limit=2)
+        self.assertEqual([['A', 'r', 'B'], ['A', 's', 'B']], [meta_path.as_list() for meta_path in ranked])
+        filtered = Redis('DS').meta_paths('A', 'B', edge_types=['r'])
+        self.assertEqual([['A', 'r', 'B']], [meta_path.as_list() for meta_path in filtered])
+        self.assertEqual([['1', '3', '2']], [meta_path.as_list() for meta_path in Redis('DS').iter_meta_paths()])
+
+    def test_index_keys_are_strings(self):
+        migrate(self.redis)
+
+        keys = [key.decode() for key in self.redis._client.keys('*')]
+        self.assertIn('DS_A_B_embedded_by_structural_value', keys)
+        self.assertIn('DS_1_2_all', keys)
+        self.assertFalse([key for key in keys if key.startswith("b'")])
+
+    def test_migration_can_be_repeated(self):
+        migrate(self.redis)
+
+        self.assertEqual(0, migrate(self.redis))
+
+
+if __name__ == '__main__':
+    unittest.main()
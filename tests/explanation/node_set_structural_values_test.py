@@ -0,0 +1,79 @@
+import unittest
+from unittest import mock
+
+from explanation.explanation import SimilarityScore
+from util.datastructures import MetaPath
+
+DATA_SET = {'name': 'Graph', 'bolt-url': 'bolt://localhost:7687', 'username': 'neo4j', 'password': ''}
+
+
+class FakeNeo4j:
+    # Raised when the driver is created, e.g. ServiceUnavailable
+    connection_error = None
+    # Raised after the first count, e.g. a terminated transaction
+    query_error = None
+
+    def __init__(self, *args):
+        if self.connection_error is not None:
+            raise self.connection_error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def get_structural_values(self, meta_paths, start_nodes, end_nodes, timeout=None):
+        for position, meta_path in enumerate(meta_paths):
+            if position > 0 and self.query_error is not None:
+                raise self.query_error
+            yield position, 10 * (position + 1)
+
+
+class NodeSetStructuralValuesTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('explanation.explanation.Neo4j', FakeNeo4j)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        FakeNeo4j.connection_error = None
+        FakeNeo4j.query_error = None
+        self.meta_paths = [MetaPath(edge_node_list=['A', 'r', 'B']).store_structural_value(0.5),
+                           MetaPath(edge_node_list=['A', 's', 'B']).store_structural_value(0.25)]
+        self.score = SimilarityScore(lambda: [], DATA_SET, [1], [2])
+
+    def structural_values(self):
+        return [self.score.get_structural_value({'id': i, 'metapath': meta_path})
+                for i, meta_path in enumerate(self.meta_paths)]
+
+    def test_counts_replace_structural_values(self):
+        self.assertTrue(self.score.count_node_set_instances(self.meta_paths))
+        self.assertEqual([10, 20], self.structural_values())
+
+    def test_unavailable_neo4j_keeps_structural_values(self):
+        FakeNeo4j.connection_error = ConnectionError("neo4j is down")
+
+        self.assertFalse(self.score.count_node_set_instances(self.meta_paths))
+        self.assertEqual([0.5, 0.25], self.structural_values())
+
+    def test_failing_query_keeps_structural_values_of_all_meta_paths(self):
+        FakeNeo4j.query_error = RuntimeError("transaction terminated")
+
+        self.assertFalse(self.score.count_node_set_instances(self.meta_paths))
+        self.assertEqual([0.5, 0.25], self.structural_values())
+
+    def test_expansion_isnt_counted_after_failure(self):
+        FakeNeo4j.connection_error = ConnectionError("neo4j is down")
+        self.score.count_node_set_instances(self.meta_paths[:1])
+        FakeNeo4j.connection_error = None
+
+        self.assertFalse(self.score.count_node_set_instances(self.meta_paths[1:], first_id=1))
+        self.assertEqual([0.5, 0.25], self.structural_values())
+
+    def test_slow_counting_keeps_structural_values(self):
+        self.assertFalse(self.score.count_node_set_instances(self.meta_paths, timeout=-1))
+        self.assertEqual([0.5, 0.25], self.structural_values())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+
+from util.existence_check import PrunedExistenceChecker, ExistenceCheckCache
+
+
+class PrunedExistenceCheckerTest(unittest.TestCase):
+
+    def setUp(self):
+        # Instances of the graph: A-r-B, B-s-C, A-r-B-s-C
+        self.existing = {('A', 'r', 'B'), ('B', 's', 'C'), ('A', 'r', 'B', 's', 'C')}
+        self.queries = []
+
+    def exists(self, meta_path):
+        self.queries.append(meta_path)
+        meta_path = tuple(meta_path)
+        return meta_path in self.existing or meta_path[::-1] in self.existing
+
+    def test_verdicts(self):
+        meta_paths = [['A', 'r', 'B', 's', 'C'], ['A', 'r', 'B'], ['A', 't', 'C'], ['C', 's', 'B', 'r', 'A']]
+        verdicts = dict((tuple(mp), exists) for mp, exists in PrunedExistenceChecker(self.exists).check(meta_paths))
+
+        self.assertEqual({('A', 'r', 'B'): True, ('A', 't', 'C'): False, ('A', 'r', 'B', 's', 'C'): True,
+                          ('C', 's', 'B', 'r', 'A'): True}, verdicts)
+        # The reverse meta-path isn't queried again
+        self.assertEqual(4, len(self.queries))
+
+    def test_meta_paths_with_empty_parts_are_pruned(self):
+        meta_paths = [['A', 't', 'C'], ['A', 't', 'C', 's', 'B'], ['A', 't', 'C', 's', 'B', 'r', 'A'],
+                      ['B', 'r', 'A', 't', 'C', 's', 'B']]
+        checker = PrunedExistenceChecker(self.exists)
+        results = list(checker.check(meta_paths))
+
+        self.assertFalse(any(exists for _, exists in results))
+        # Only the triples are queried
+        self.assertEqual({('A', 'r', 'B'), ('A', 't', 'C'), ('B', 's', 'C')}, set(map(tuple, self.queries)))
+        self.assertEqual(3, len(self.queries))
+        self.assertEqual(3, checker.pruned)
+
+    def test_meta_paths_are_yielded_by_length(self):
+        meta_paths = [['A', 'r', 'B', 's', 'C'], ['A'], ['A', 'r', 'B']]
+        lengths = [len(mp) for mp, _ in PrunedExistenceChecker(self.exists).check(meta_paths)]
+        self.assertEqual([1, 3, 5], lengths)
+
+    def test_unknown_verdicts_dont_prune(self):
+        checker = PrunedExistenceChecker(lambda meta_path: None if len(meta_path) == 3 else True)
+        verdicts = [exists for _, exists in checker.check([['A', 'r', 'B'], ['A', 'r', 'B', 's', 'C']])]
+
+        self.assertEqual([None, True], verdicts)
+        self.assertEqual(0, checker.pruned)
+
+    def test_known_verdicts_are_not_queried(self):
+        checker = PrunedExistenceChecker(self.exists, known={('B', 's', 'C'): False, ('A', 'r', 'B'): True})
+        results = dict((tuple(mp), exists) for mp, exists in checker.check([['A', 'r', 'B', 's', 'C']]))
+
+        self.assertEqual({('A', 'r', 'B', 's', 'C'): False}, results)
+        self.assertEqual([], self.queries)
+
+
+class ExistenceCheckCacheTest(unittest.TestCase):
+
+    def test_only_definite_verdicts_are_known(self):
+        # Unknown verdicts were stored by earlier versions
+        stored = {'A|r|B': '1', 'A|t|C': '0', 'A|r|B|s|C': 'unknown 60'}
+
+        self.assertEqual({('A', 'r', 'B'): True, ('A', 't', 'C'): False}, ExistenceCheckCache(stored).known())
+
+    def test_unknown_verdicts_are_not_stored(self):
+        cache = ExistenceCheckCache({'A|r|B': '1', 'A|r|B|s|C': 'unknown 120'})
+        verdicts = {('A', 'r', 'B'): True, ('B', 's', 'C'): None, ('A', 'r', 'B', 's', 'C'): False,
+                    ('A', 't', 'C'): None}
+
+        self.assertEqual({'A|r|B|s|C': '0'}, cache.changes(verdicts))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import logging
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from util.lazy_logging import LazyFormat, ArraySummary, RateLimitFilter
+
+
+class Unprintable:
+    def __str__(self):
+        raise AssertionError("Argument was formatted although the level is disabled")
+
+
+class LazyFormatTest(unittest.TestCase):
+
+    def test_not_formatted_if_level_disabled(self):
+        logger = logging.getLogger('MetaExp.LazyFormatTest')
+        logger.setLevel(logging.INFO)
+        logger.debug(LazyFormat("Value {}", Unprintable()))
+
+    def test_large_arrays_are_summarized(self):
+        message = str(LazyFormat("Ratings {}", np.arange(100)))
+        self.assertEqual("Ratings array(shape=(100,), min=0, max=99, mean=49.5)", message)
+
+    def test_small_values_are_printed(self):
+        self.assertEqual("Ids [1, 2]", str(LazyFormat("Ids {}", [1, 2])))
+
+    def test_non_numeric_summary(self):
+        summary = str(ArraySummary(np.array(['a', 'b', 'a'], dtype=object)))
+        self.assertEqual("array(shape=(3,), most frequent=[('a', 2), ('b', 1)])", summary)
+
+
+class RateLimitFilterTest(unittest.TestCase):
+
+    def _record(self, message):
+        return logging.LogRecord('MetaExp.Test', logging.DEBUG, __file__, 0, message, (), None)
+
+    def test_rate_limit(self):
+        rate_limit = RateLimitFilter(rate=2)
+        passed = [rate_limit.filter(self._record(LazyFormat("Fitting {}", i))) for i in range(5)]
+        self.assertEqual([True, True, False, False, False], passed)
+        self.assertTrue(rate_limit.filter(self._record("Other message")))
+
+    def test_handlers_share_the_decision(self):
+        rate_limit = RateLimitFilter(rate=2)
+        outputs = [[], []]
+        logger = logging.getLogger('MetaExp.RateLimitFilterTest')
+        logger.propagate = False
+        logger.setLevel(logging.DEBUG)
+        handlers = []
+        for output in outputs:
+            handler = logging.Handler()
+            handler.emit = lambda record, output=output: output.append(record.getMessage())
+            handler.addFilter(rate_limit)
+            logger.addHandler(handler)
+            handlers.append(handler)
+        try:
+            for i in range(4):
+                logger.debug(LazyFormat("msg {}", i))
+            # A second later, the bucket is refilled
+            later = time.monotonic() + 1
+            with mock.patch('util.lazy_logging.time.monotonic', return_value=later):
+                logger.debug(LazyFormat("msg {}", 4))
+        finally:
+            for handler in handlers:
+                logger.removeHandler(handler)
+
+        expected = ["msg 0", "msg 1", "msg 4 (2 similar messages suppressed)"]
+        self.assertEqual([expected, expected], outputs)
+
+
+if __name__ == '__main__':
+    unittest.main()
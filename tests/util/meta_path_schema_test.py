@@ -0,0 +1,35 @@
+import ast
+import unittest
+
+from util.meta_path_schema import iter_meta_path_weights, iter_meta_path_weights_by_length
+
+
+class MetaPathSchemaTest(unittest.TestCase):
+
+    def test_same_entries_as_literal_eval(self):
+        meta_paths = "{'0|1|3': 12, '3|2|0|1|3': 4.5, \"0\": 1e3, '3|1|0': -1.0}"
+        self.assertEqual(list(ast.literal_eval(meta_paths).items()), list(iter_meta_path_weights(meta_paths)))
+
+    def test_entries_are_tokenized_lazily(self):
+        entries = iter_meta_path_weights("{'0|1|3': 12, '0|2|3': oops}")
+        self.assertEqual(('0|1|3', 12.0), next(entries))
+        with self.assertRaises(ValueError):
+            next(entries)
+
+    def test_empty_dictionary(self):
+        self.assertEqual([], list(iter_meta_path_weights("{}")))
+
+    def test_shorter_meta_paths_first(self):
+        meta_paths = "{'0|1|3|2|0': 1, '0|1|3': 12, '0': 3, '3|2|0': 4.5, '0|2|3|1|0': 2}"
+        self.assertEqual([('0', 3.0), ('0|1|3', 12.0), ('3|2|0', 4.5), ('0|1|3|2|0', 1.0), ('0|2|3|1|0', 2.0)],
+                         list(iter_meta_path_weights_by_length(meta_paths)))
+
+    def test_invalid_value_of_longer_meta_path(self):
+        entries = iter_meta_path_weights_by_length("{'0|2|3': oops, '0': 1}")
+        self.assertEqual(('0', 1.0), next(entries))
+        with self.assertRaises(ValueError):
+            next(entries)
+
+
+if __name__ == '__main__':
+    unittest.main()
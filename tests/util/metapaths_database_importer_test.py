@@ -0,0 +1,101 @@
+import unittest
+from unittest import mock
+
+from api.redis_own import Redis
+from tests.api.fake_redis import fake_connections
+from util.metapaths_database_importer import RedisImporter
+
+DATA_SET = {'name': 'Graph', 'bolt-url': 'bolt://localhost:7687', 'username': 'neo4j', 'password': ''}
+
+
+class FakeNeo4j:
+    meta_paths = "{'0|2|1': 4.0}"
+
+    def __init__(self, *args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def get_meta_paths_schema_weigths(self, length):
+        yield {'nodesIDTypeDict': "{'0': 'A', '1': 'B'}", 'edgesIDTypeDict': "{'2': 'r', '3': 's'}",
+               'metaPaths': self.meta_paths}
+
+    def get_node_and_relationship_counts(self):
+        return 10, len(self.meta_paths)
+
+    def test_whether_meta_path_exists(self, query, timeout=None):
+        return True
+
+
+class RedisImporterTest(unittest.TestCase):
+
+    def setUp(self):
+        for patcher in [mock.patch('api.redis_own.connections', fake_connections()),
+                        mock.patch('util.metapaths_database_importer.Neo4j', FakeNeo4j),
+                        mock.patch.object(Redis, 'delete_generations_later')]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def import_and_embed(self, meta_paths: str, embed: bool = True):
+        FakeNeo4j.meta_paths = meta_paths
+        RedisImporter().import_data_set(DATA_SET)
+        if embed:
+            # Like the training of the embeddings
+            pending = Redis(DATA_SET['name'], Redis(DATA_SET['name']).pending_generation())
+            pending.store_embeddings([(meta_path, [0.5, 0.5]) for meta_path in pending.iter_meta_paths()])
+            self.assertTrue(pending.activate_pending())
+
+    def served(self):
+        return sorted(meta_path.as_list() for meta_path in Redis(DATA_SET['name']).meta_paths('A', 'B'))
+
+    def test_import_is_activated_with_its_embeddings(self):
+        self.import_and_embed("{'0|2|1': 4.0}")
+        self.assertEqual([['A', 'r', 'B']], self.served())
+
+        self.import_and_embed("{'0|2|1': 4.0, '0|3|1': 2.0}", embed=False)
+        # The previous generation is served and kept until the new one has embeddings
+        self.assertEqual([['A', 'r', 'B']], self.served())
+        self.assertEqual({('A', 'B'): 1}, Redis(DATA_SET['name']).type_pairs())
+        Redis.delete_generations_later.assert_called_once_with([0])
+
+        pending = Redis(DATA_SET['name']).pending_generation()
+        Redis(DATA_SET['name'], pending).store_embeddings(
+            [(meta_path, [0.5, 0.5]) for meta_path in Redis(DATA_SET['name'], pending).iter_meta_paths()])
+        self.assertTrue(Redis(DATA_SET['name'], pending).activate_pending())
+        self.assertEqual([['A', 'r', 'B'], ['A', 's', 'B']], self.served())
+        self.assertIsNone(Redis(DATA_SET['name']).pending_generation())
+        Redis.delete_generations_later.assert_called_with([0, 1])
+
+    def test_replaced_import_is_not_activated(self):
+        self.import_and_embed("{'0|2|1': 4.0}", embed=False)
+        replaced = Redis(DATA_SET['name']).pending_generation()
+        self.import_and_embed("{'0|3|1': 2.0}", embed=False)
+
+        self.assertFalse(Redis(DATA_SET['name'], replaced).activate_pending())
+        self.assertEqual(0, Redis(DATA_SET['name']).active_generation())
+
+    def test_catalogs_are_written_in_chunks(self):
+        FakeNeo4j.meta_paths = "{'0|2|1': 4.0, '0|3|1|2|1': 1.0, '0|2|0': 2.0, '1|3|0': 3.0, '1|2|1': 5.0}"
+        with mock.patch.object(Redis, 'store_catalogs', autospec=True, side_effect=Redis.store_catalogs) as store:
+            RedisImporter(enable_existence_check=False, write_chunk_size=2).import_data_set(DATA_SET)
+
+        # Each chunk holds at least two meta-paths, except for the last one
+        chunk_sizes = [sum(len(catalog) for catalog in call[0][1].values()) for call in store.call_args_list]
+        self.assertEqual(5, sum(chunk_sizes))
+        self.assertGreater(len(chunk_sizes), 1)
+        self.assertTrue(all(size >= 2 for size in chunk_sizes[:-1]))
+        pending = Redis(DATA_SET['name'], Redis(DATA_SET['name']).pending_generation())
+        self.assertEqual({('A', 'B'): 2, ('A', 'A'): 1, ('B', 'A'): 1, ('B', 'B'): 1},
+                         pending.type_pairs(embedded=False))
+        self.assertEqual([(['0', '2', '1'], 4.0), (['0', '3', '1', '2', '1'], 1.0)],
+                         sorted((meta_path.as_list(), meta_path.get_structural_value())
+                                for meta_path in pending.iter_meta_paths() if meta_path.as_list()[0] == '0'
+                                and meta_path.as_list()[-1] == '1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import threading
+import unittest
+
+from util.pipeline import Pipeline, Stage
+
+
+class PipelineTest(unittest.TestCase):
+
+    def test_items_flow_through_all_stages(self):
+        results = []
+        pipeline = Pipeline('test', [
+            Stage('fetch', lambda _: range(10)),
+            Stage('split', lambda n: [n, n + 100]),
+            Stage('double', lambda n: [n * 2], workers=3),
+            Stage('collect', lambda n: results.append(n) or [])
+        ])
+        pipeline.run()
+
+        self.assertEqual(sorted([n * 2 for n in range(10)] + [(n + 100) * 2 for n in range(10)]), sorted(results))
+        statistics = {stage['stage']: stage for stage in pipeline.statistics()['stages']}
+        self.assertEqual(10, statistics['split']['processed'])
+        self.assertEqual(20, statistics['split']['produced'])
+        self.assertEqual(20, statistics['collect']['processed'])
+        self.assertTrue(all(stage['running'] == 0 for stage in statistics.values()))
+
+    def test_slow_stage_blocks_previous_stages(self):
+        release = threading.Event()
+        fetched = []
+
+        def fetch(_):
+            for n in range(100):
+                fetched.append(n)
+                yield n
+
+        def wait(n):
+            release.wait()
+            return []
+
+        pipeline = Pipeline('test', [Stage('fetch', fetch), Stage('wait', wait, queue_size=2)])
+        runner = threading.Thread(target=pipeline.run)
+        runner.start()
+        release.wait(0.3)
+        # One item is processed, two are queued and one waits to be put
+        self.assertLessEqual(len(fetched), 4)
+        release.set()
+        runner.join(5)
+        self.assertFalse(runner.is_alive())
+        self.assertEqual(100, len(fetched))
+
+    def test_error_stops_pipeline(self):
+        def fail(n):
+            if n == 5:
+                raise ValueError("broken item")
+            return [n]
+
+        pipeline = Pipeline('test', [Stage('fetch', lambda _: range(1000)), Stage('fail', fail, workers=2),
+                                     Stage('collect', lambda n: [])])
+        with self.assertRaises(ValueError):
+            pipeline.run()
+        statistics = {stage['stage']: stage for stage in pipeline.statistics()['stages']}
+        self.assertEqual(1, statistics['fail']['errors'])
+
+    def test_statistics_are_reported(self):
+        reports = []
+        pipeline = Pipeline('test', [Stage('fetch', lambda _: range(3)), Stage('collect', lambda n: [])],
+                            report=reports.append)
+        pipeline.run()
+
+        final = reports[-1]
+        self.assertTrue(final['finished'])
+        self.assertFalse(final['failed'])
+        self.assertEqual(['fetch', 'collect'], [stage['stage'] for stage in final['stages']])
+        self.assertEqual(3, final['stages'][1]['processed'])
+        self.assertEqual(0, final['stages'][1]['queue_depth'])
+
+    def test_failing_report_stops_pipeline(self):
+        def report(statistics):
+            raise RuntimeError("job cancelled")
+
+        def wait(n):
+            threading.Event().wait(0.01)
+            return []
+
+        pipeline = Pipeline('test', [Stage('fetch', lambda _: range(1000)), Stage('wait', wait)],
+                            report=report, report_interval=0.05)
+        with self.assertRaises(RuntimeError):
+            pipeline.run()
+
+
+if __name__ == '__main__':
+    unittest.main()
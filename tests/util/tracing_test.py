@@ -0,0 +1,57 @@
+import unittest
+from util.tracing import Metrics, metrics, span, start_trace, finish_trace
+
+
+class MetricsTest(unittest.TestCase):
+
+    def test_counter(self):
+        registry = Metrics()
+        registry.increment('requests_total', route='/login')
+        registry.increment('requests_total', 2, route='/login')
+
+        self.assertEqual(3, registry.counter('requests_total', route='/login'))
+        self.assertIn('requests_total{route="/login"} 3', registry.prometheus_text())
+
+    def test_histogram(self):
+        registry = Metrics()
+        registry.observe('latency_seconds', 0.2, buckets=[0.1, 1.0])
+        registry.observe('latency_seconds', 0.05, buckets=[0.1, 1.0])
+        text = registry.prometheus_text()
+
+        self.assertIn('# TYPE latency_seconds histogram', text)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{le="1.0"} 2', text)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 2', text)
+        self.assertIn('latency_seconds_count 2', text)
+
+    def test_snapshots_of_workers(self):
+        first = Metrics()
+        first.increment('requests_total', route='/login')
+        second = Metrics()
+        second.observe('latency_seconds', 0.2, buckets=[0.1, 1.0])
+        text = Metrics().prometheus_text({'host-1': first.snapshot(), 'host-2': second.snapshot()})
+
+        self.assertIn('requests_total{route="/login",worker="host-1"} 1', text)
+        self.assertIn('latency_seconds_bucket{worker="host-2",le="0.1"} 0', text)
+        self.assertIn('latency_seconds_count{worker="host-2"} 1', text)
+
+
+class SpanTest(unittest.TestCase):
+
+    def test_phases_of_request(self):
+        start_trace()
+        with span('gp_fit'):
+            pass
+        with span('gp_fit'):
+            pass
+        with span('select'):
+            pass
+        phases = finish_trace('/next-meta-paths')
+
+        self.assertEqual({'gp_fit', 'select'}, set(phases.keys()))
+        self.assertIn('metaexp_phase_seconds_count{phase="select",route="/next-meta-paths"} 1',
+                      metrics.prometheus_text())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,5 @@
 import os
+import datetime
 from logging.config import dictConfig
 
 # algorithms
@@ -13,10 +14,9 @@ SERVER_PATH = 'localhost'
 # Data sets
 RATED_DATASETS_PATH = os.path.join('rated_datasets')
 MOCK_DATASETS_DIR = os.path.join('tests', 'data')
-# Configuration for sessions saved on the file system
-SESSION_CACHE_DIR = os.path.join('tmp', 'sessions')
-SESSION_THRESHOLD = 500
-SESSION_MODE = '0700'
+# Configuration for sessions saved in redis
+SESSION_KEY_PREFIX = 'session'
+SESSION_LIFETIME = datetime.timedelta(days=1)
 # Redis Configuration
 REDIS_PORT = 6379
 REDIS_HOST = '172.16.74.65'
@@ -24,9 +24,75 @@ REDIS_HOST = '172.16.74.65'
 #REDIS_HOST = '172.16.19.193'
 #!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
 REDIS_PASSWORD = None
-PARALLEL_EXISTENCE_TEST_PROCESSES = 12
+# Redis instances, which the data sets are distributed over by consistent hashing of their names. Sessions and jobs
+# are distributed like data sets named SESSION_KEY_PREFIX and JOB_KEY_PREFIX. Adding an instance moves about 1/n of the
+# data sets, which have to be imported again.
+REDIS_INSTANCES = [{'host': REDIS_HOST, 'port': REDIS_PORT, 'password': REDIS_PASSWORD}]
+#REDIS_INSTANCES = [{'host': REDIS_HOST, 'port': port, 'password': REDIS_PASSWORD} for port in (6379, 6380, 6381)]
+# Points of each redis instance on the hash ring
+REDIS_RING_REPLICAS = 100
+# Size of the connection pools of each process
+REDIS_MAX_CONNECTIONS = 64
+NEO4J_MAX_CONNECTIONS = 32
+# Upper bound for the meta-paths cached by each server process
+CATALOG_CACHE_MAX_BYTES = 128 * 1024 * 1024
+# Sessions on catalogs with more meta-paths start on those with the highest structural values
+LARGE_CATALOG_META_PATHS = 5000
+INITIAL_META_PATHS = 1000
+# Number of meta-paths added to such a session, once less than a batch is left to rate
+EXPANSION_META_PATHS = 500
+# Seconds a request may count the instances of its meta-paths between the node sets, before the structural values
+# of the data set are used instead
+NODE_SET_COUNT_TIMEOUT = 10
+# Number of catalogs fetched with one pipeline, when all meta-paths of a data set are read
+CATALOG_SCAN_CHUNK = 100
+# Compression of the meta-path catalogs in redis: None, 'zlib' or 'lzma'. Catalogs with less than
+# CATALOG_COMPRESSION_MIN_BYTES are stored uncompressed. Compare with deployment/benchmark_compression.py
+CATALOG_COMPRESSION = 'zlib'
+CATALOG_COMPRESSION_LEVEL = 1
+CATALOG_COMPRESSION_MIN_BYTES = 4096
+# Seconds until the previous generation of a data set is deleted after an import
+GENERATION_DELETION_DELAY = 60
+# Concurrent existence checks of an import, which share the connections of the neo4j driver, so it should not
+# exceed NEO4J_MAX_CONNECTIONS
+EXISTENCE_CHECK_CONCURRENCY = 12
+# Seconds until neo4j terminates an existence check, whose result is unknown then
+EXISTENCE_CHECK_TIMEOUT = 60
+# Stages of an import: the schema records are fetched, tokenized into batches of IMPORT_BATCH_SIZE meta-paths,
+# checked by EXISTENCE_CHECK_CONCURRENCY workers and collected for writing. At most PIPELINE_QUEUE_SIZE items wait for
+# each stage.
+IMPORT_BATCH_SIZE = 100
+IMPORT_PARSE_WORKERS = 1
+# Catalogs of an import are written in transactions of about IMPORT_WRITE_CHUNK_SIZE meta-paths
+IMPORT_WRITE_CHUNK_SIZE = 100000
+PIPELINE_QUEUE_SIZE = 64
+# Seconds between two reports of the throughput of the stages to the log and to '<data set>_import_status'
+PIPELINE_REPORT_INTERVAL = 10
+# Background jobs, e.g. imports and training of embeddings
+JOB_KEY_PREFIX = 'job'
+JOB_WORKERS = 2
+# Seconds between two progress updates of a job
+JOB_PROGRESS_INTERVAL = 1.0
+# Seconds the state of a job is kept in redis
+JOB_LIFETIME = 7 * 24 * 60 * 60
+# Seconds between two heartbeats of the process executing a job. A queued or running job without heartbeat for
+# JOB_HEARTBEAT_TIMEOUT seconds is reported as failed, e.g. because its gunicorn worker was restarted.
+JOB_HEARTBEAT_INTERVAL = 10
+JOB_HEARTBEAT_TIMEOUT = 60
+# Threads per process, which select the next batch in advance while the user is rating
+SPECULATION_WORKERS = 2
+# Every server process publishes its metrics to '<METRICS_KEY_PREFIX>_worker_<host>-<pid>' each
+# METRICS_PUBLISH_INTERVAL seconds, so that /metrics reports all gunicorn workers. Metrics of stopped workers
+# expire after METRICS_LIFETIME seconds.
+METRICS_KEY_PREFIX = 'metrics'
+METRICS_PUBLISH_INTERVAL = 15
+METRICS_LIFETIME = 5 * 60
 
 LOG_DIR = 'log'
+# Use e.g. METAEXP_LOG_LEVEL=INFO in production, so that debug messages aren't even formatted
+LOG_LEVEL = os.environ.get('METAEXP_LOG_LEVEL', 'DEBUG')
+# Maximum number of records with the same message per logger and second, unlimited if not set
+LOG_RATE_LIMIT = float(os.environ['METAEXP_LOG_RATE_LIMIT']) if 'METAEXP_LOG_RATE_LIMIT' in os.environ else None
 
 MAX_META_PATH_LENGTH = 6
 
@@ -54,32 +120,44 @@ def set_up_logger():
     filename = 'debug.log'
     if not os.path.isdir(log_dir):
         os.makedirs(log_dir)
+    filters = []
+    if LOG_RATE_LIMIT is not None:
+        filters = ['rate_limit']
     dictConfig({
         'version': 1,
         'formatters': {'default': {
             'format': '[%(asctime)s] %(levelname)s from %(name)s: %(message)s',
         }},
+        'filters': {
+            'rate_limit': {
+                '()': 'util.lazy_logging.RateLimitFilter',
+                'rate': LOG_RATE_LIMIT
+            }
+        },
         'handlers': {
             'default': {
                 'class': 'logging.StreamHandler',
                 'formatter': 'default',
-                'level': 'DEBUG'
+                'filters': filters,
+                'level': LOG_LEVEL
             },
             'file': {
                 'class': 'logging.FileHandler',
                 'formatter': 'default',
                 'filename': os.path.join(log_dir, filename),
                 'mode': 'w',
-                'level': 'DEBUG'
+                'filters': filters,
+                'level': LOG_LEVEL
             },
         },
         'loggers': {
             'MetaExp': {
-                'handlers': ['default', 'file']
+                'handlers': ['default', 'file'],
+                'level': LOG_LEVEL
             }
         },
         'root': {
-            'level': 'DEBUG',
+            'level': LOG_LEVEL,
             'handlers': []
         },
     })
@@ -0,0 +1,132 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class PrunedExistenceChecker:
+    """
+    Checks which meta-paths have an instance in the graph, from the shortest to the longest meta-paths.
+
+    Every part of an instance of a meta-path is an instance of the corresponding part of the meta-path. So a
+    meta-path, whose prefix, suffix or one of whose (type, edge, type) triples has no instance, has no instance
+    either and isn't queried. The triples of all meta-paths are checked first. As the queries don't respect the
+    direction of edges, a meta-path and its reverse share one verdict.
+
+    Several threads may check batches of meta-paths with the same checker. Batches, which are checked at the same
+    time, don't prune each other, though.
+    """
+
+    def __init__(self, exists: Callable[[List[str]], Optional[bool]],
+                 map_function: Callable[[Callable, List], Iterable] = map, known: Dict[Tuple, Optional[bool]] = None):
+        """
+        :param exists: Whether a meta-path, given as alternating node and edge types, has an instance. None, if that
+                       is unknown, e.g. because the query timed out. Unknown meta-paths don't prune others.
+        :param map_function: Applies a function to the meta-paths of one length and returns the results in any order,
+                             e.g. the map of an executor to run the queries of one length in parallel.
+        :param known: Verdicts of meta-paths, which aren't queried again, e.g. of a previous import.
+        """
+        self.exists = exists
+        self.map_function = map_function
+        # canonical meta-path -> verdict
+        self.verdicts = {self._canonical(meta_path): verdict for meta_path, verdict in (known or {}).items()}
+        self.queried = 0
+        self.pruned = 0
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger('MetaExp.{}'.format(__class__.__name__))
+
+    @staticmethod
+    def _canonical(meta_path) -> Tuple:
+        meta_path = tuple(meta_path)
+        return min(meta_path, meta_path[::-1])
+
+    @staticmethod
+    def _triples(meta_path: Tuple) -> List[Tuple]:
+        return [meta_path[i:i + 3] for i in range(0, len(meta_path) - 2, 2)]
+
+    def _is_pruned(self, meta_path: Tuple) -> bool:
+        parts = [meta_path[:-2], meta_path[2:]] + self._triples(meta_path)
+        return any(self.verdicts.get(self._canonical(part)) is False for part in parts if len(part) >= 3)
+
+    def _query(self, meta_path: Tuple) -> Tuple[Tuple, Optional[bool]]:
+        return meta_path, self.exists(list(meta_path))
+
+    def _check_all(self, meta_paths: List[Tuple]) -> Iterator[Tuple[Tuple, Optional[bool]]]:
+        """
+        Decides the meta-paths of one length, which don't depend on each other.
+        :return: Generator of the canonical meta-paths and their verdicts, queried ones as soon as they are answered.
+        """
+        queries = []
+        for meta_path in meta_paths:
+            if meta_path in self.verdicts:
+                yield meta_path, self.verdicts[meta_path]
+            elif self._is_pruned(meta_path):
+                self.verdicts[meta_path] = False
+                with self._lock:
+                    self.pruned += 1
+                yield meta_path, False
+            else:
+                queries.append(meta_path)
+        for meta_path, verdict in self.map_function(self._query, queries):
+            self.verdicts[meta_path] = verdict
+            with self._lock:
+                self.queried += 1
+            yield meta_path, verdict
+
+    def check(self, meta_paths: Iterable[List[str]]) -> Iterator[Tuple[List[str], Optional[bool]]]:
+        """
+        :return: Generator of each meta-path and whether it has an instance, None if unknown. The meta-paths are
+                 yielded by increasing length, each one as soon as it is checked.
+        """
+        by_length = OrderedDict()
+        for meta_path in sorted(meta_paths, key=len):
+            by_length.setdefault(len(meta_path), []).append(meta_path)
+        triples = {self._canonical(triple) for meta_paths_of_length in by_length.values()
+                   for meta_path in meta_paths_of_length for triple in self._triples(tuple(meta_path))}
+        for _ in self._check_all(sorted(triples)):
+            pass
+
+        for length, meta_paths_of_length in by_length.items():
+            # canonical meta-path -> meta-paths of the candidates
+            candidates = OrderedDict()
+            for meta_path in meta_paths_of_length:
+                candidates.setdefault(self._canonical(meta_path), []).append(meta_path)
+            for canonical, verdict in self._check_all(list(candidates.keys())):
+                for meta_path in candidates[canonical]:
+                    yield meta_path, verdict
+            self.logger.debug("Checked meta-paths of length {}, {} queried and {} pruned so far".format(
+                length, self.queried, self.pruned))
+
+    def statistics(self) -> Dict[str, int]:
+        return {'queried': self.queried, 'pruned': self.pruned}
+
+
+class ExistenceCheckCache:
+    """
+    Encodes the verdicts of existence checks as stored by Redis.store_existence_checks: '1' if a meta-path has an
+    instance and '0' if not. Unknown verdicts, e.g. of checks that timed out or failed transiently, aren't stored, so
+    that they are checked again by the next import.
+    """
+
+    def __init__(self, stored: Dict[str, str]):
+        """
+        :param stored: Encoded verdict by meta-path, given as string of type ids separated by '|'.
+        """
+        self.stored = stored
+
+    def known(self) -> Dict[Tuple, bool]:
+        """
+        :return: Verdicts, which don't have to be checked again.
+        """
+        verdicts = {'1': True, '0': False}
+        # Earlier versions also stored unknown verdicts, which are checked again
+        return {tuple(meta_path.split('|')): verdicts[value] for meta_path, value in self.stored.items()
+                if value in verdicts}
+
+    def changes(self, verdicts: Dict[Tuple, Optional[bool]]) -> Dict[str, str]:
+        """
+        :return: Encoded verdicts, which are known and differ from the stored ones.
+        """
+        known = self.known()
+        return {'|'.join(meta_path): '1' if verdict else '0' for meta_path, verdict in verdicts.items()
+                if verdict is not None and known.get(meta_path) != verdict}
@@ -0,0 +1,96 @@
+import logging
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+# Sequences with more elements are summarized instead of being printed completely
+SUMMARY_THRESHOLD = 10
+
+
+class ArraySummary:
+    """
+    Prints shape, minimum and maximum of a numeric array or the frequencies of the values of any other array.
+    The summary is only computed, when the log record is actually emitted.
+    """
+
+    def __init__(self, values):
+        self.values = values
+
+    def __str__(self):
+        values = np.asarray(self.values)
+        if values.size == 0:
+            return "array(shape={})".format(values.shape)
+        if np.issubdtype(values.dtype, np.number):
+            return "array(shape={}, min={:.4g}, max={:.4g}, mean={:.4g})".format(
+                values.shape, np.min(values), np.max(values), np.mean(values))
+        frequencies = Counter(str(value) for value in values.flat).most_common(3)
+        return "array(shape={}, most frequent={})".format(values.shape, frequencies)
+
+
+def summarize(value):
+    """
+    :return: A summary of the value, if it is a large array or list, the value itself otherwise.
+    """
+    if isinstance(value, (np.ndarray, list, tuple)) and len(value) > SUMMARY_THRESHOLD:
+        return ArraySummary(value)
+    return value
+
+
+class LazyFormat:
+    """
+    Log message, which is formatted only if its level is enabled. Large arrays among the arguments are summarized.
+
+    Usage: logger.debug(LazyFormat("Refreshed rating list: {}", ratings))
+    """
+
+    def __init__(self, message: str, *args, **kwargs):
+        self.message = message
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self):
+        return self.message.format(*[summarize(arg) for arg in self.args],
+                                   **{key: summarize(value) for key, value in self.kwargs.items()})
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets at most `rate` records with the same message template of a logger pass per second.
+    The number of dropped records is appended to the next record, that passes.
+
+    The filter can be shared by several handlers. Each record is decided once and the handlers reuse the decision,
+    as a filter of the logger 'MetaExp' wouldn't see the records of its child loggers.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+        # (logger name, template) -> [tokens, last refill, dropped records]
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        decision = getattr(record, '_rate_limit_decision', None)
+        if decision is not None and decision[0] is self:
+            return decision[1]
+        passed = self._decide(record)
+        record._rate_limit_decision = (self, passed)
+        return passed
+
+    def _decide(self, record: logging.LogRecord) -> bool:
+        template = record.msg.message if isinstance(record.msg, LazyFormat) else str(record.msg)
+        key = (record.name, template)
+        now = time.monotonic()
+        with self._lock:
+            tokens, last_refill, dropped = self._buckets.get(key, (self.rate, now, 0))
+            tokens = min(self.rate, tokens + (now - last_refill) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now, dropped + 1)
+                return False
+            self._buckets[key] = (tokens - 1, now, 0)
+        if dropped:
+            record.msg = "{} ({} similar messages suppressed)".format(record.getMessage(), dropped)
+            record.args = ()
+        return True
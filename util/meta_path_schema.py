@@ -0,0 +1,33 @@
+import re
+from array import array
+from collections import defaultdict
+from typing import Iterator, Tuple
+
+# One entry of the meta-path dictionary returned by algo.ComputeAllMetaPathsSchemaFullWeights,
+# e.g. '0|1|3': 12.0
+_ENTRY = re.compile(r"""(['"])([^'"]*)\1\s*:\s*([^,}\s]+)""")
+
+
+def iter_meta_path_weights(meta_paths: str) -> Iterator[Tuple[str, float]]:
+    """
+    Tokenizes the string representation of the meta-path dictionary of a schema record incrementally, instead of
+    building the whole dictionary with ast.literal_eval.
+    :return: Generator of each meta-path, given as type ids separated by '|', and its structural value.
+    :raises ValueError: If a structural value isn't a number.
+    """
+    for match in _ENTRY.finditer(meta_paths):
+        yield match.group(2), float(match.group(3))
+
+
+def iter_meta_path_weights_by_length(meta_paths: str) -> Iterator[Tuple[str, float]]:
+    """
+    Like iter_meta_path_weights, but shorter meta-paths first. The first pass only records the offset of each entry
+    by length, so that the entries aren't materialized for sorting.
+    """
+    offsets = defaultdict(lambda: array('q'))
+    for match in _ENTRY.finditer(meta_paths):
+        offsets[match.group(2).count('|')].append(match.start())
+    for length in sorted(offsets.keys()):
+        for offset in offsets.pop(length):
+            match = _ENTRY.match(meta_paths, offset)
+            yield match.group(2), float(match.group(3))
@@ -1,111 +1,236 @@
-import multiprocessing
+import threading
+from array import array
+from functools import partial
+from itertools import islice
 
-from util.datastructures import MetaPath
-from util.config import MAX_META_PATH_LENGTH, AVAILABLE_DATA_SETS, PARALLEL_EXISTENCE_TEST_PROCESSES
+from util.config import (MAX_META_PATH_LENGTH, AVAILABLE_DATA_SETS, EXISTENCE_CHECK_CONCURRENCY,
+                         EXISTENCE_CHECK_TIMEOUT, IMPORT_BATCH_SIZE, IMPORT_PARSE_WORKERS, IMPORT_WRITE_CHUNK_SIZE,
+                         JOB_LIFETIME)
 from api.neo4j_own import Neo4j
 from api.redis_own import Redis
-from typing import Dict, List, Tuple
+from api.meta_path_catalog import MetaPathCatalog
+from util.existence_check import PrunedExistenceChecker, ExistenceCheckCache
+from util.meta_path_schema import iter_meta_path_weights, iter_meta_path_weights_by_length
+from util.pipeline import Pipeline, Stage
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 import logging
 import ast
-import pickle
+import hashlib
+import json
+from collections import defaultdict
+
+
+class SchemaRecord:
+    """
+    Type maps and existence checks of one record of the meta-path schema, which its batches of meta-paths refer to.
+    """
+
+    def __init__(self, id_to_node_type_map: Dict, id_to_edge_type_map: Dict):
+        self.id_to_node_type_map = id_to_node_type_map
+        self.id_to_edge_type_map = id_to_edge_type_map
+        self.fingerprint = None
+        self.cache = None
+        self.checker = None
+
+
+def _columns() -> Tuple[array, array, array]:
+    """
+    :return: Type ids of all meta-paths one after another, their lengths and their structural values.
+    """
+    return array('i'), array('i'), array('d')
 
 
 class RedisImporter:
-    def __init__(self, enable_existence_check=True):
+    """
+    Imports the meta-paths of the schema of a graph in a pipeline of stages:
+    - fetch: receives the schema records from neo4j
+    - parse: stores the type maps and splits the meta-paths of each record into batches, shortest first
+    - check: keeps the meta-paths of a batch, which have an instance in the graph
+    - write: collects the type ids and structural values of the meta-paths by pair of start and end type
+    The catalogs are written at the end, when all meta-paths of each pair are known.
+    """
+
+    def __init__(self, enable_existence_check=True, progress: Callable[..., None] = None,
+                 concurrency: int = EXISTENCE_CHECK_CONCURRENCY, timeout: float = EXISTENCE_CHECK_TIMEOUT,
+                 parse_workers: int = IMPORT_PARSE_WORKERS, batch_size: int = IMPORT_BATCH_SIZE,
+                 write_chunk_size: int = IMPORT_WRITE_CHUNK_SIZE):
+        """
+        :param progress: Called with the number of processed and the total number of meta-paths.
+        :param concurrency: Number of batches, whose existence is checked at the same time.
+        :param timeout: Seconds until an existence check is terminated.
+        :param parse_workers: Number of schema records, which are parsed at the same time.
+        :param batch_size: Number of meta-paths, which are checked one after another by the same worker.
+        :param write_chunk_size: Number of meta-paths, whose catalogs are written in one transaction at least.
+        """
         self.enable_existence_check = enable_existence_check
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.parse_workers = parse_workers
+        self.batch_size = batch_size
+        self.write_chunk_size = write_chunk_size
+        self.progress = progress if progress is not None else lambda done, total, phase=None: None
         self.logger = self.logger = logging.getLogger('MetaExp.{}'.format(__class__.__name__))
-        self.id_to_edge_type_map = None
-        self.id_to_node_type_map = None
         self.redis = None
+        # State of the current import
+        self._records = []
+        self._catalogs = defaultdict(_columns)
+        self._parsed = 0
+        self._checked = 0
+        self._lock = threading.Lock()
 
     def import_all(self):
         for data_set in AVAILABLE_DATA_SETS:
             self.import_data_set(data_set)
 
     def import_data_set(self, data_set: Dict):
-        self.redis = Redis(data_set['name'])
+        """
+        Imports the meta-paths into a new generation of the data set, which replaces the active one as soon as the
+        embeddings of its meta-paths are stored.
+        """
+        self.redis = Redis(data_set['name']).create_generation()
+        self._records = []
+        self._catalogs = defaultdict(_columns)
+        self._parsed = 0
+        self._checked = 0
         with Neo4j(data_set['bolt-url'], data_set['username'], data_set['password']) as neo4j:
-            for record in neo4j.get_meta_paths_schema_weigths(MAX_META_PATH_LENGTH):
-                meta_path_dict = ast.literal_eval(record['metaPaths'])
-                self.logger.debug(type(meta_path_dict))
-                meta_path_list = list(meta_path_dict.items())
-                self.logger.debug("Received meta paths from neo4j: {}".format(meta_path_list))
-                self.logger.debug("Number of meta paths is: {}".format(len(meta_path_list)))
-                # meta_paths_without_duplicates = list(set(meta_path_list))
-                # self.logger.debug("After removal of duplicates: {}".format(len(meta_paths_without_duplicates)))
-                self.id_to_edge_type_map = ast.literal_eval(record['edgesIDTypeDict'])
-                self.id_to_node_type_map = ast.literal_eval(record['nodesIDTypeDict'])
-                self.write_mappings(self.id_to_node_type_map, self.id_to_edge_type_map)
-                # meta_paths_without_duplicates.sort(key=len)
-                if self.enable_existence_check:
-                    result = self.start_parallel_existence_checks(meta_path_list, data_set)
-                    self.logger.debug("Got result from existence check {}".format(result))
-                    existing_meta_paths = [x for x in result if x is not None]
-                    self.logger.debug("Existing meta_paths are {}".format(existing_meta_paths))
-                    self.logger.debug("From {} mps {} exist in graph {}".format(len(meta_path_list),
-                                                                                len(existing_meta_paths),
-                                                                                data_set['name']))
-                else:
-                    self.write_paths([(str(mp[0]).split("|"), float(mp[1])) for mp in meta_path_list])
+            pipeline = Pipeline('import {}'.format(data_set['name']), [
+                Stage('fetch', lambda _: neo4j.get_meta_paths_schema_weigths(MAX_META_PATH_LENGTH)),
+                Stage('parse', partial(self.parse_record, neo4j), self.parse_workers),
+                Stage('check', partial(self.check_batch, neo4j),
+                      self.concurrency if self.enable_existence_check else 1),
+                Stage('write', self.collect_path)
+            ], report=self.report_status)
+            try:
+                pipeline.run()
+            finally:
+                # Also keeps the verdicts of an aborted import
+                self.store_existence_checks()
+        self.write_catalogs()
+        # The active generation is served until the embeddings of the new one are stored
+        self.redis.mark_pending()
+
+    def parse_record(self, neo4j: Neo4j, record) -> Iterator[Tuple[SchemaRecord, List[Tuple[str, float]]]]:
+        """
+        :return: Generator of batches of meta-paths, given as type ids separated by '|', and their structural values.
+        """
+        schema_record = SchemaRecord(ast.literal_eval(record['nodesIDTypeDict']),
+                                     ast.literal_eval(record['edgesIDTypeDict']))
+        self.write_mappings(schema_record.id_to_node_type_map, schema_record.id_to_edge_type_map)
+        # The meta-paths are tokenized while they are checked or collected, the dictionary is never built
+        if self.enable_existence_check:
+            # Shorter meta-paths are checked first, so that they prune the longer ones
+            meta_paths = iter_meta_path_weights_by_length(record['metaPaths'])
+            schema_record.fingerprint = self.graph_fingerprint(neo4j, schema_record)
+            schema_record.cache = ExistenceCheckCache(self.redis.existence_checks(schema_record.fingerprint))
+            schema_record.checker = PrunedExistenceChecker(partial(self.exists_in_graph, neo4j, schema_record),
+                                                           known=schema_record.cache.known())
+        else:
+            meta_paths = iter_meta_path_weights(record['metaPaths'])
+        with self._lock:
+            self._records.append(schema_record)
+        while True:
+            batch = list(islice(meta_paths, self.batch_size))
+            if not batch:
+                break
+            with self._lock:
+                self._parsed += len(batch)
+            yield schema_record, batch
+
+    def check_batch(self, neo4j: Neo4j, batch: Tuple[SchemaRecord, List[Tuple[str, float]]]) \
+            -> List[Tuple[List[str], float]]:
+        """
+        :return: The meta-paths of the batch, which have an instance in the graph, as lists of type ids.
+        """
+        schema_record, meta_paths = batch
+        structural_values = {tuple(str(mp).split("|")): float(structural_value)
+                             for mp, structural_value in meta_paths}
+        if self.enable_existence_check:
+            verdicts = schema_record.checker.check(list(mp) for mp in structural_values)
+        else:
+            verdicts = ((list(mp), True) for mp in structural_values)
+        existing = [(mp_as_list, structural_values[tuple(mp_as_list)])
+                    for mp_as_list, has_instance in verdicts if has_instance]
+        with self._lock:
+            self._checked += len(meta_paths)
+        return existing
 
     # Executed if existence check is enabled
-    @staticmethod
-    def check_existence(args):
-        logger = logging.getLogger('MetaExp.ExistenceCheck')
+    def exists_in_graph(self, neo4j: Neo4j, schema_record: SchemaRecord, mp_as_list: List[str]) -> Optional[bool]:
         labels = []
-        (meta_path, structural_value, data_set, edge_map, node_map) = args
-        mp_as_list = meta_path.split("|")
-        logger.debug("Checking existance of {}".format(mp_as_list))
         for i, type in enumerate(mp_as_list):
             if i % 2:
-                labels.append("[n{}:{}]".format(i, edge_map[type]))
+                labels.append("[n{}:{}]".format(i, schema_record.id_to_edge_type_map[type]))
             else:
-                labels.append("(e{}: {})".format(i, node_map[type]))
-        logger.debug("Querying for mp {}".format(mp_as_list))
-        with Neo4j(data_set['bolt-url'], data_set['username'], data_set['password']) as neo4j:
-            if neo4j.test_whether_meta_path_exists("-".join(labels)):
-                logger.debug("Mp {} exists!".format("-".join(labels)))
-                start_node = mp_as_list[0]
-                end_node = mp_as_list[-1]
-                logger.debug("Adding metapath {} to record {}".format(mp_as_list, "{}_{}_{}".format(data_set['name'],
-                                                                                                    start_node,
-                                                                                                    end_node)))
-                mp_object = MetaPath(edge_node_list=mp_as_list)
-                logger.debug("Storing structural value {}...".format(structural_value))
-                mp_object.store_structural_value(float(structural_value))
-                Redis(data_set['name'])._client.lpush("{}_{}_{}".format(data_set['name'], start_node, end_node),
-                                                      pickle.dumps(mp_object))
-                return mp_as_list
-        return None
+                labels.append("(e{}: {})".format(i, schema_record.id_to_node_type_map[type]))
+        self.logger.debug("Querying for mp {}".format(mp_as_list))
+        exists = neo4j.test_whether_meta_path_exists("-".join(labels), timeout=self.timeout)
+        if exists:
+            self.logger.debug("Mp {} exists!".format("-".join(labels)))
+        return exists
 
-    # Executed if existence check is enabled
-    def start_parallel_existence_checks(self, meta_paths: List[str], data_set: Dict) -> List[List[str]]:
-        with multiprocessing.Pool(processes=PARALLEL_EXISTENCE_TEST_PROCESSES) as pool:
-            args = [(mp[0], mp[1], data_set, self.id_to_edge_type_map, self.id_to_node_type_map) for mp in meta_paths]
-            return pool.map(self.check_existence, args)
-
-    # Executed if existence check is disabled
-    def write_paths(self, paths: List[Tuple[List[str], float]]):
-        for path in paths:
-            self.write_path(path[0], path[1])
-
-    # Executed if existence check is disabled
-    def write_path(self, path: List[str], structural_value: float):
-        start_node = path[0]
-        end_node = path[-1]
-        self.logger.debug("Adding metapath {} to record {}".format(path, "{}_{}_{}".format(self.redis.data_set,
-                                                                                           start_node,
-                                                                                           end_node)))
-        mp_object = MetaPath(edge_node_list=path)
-        self.logger.debug("Storing structural value {}...".format(structural_value))
-        mp_object.store_structural_value(structural_value)
-        self.redis._client.lpush("{}_{}_{}".format(self.redis.data_set, start_node, end_node),
-                                 pickle.dumps(mp_object))
+    def graph_fingerprint(self, neo4j: Neo4j, schema_record: SchemaRecord) -> str:
+        """
+        :return: Hash of the type maps and of the number of nodes and relationships, which changes with the graph.
+        """
+        nodes, relationships = neo4j.get_node_and_relationship_counts()
+        graph = [sorted((str(key), str(value)) for key, value in schema_record.id_to_node_type_map.items()),
+                 sorted((str(key), str(value)) for key, value in schema_record.id_to_edge_type_map.items()),
+                 nodes, relationships]
+        return hashlib.sha1(json.dumps(graph).encode()).hexdigest()
+
+    def store_existence_checks(self):
+        for schema_record in self._records:
+            if schema_record.checker is None:
+                continue
+            self.redis.store_existence_checks(schema_record.fingerprint,
+                                              schema_record.cache.changes(schema_record.checker.verdicts))
+            self.logger.info("Checked existence with {} queries and {} known verdicts, {} meta-paths were "
+                             "pruned".format(schema_record.checker.queried, len(schema_record.cache.stored),
+                                             schema_record.checker.pruned))
+
+    def report_status(self, statistics: Dict):
+        """
+        Stores the statistics of the stages in '<data set>_import_status' and reports the progress of the checks.
+        """
+        self.redis._client.set("{}_import_status".format(self.redis.data_set), json.dumps(statistics),
+                               ex=JOB_LIFETIME)
+        parsing = any(stage['running'] for stage in statistics['stages'][:2])
+        self.progress(self._checked, None if parsing else self._parsed, 'existence check')
+
+    def collect_path(self, path: Tuple[List[str], float]) -> List:
+        mp_as_list, structural_value = path
+        with self._lock:
+            type_ids, lengths, structural_values = self._catalogs[(mp_as_list[0], mp_as_list[-1])]
+            type_ids.extend(int(type_id) for type_id in mp_as_list)
+            lengths.append(len(mp_as_list))
+            structural_values.append(structural_value)
+        return []
+
+    def write_catalogs(self):
+        """
+        Replaces the meta-paths of each pair of start and end type, that were collected. The catalogs are written in
+        transactions of about `write_chunk_size` meta-paths, the generation isn't read before it is activated.
+        """
+        total = sum(len(lengths) for _, lengths, _ in self._catalogs.values())
+        pairs = len(self._catalogs)
+        written = 0
+        chunk = {}
+        while self._catalogs:
+            # The collected columns are released as soon as their catalog is built
+            (start_node, end_node), columns = self._catalogs.popitem()
+            catalog = MetaPathCatalog.from_type_ids(*columns)
+            chunk["{}_{}_{}".format(self.redis.namespace, start_node, end_node)] = catalog
+            written += len(catalog)
+            if sum(len(catalog) for catalog in chunk.values()) >= self.write_chunk_size or not self._catalogs:
+                self.redis.store_catalogs(chunk)
+                chunk = {}
+                self.progress(written, total, 'write')
+        self.logger.debug("Wrote {} meta paths to {} records".format(written, pairs))
 
     def write_mappings(self, node_type_mapping: Dict[int, str], edge_type_mapping: Dict[int, str]):
-        self.redis._client.hmset("{}_node_type_map".format(self.redis.data_set), node_type_mapping)
-        self.redis._client.hmset("{}_edge_type_map".format(self.redis.data_set), edge_type_mapping)
-        self.redis._client.hmset("{}_node_type_map_reverse".format(self.redis.data_set),
+        self.redis._client.hmset("{}_node_type_map".format(self.redis.namespace), node_type_mapping)
+        self.redis._client.hmset("{}_edge_type_map".format(self.redis.namespace), edge_type_mapping)
+        self.redis._client.hmset("{}_node_type_map_reverse".format(self.redis.namespace),
                                  {v: k for k, v in node_type_mapping.items()})
-        self.redis._client.hmset("{}_edge_type_map_reverse".format(self.redis.data_set),
+        self.redis._client.hmset("{}_edge_type_map_reverse".format(self.redis.namespace),
                                  {v: k for k, v in edge_type_mapping.items()})
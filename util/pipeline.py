@@ -0,0 +1,153 @@
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List
+
+from util.config import PIPELINE_QUEUE_SIZE, PIPELINE_REPORT_INTERVAL
+from util.tracing import metrics
+
+# Tells a worker, that no more items follow
+_DONE = object()
+
+
+class Stage:
+    """
+    Step of a pipeline, which turns each item into any number of items for the next stage.
+    """
+
+    def __init__(self, name: str, function: Callable[[object], Iterable], workers: int = 1,
+                 queue_size: int = PIPELINE_QUEUE_SIZE):
+        """
+        :param function: Returns the items for the next stage, e.g. as generator.
+        :param workers: Number of threads, which apply the function at the same time.
+        :param queue_size: Number of items, that may wait for this stage, before the previous stage is blocked.
+        """
+        self.name = name
+        self.function = function
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.processed = 0
+        self.produced = 0
+        self.errors = 0
+        self._running = workers
+        self._lock = threading.Lock()
+
+    def statistics(self, seconds: float) -> Dict:
+        return {'stage': self.name, 'workers': self.workers, 'running': self._running, 'processed': self.processed,
+                'produced': self.produced, 'items_per_second': self.processed / seconds if seconds > 0 else 0.0,
+                'queue_depth': self.queue.qsize(), 'errors': self.errors}
+
+
+class Pipeline:
+    """
+    Runs stages in threads, which are connected by bounded queues. A stage, that can't keep up, fills its queue and
+    blocks the previous stages, so that the pipeline only holds a bounded number of items at once.
+
+    The first stage is called once with None, e.g. to fetch the data. The items of the last stage are discarded.
+    An exception of a stage stops all stages and is raised by run.
+    """
+
+    def __init__(self, name: str, stages: List[Stage], report: Callable[[Dict], None] = None,
+                 report_interval: float = PIPELINE_REPORT_INTERVAL):
+        """
+        :param report: Called with the statistics of all stages every `report_interval` seconds and at the end.
+        """
+        self.name = name
+        self.stages = stages
+        self.report = report if report is not None else lambda statistics: None
+        self.report_interval = report_interval
+        self._stopped = threading.Event()
+        self._error = None
+        self._started = None
+        self.logger = logging.getLogger('MetaExp.{}'.format(__class__.__name__))
+
+    def _put(self, stage_queue: queue.Queue, item) -> bool:
+        while not self._stopped.is_set():
+            try:
+                stage_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, stage_queue: queue.Queue):
+        while not self._stopped.is_set():
+            try:
+                return stage_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _fail(self, error: Exception):
+        if self._error is None:
+            self._error = error
+        self._stopped.set()
+
+    def _work(self, index: int):
+        stage = self.stages[index]
+        following = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        try:
+            while True:
+                item = self._get(stage.queue)
+                if item is _DONE:
+                    break
+                produced = 0
+                for result in stage.function(item):
+                    if following is not None and not self._put(following.queue, result):
+                        break
+                    produced += 1
+                with stage._lock:
+                    stage.processed += 1
+                    stage.produced += produced
+                metrics.increment('metaexp_pipeline_items_total', pipeline=self.name, stage=stage.name)
+        except Exception as e:
+            with stage._lock:
+                stage.errors += 1
+            self.logger.exception("Stage {} of {} failed".format(stage.name, self.name))
+            self._fail(e)
+        finally:
+            with stage._lock:
+                stage._running -= 1
+                last = stage._running == 0
+            if last and following is not None:
+                for _ in range(following.workers):
+                    self._put(following.queue, _DONE)
+
+    def statistics(self) -> Dict:
+        seconds = time.perf_counter() - self._started
+        return {'pipeline': self.name, 'seconds': seconds, 'stages': [stage.statistics(seconds)
+                                                                      for stage in self.stages]}
+
+    def _report(self, finished: bool = False):
+        statistics = dict(self.statistics(), finished=finished, failed=self._error is not None)
+        self.logger.info("{} after {:.0f}s: {}".format(self.name, statistics['seconds'], ', '.join(
+            "{stage} {processed} processed ({items_per_second:.1f}/s), {queue_depth} queued, {errors} errors"
+            .format(**stage) for stage in statistics['stages'])))
+        try:
+            self.report(statistics)
+        except Exception as e:
+            # E.g. the job of the pipeline was cancelled
+            self._fail(e)
+
+    def _report_periodically(self):
+        while not self._stopped.wait(self.report_interval):
+            self._report()
+
+    def run(self):
+        self._started = time.perf_counter()
+        self.stages[0].queue.put(None)
+        self.stages[0].queue.put(_DONE)
+        workers = [threading.Thread(target=self._work, args=(index,), daemon=True,
+                                    name='{}-{}-{}'.format(self.name, stage.name, worker))
+                   for index, stage in enumerate(self.stages) for worker in range(stage.workers)]
+        reporter = threading.Thread(target=self._report_periodically, daemon=True, name='{}-report'.format(self.name))
+        for thread in workers + [reporter]:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        self._stopped.set()
+        reporter.join()
+        self._report(finished=True)
+        if self._error is not None:
+            raise self._error
@@ -0,0 +1,170 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+DEFAULT_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+
+class Histogram:
+    def __init__(self, buckets: List[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """
+    Counters and histograms of the current process, which can be exported in the prometheus text format.
+    Each gunicorn worker has its own metrics, api.worker_metrics merges them.
+    """
+
+    def __init__(self):
+        self._counters = defaultdict(float)
+        self._histograms = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, labels: Dict) -> Tuple:
+        return name, tuple(sorted(labels.items()))
+
+    def describe(self, name: str, description: str):
+        self._help[name] = description
+
+    def increment(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            self._counters[self._key(name, labels)] += value
+
+    def observe(self, name: str, value: float, buckets: List[float] = DEFAULT_BUCKETS, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = Histogram(buckets)
+            self._histograms[key].observe(value)
+
+    def counter(self, name: str, **labels) -> float:
+        return self._counters.get(self._key(name, labels), 0)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self) -> Dict:
+        """
+        :return: Counters and histograms of this process as json serializable lists.
+        """
+        with self._lock:
+            return {'counters': [[name, labels, value] for (name, labels), value in self._counters.items()],
+                    'histograms': [[name, labels, list(histogram.buckets), list(histogram.counts), histogram.sum,
+                                    histogram.count] for (name, labels), histogram in self._histograms.items()]}
+
+    @staticmethod
+    def _format_labels(labels, extra=()) -> str:
+        labels = list(labels) + list(extra)
+        if not labels:
+            return ''
+        return '{' + ','.join('{}="{}"'.format(key, str(value).replace('"', '\\"')) for key, value in labels) + '}'
+
+    def _describe(self, lines: List[str], name: str, metric_type: str):
+        if name in self._help:
+            lines.append('# HELP {} {}'.format(name, self._help[name]))
+        lines.append('# TYPE {} {}'.format(name, metric_type))
+
+    def prometheus_text(self, workers: Dict[str, Dict] = None) -> str:
+        """
+        :param workers: Snapshots of several processes by worker id, whose samples are labeled with 'worker'.
+                        By default, the metrics of this process are reported without that label.
+        """
+        snapshots = {None: self.snapshot()} if workers is None else workers
+        counters = defaultdict(list)
+        histograms = defaultdict(list)
+        for worker, snapshot in sorted(snapshots.items(), key=lambda item: str(item[0])):
+            extra = [] if worker is None else [('worker', worker)]
+            for name, labels, value in snapshot['counters']:
+                counters[name].append((sorted(tuple(label) for label in labels) + extra, value))
+            for name, labels, *histogram in snapshot['histograms']:
+                histograms[name].append((sorted(tuple(label) for label in labels) + extra, histogram))
+
+        lines = []
+        for name, samples in sorted(counters.items()):
+            self._describe(lines, name, 'counter')
+            for labels, value in sorted(samples):
+                lines.append('{}{} {}'.format(name, self._format_labels(labels), value))
+        for name, samples in sorted(histograms.items()):
+            self._describe(lines, name, 'histogram')
+            for labels, (buckets, counts, total, count) in sorted(samples, key=lambda sample: sample[0]):
+                cumulative = 0
+                for bound, bucket_count in zip(buckets + ['+Inf'], counts):
+                    cumulative += bucket_count
+                    lines.append('{}_bucket{} {}'.format(name, self._format_labels(labels, [('le', bound)]),
+                                                         cumulative))
+                lines.append('{}_sum{} {}'.format(name, self._format_labels(labels), total))
+                lines.append('{}_count{} {}'.format(name, self._format_labels(labels), count))
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+metrics.describe('metaexp_request_seconds', 'Latency of requests per route')
+metrics.describe('metaexp_phase_seconds', 'Duration of the phases of a request')
+metrics.describe('metaexp_redis_commands_total', 'Number of redis commands')
+metrics.describe('metaexp_redis_bytes_total', 'Bytes sent to and received from redis')
+metrics.describe('metaexp_neo4j_queries_total', 'Number of neo4j queries')
+metrics.describe('metaexp_cache_requests_total', 'Requests to in-process caches by result')
+metrics.describe('metaexp_speculation_total', 'Speculatively selected batches by whether they were used')
+metrics.describe('metaexp_pipeline_items_total', 'Items processed by each stage of a pipeline, e.g. an import')
+
+_trace = threading.local()
+
+
+def start_trace():
+    """
+    Starts measuring a request in the current thread.
+    """
+    _trace.start = time.perf_counter()
+    _trace.phases = defaultdict(float)
+
+
+def is_tracing() -> bool:
+    return hasattr(_trace, 'start')
+
+
+def finish_trace(route: str) -> Dict[str, float]:
+    """
+    Records the latency and the phases of the current request.
+    :return: Seconds spent in each phase of the request.
+    """
+    if not is_tracing():
+        return {}
+    metrics.observe('metaexp_request_seconds', time.perf_counter() - _trace.start, route=route)
+    phases = dict(_trace.phases)
+    for phase, duration in phases.items():
+        metrics.observe('metaexp_phase_seconds', duration, route=route, phase=phase)
+    del _trace.start, _trace.phases
+    return phases
+
+
+@contextmanager
+def span(phase: str):
+    """
+    Measures the duration of a phase, e.g. unpickling the session or predicting with the gaussian process.
+    Phases outside of requests, e.g. in background jobs, are recorded immediately.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        if is_tracing():
+            _trace.phases[phase] += duration
+        else:
+            metrics.observe('metaexp_phase_seconds', duration, route='background', phase=phase)